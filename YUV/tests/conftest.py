@@ -0,0 +1,29 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yuv.com_def import BitDepth, Format, Sequence, _dtype  # noqa: E402
+
+
+@pytest.fixture
+def make_seq(tmp_path):
+    """
+    在临时目录中生成随机内容的序列
+    :return: 生成函数，返回 (序列对象, 形状为 (帧数, 每帧像素数) 的原始数据)
+    """
+
+    def make(width: int, height: int, frames: int, bit_depth: BitDepth = BitDepth.BitDepth8,
+             fmt: Format = Format.YUV420, name: str = "seq.yuv", seed: int = 0):
+        seq = Sequence(str(tmp_path), name, width, height, bit_depth=bit_depth, fmt=fmt)
+        dtype = _dtype(bit_depth)
+        rng = np.random.default_rng(seed)
+        data = rng.integers(0, 1 << bit_depth.value, size=frames * seq.frame_size() // np.dtype(dtype).itemsize,
+                            dtype=dtype)
+        data.tofile(seq.full_name())
+        return seq, data.reshape(frames, -1)
+
+    return make
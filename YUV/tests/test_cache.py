@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from yuv.com_def import BitDepth, Format, Component, Sequence
+from yuv.cache import FrameCache
+from yuv.yuv_io import YuvReader
+
+
+def test_lru_eviction():
+    cache = FrameCache(budget=300)
+    for i in range(3):
+        cache.put(i, np.zeros(100, np.uint8))
+    assert len(cache) == 3 and cache.nbytes == 300
+    # 访问后的帧移到队尾，最久未访问的帧先被淘汰
+    assert cache.get(0) is not None
+    cache.put(3, np.zeros(100, np.uint8))
+    assert 1 not in cache and 0 in cache
+    cache.budget = 150
+    assert list(cache._items) == [3]
+    cache.put(4, np.zeros(200, np.uint8))
+    assert 4 not in cache
+    cache.put(3, {Component.COMP_Y: np.zeros(50, np.uint8)})
+    assert cache.nbytes == 50
+
+    assert cache.get(1) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "frames": 1, "nbytes": 50, "budget": 150}
+    cache.reset_stats()
+    cache.clear()
+    assert cache.stats()["hits"] == 0 and len(cache) == 0 and cache.nbytes == 0
+
+
+def test_cached_items_are_read_only():
+    cache = FrameCache()
+    buff = np.zeros(4, np.uint8)
+    cache.put("frame", buff)
+    with pytest.raises(ValueError):
+        buff[0] = 1
+
+
+def test_reader_hits(make_seq):
+    seq, data = make_seq(16, 8, 3)
+    cache = FrameCache()
+    for _ in range(2):
+        with YuvReader(seq, cache=cache) as reader:
+            frames = list(reader)
+        assert np.array_equal(frames[2][Component.COMP_Y].get().ravel(), data[2, :16 * 8])
+    assert (cache.misses, cache.hits) == (3, 3)
+    # 只读取部分分量时使用不同的键
+    with YuvReader(seq, components=[Component.COMP_Y], cache=cache) as reader:
+        y, _, _ = reader.read_batch(3)
+    assert np.array_equal(y.reshape(3, -1), data[:, :16 * 8])
+    assert (cache.misses, cache.hits, len(cache)) == (6, 3, 6)
+
+
+def test_same_file_different_geometry(make_seq):
+    # 同一文件分别按 16x16 8比特 YUV400 和 16x8 10比特 YUV400 读取，每帧字节数相同
+    seq, data = make_seq(16, 16, 2, fmt=Format.YUV400)
+    seq10 = Sequence(seq.path, seq.name, 16, 8, bit_depth=BitDepth.BitDepth10, fmt=Format.YUV400)
+    cache = FrameCache()
+    with YuvReader(seq, cache=cache) as reader:
+        frame8 = reader.read()
+    with YuvReader(seq10, cache=cache) as reader:
+        frame10 = reader.read()
+    assert cache.hits == 0 and len(cache) == 2
+    assert frame8[Component.COMP_Y].get().dtype == np.uint8
+    assert frame10[Component.COMP_Y].get().dtype == np.uint16
+    assert frame10[Component.COMP_Y].get().shape == (8, 16)
+    assert np.array_equal(frame10[Component.COMP_Y].get().ravel().view(np.uint8), data[0])
+
+
+def test_modified_file_misses(make_seq):
+    seq, data = make_seq(16, 8, 1)
+    cache = FrameCache()
+    with YuvReader(seq, cache=cache) as reader:
+        reader.read()
+    (data ^ 1).tofile(seq.full_name())
+    os.utime(seq.full_name(), ns=(1, 1))
+    with YuvReader(seq, cache=cache) as reader:
+        frame = reader.read()
+    assert cache.hits == 0
+    assert np.array_equal(frame[Component.COMP_Y].get().ravel(), data[0, :16 * 8] ^ 1)
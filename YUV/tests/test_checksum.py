@@ -0,0 +1,77 @@
+import os
+import warnings
+
+import numpy as np
+import pytest
+
+from yuv.checksum import FrameIndex
+from yuv.yuv_io import YuvReader
+
+
+def test_verify_detects_changes(make_seq):
+    seq, data = make_seq(16, 8, 4)
+    index = FrameIndex.build(seq)
+    assert os.path.exists(FrameIndex.path(seq))
+    data[2, 0] ^= 1
+    data.tofile(seq.full_name())
+    # 文件已修改，保存的索引失效
+    assert FrameIndex.load(seq) is None
+    with YuvReader(seq, verify=index) as reader:
+        reader.read_batch(2)
+        with pytest.raises(ValueError):
+            reader.read()
+
+
+@pytest.mark.parametrize("kwargs", [dict(), dict(prefetch=2)])
+def test_verify_error_propagates_from_iteration(make_seq, kwargs):
+    seq, data = make_seq(16, 8, 4)
+    index = FrameIndex.build(seq)
+    data[3, -1] ^= 1
+    data.tofile(seq.full_name())
+    frames = 0
+    with YuvReader(seq, verify=index, **kwargs) as reader:
+        with pytest.raises(ValueError):
+            for _ in reader:
+                frames += 1
+    assert frames == 3
+
+
+def test_verify_with_saved_index(make_seq):
+    seq, _ = make_seq(16, 8, 3)
+    FrameIndex.build(seq)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        with YuvReader(seq, verify=True) as reader:
+            assert len(list(reader)) == 3
+
+
+def test_verify_without_index_skips(make_seq):
+    seq, _ = make_seq(16, 8, 3)
+    with pytest.warns(UserWarning, match="No valid frame index"):
+        reader = YuvReader(seq, verify=True)
+    with reader:
+        y, _, _ = reader.read_batch(3)
+    # 不会为校验而现场计算索引
+    assert y.shape[0] == 3 and not os.path.exists(FrameIndex.path(seq))
+
+
+def test_unwritable_sidecar_keeps_index_in_memory(make_seq, monkeypatch):
+    seq, _ = make_seq(16, 8, 3)
+
+    def save(self):
+        raise PermissionError("read-only file system")
+
+    monkeypatch.setattr(FrameIndex, "save", save)
+    with pytest.warns(UserWarning, match="keeping it in memory"):
+        index = FrameIndex.get(seq)
+    assert len(index) == 3 and not os.path.exists(FrameIndex.path(seq))
+
+
+def test_duplicates(make_seq):
+    seq, data = make_seq(16, 8, 4)
+    data[3] = data[1]
+    data.tofile(seq.full_name())
+    index = FrameIndex.build(seq, per_plane=True)
+    assert index.duplicates() == [[1, 3]]
+    assert len(index[0]) == 3 and np.all([isinstance(d, str) for d in index[0]])
+    assert index.diff(FrameIndex.build(seq, per_plane=True)) == []
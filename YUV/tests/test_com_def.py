@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from yuv.com_def import BitDepth, Format, Component, Region, RegionArray, MetaData, Plane, Frame
+from yuv.com_def import cvt_bit_depth, _get_uv_wh
+from yuv.yuv_io import YuvReader
+
+
+def _frame(width: int, height: int, fmt: Format = Format.YUV420) -> Frame:
+    rng = np.random.default_rng(0)
+    buff_y = rng.integers(0, 256, width * height, dtype=np.uint8)
+    buff_u = buff_v = None
+    if fmt != Format.YUV400:
+        uv_w, uv_h = _get_uv_wh(width, height, fmt)
+        buff_u = rng.integers(0, 256, uv_w * uv_h, dtype=np.uint8)
+        buff_v = rng.integers(0, 256, uv_w * uv_h, dtype=np.uint8)
+    return Frame(width, height, BitDepth.BitDepth8, fmt, buff_y, buff_u, buff_v)
+
+
+@pytest.mark.parametrize("fmt", [Format.YUV420, Format.YUV422, Format.YUV444, Format.YUV400])
+def test_ctu_view_matches_ctu_all(fmt):
+    frame = _frame(40, 24, fmt)
+    views = frame.ctu_view(8)
+    assert set(views) == ({Component.COMP_Y} if fmt == Format.YUV400 else set(Component))
+    ctus = frame.ctu_all(8)
+    rows, cols = views[Component.COMP_Y].shape[:2]
+    assert (rows, cols) == (3, 5) and len(ctus) == rows * cols
+    for comp, view in views.items():
+        # 完整CTU的视图不拷贝数据
+        assert np.shares_memory(view, frame[comp].buff)
+        for i, ctu in enumerate(ctus):
+            np.testing.assert_array_equal(view[i // cols, i % cols], ctu[comp].buff)
+
+
+def test_ctu_view_border():
+    frame = _frame(20, 12)
+    y = frame[Component.COMP_Y].buff
+    assert frame.ctu_view(8)[Component.COMP_Y].shape == (1, 2, 8, 8)
+
+    views = frame.ctu_view(8, pad=True)
+    assert views[Component.COMP_Y].shape == (2, 3, 8, 8)
+    assert views[Component.COMP_U].shape == (2, 3, 4, 4)
+    # 不完整的边界CTU按边缘像素填充
+    corner = views[Component.COMP_Y][1, 2]
+    np.testing.assert_array_equal(corner[:4, :4], y[8:12, 16:20])
+    np.testing.assert_array_equal(corner[4:, :4], np.broadcast_to(y[11, 16:20], (4, 4)))
+    assert (corner[4:, 4:] == y[11, 19]).all()
+
+
+def test_plane_rshift_full_range_16bit():
+    plane = Plane(np.full((1, 2), 65535, np.uint16), BitDepth.BitDepth16)
+    shifted = plane >> 8
+    assert shifted.get().tolist() == [[255, 255]]
+    assert plane.get().tolist() == [[65535, 65535]]
+    plane >>= 8
+    assert plane.get().tolist() == [[255, 255]]
+    assert plane.get().dtype == np.uint16
+
+
+def test_plane_rshift_rounds_and_clips():
+    plane = Plane(np.array([[0, 1, 2, 1021, 1023]], np.uint16), BitDepth.BitDepth10)
+    assert (plane >> 2).get().tolist() == [[0, 0, 1, 255, 255]]
+    plane = Plane(np.array([[254, 255]], np.uint8), BitDepth.BitDepth8)
+    plane >>= 1
+    assert plane.get().tolist() == [[127, 127]]
+
+
+@pytest.mark.parametrize("bit_depth, target, values, expected", [
+    (BitDepth.BitDepth16, BitDepth.BitDepth8, [0, 127, 128, 65535], [0, 0, 1, 255]),
+    (BitDepth.BitDepth10, BitDepth.BitDepth8, [0, 2, 1021, 1023], [0, 1, 255, 255]),
+    (BitDepth.BitDepth8, BitDepth.BitDepth10, [0, 1, 255], [0, 4, 1020]),
+])
+def test_cvt_bit_depth(bit_depth, target, values, expected):
+    dtype = np.uint8 if bit_depth == BitDepth.BitDepth8 else np.uint16
+    assert cvt_bit_depth(np.array(values, dtype), bit_depth, target).tolist() == expected
+
+
+@pytest.mark.parametrize("fmt", list(Format))
+def test_plane_sizes(fmt):
+    meta = MetaData(Region(0, 0, 33, 17), fmt, BitDepth.BitDepth10)
+    sizes = meta.plane_sizes()
+    assert sizes[0] == 33 * 17 * 2
+    assert len(sizes) == (1 if fmt == Format.YUV400 else 3)
+    if fmt != Format.YUV400:
+        width_uv, height_uv = _get_uv_wh(33, 17, fmt)
+        assert sizes[1] == sizes[2] == width_uv * height_uv * 2
+    assert meta.frame_size() == sum(sizes)
+
+
+def test_region_array():
+    grid = RegionArray.grid(20, 12, 8, 8, include_incomplete_border=True)
+    assert grid.data.tolist() == [[0, 0, 8, 8], [8, 0, 8, 8], [16, 0, 4, 8],
+                                  [0, 8, 8, 4], [8, 8, 8, 4], [16, 8, 4, 4]]
+    assert len(RegionArray.grid(20, 12, 8, 8)) == 2
+    assert grid[2] == Region(16, 0, 4, 8) and len(grid[1:3]) == 2
+    assert grid.area().sum() == 20 * 12
+    regions = RegionArray.from_regions([Region(-2, 4, 8, 8), Region(6, 6, 4, 4)])
+    assert regions.intersect(Region(0, 0, 8, 8)).data.tolist() == [[0, 4, 6, 4], [6, 6, 2, 2]]
+    assert regions.clip(8, 8).data.tolist() == [[0, 4, 8, 4], [6, 6, 2, 2]]
+    assert (regions >> 1).data.tolist() == [[0, 2, 4, 2], [3, 3, 1, 1]]
+    assert not hasattr(Region(0, 0, 1, 1), "__dict__")
+
+
+def test_rois_on_lazy_frame(make_seq):
+    seq, _ = make_seq(64, 48, 2)
+    with YuvReader(seq) as reader:
+        expected = reader.read().ctu_all(16)
+    with YuvReader(seq, components={Component.COMP_Y}) as reader:
+        frame = reader.read()
+        assert not frame.loaded(Component.COMP_U)
+        ctus = frame.ctu_all(16)
+        regions = frame.rois(RegionArray.from_regions([Region(8, 8, 16, 16), Region(60, 40, 16, 16)]))
+    assert len(ctus) == len(expected) == 12
+    for a, b in zip(expected, ctus):
+        for comp in Component:
+            assert np.array_equal(a[comp].get(), b[comp].get())
+    assert regions[1].width == 4 and regions[1][Component.COMP_U].get().shape == (4, 2)
+
+
+def test_frame_rois_yuv400():
+    frame = Frame(8, 8, BitDepth.BitDepth8, Format.YUV400, np.arange(64, dtype=np.uint8))
+    rois = frame.rois(RegionArray.grid(8, 8, 4, 4, True))
+    assert [r[Component.COMP_Y].get()[0, 0] for r in rois] == [0, 4, 32, 36]
+    assert rois[0][Component.COMP_U] is None
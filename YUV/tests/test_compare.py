@@ -0,0 +1,60 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from yuv.com_def import BitDepth, Format, Component, Sequence
+from yuv import compare
+from yuv.compare import compare_seq
+
+
+def _copy(seq: Sequence, name: str, frames: int = None) -> Sequence:
+    copied = Sequence(seq.path, name, seq.width, seq.height, bit_depth=seq.bit_depth, fmt=seq.fmt)
+    shutil.copyfile(seq.full_name(), copied.full_name())
+    if frames is not None:
+        with open(copied.full_name(), "r+b") as f:
+            f.truncate(frames * seq.frame_size())
+    return copied
+
+
+def test_identical(make_seq):
+    seq, _ = make_seq(40, 24, 3)
+    report = compare_seq(seq, _copy(seq, "b.yuv"))
+    assert report.identical and report.frame is None
+    assert str(report) == "identical, 3 frames"
+
+
+def test_frame_count_mismatch(make_seq):
+    seq, _ = make_seq(40, 24, 3)
+    report = compare_seq(seq, _copy(seq, "b.yuv", frames=2))
+    assert not report.identical and report.frame is None
+    assert (report.frames_a, report.frames_b) == (3, 2)
+
+
+@pytest.mark.parametrize("chunk", [compare._CHUNK, 77])
+def test_first_mismatch(make_seq, monkeypatch, chunk):
+    monkeypatch.setattr(compare, "_CHUNK", chunk)
+    seq, data = make_seq(40, 24, 4, BitDepth.BitDepth10, Format.YUV420)
+    area_y, area_uv = 40 * 24, 20 * 12
+    data = data.copy()
+    # 第2帧的U分量 (13, 5) 和V分量 (19, 11) 不一致，第3帧的Y分量也不一致
+    data[2, area_y + 5 * 20 + 13] ^= 1
+    data[2, area_y + area_uv + 11 * 20 + 19] ^= 1
+    data[3, 0] ^= 1
+    other = Sequence(seq.path, "b.yuv", 40, 24, bit_depth=BitDepth.BitDepth10, fmt=Format.YUV420)
+    data.tofile(other.full_name())
+
+    report = compare_seq(seq, other, ctu_size=16)
+    assert not report.identical
+    assert (report.frame, report.component, report.x, report.y) == (2, Component.COMP_U, 13, 5)
+    assert report.ctu == (0, 1)
+    assert report.pixels == {Component.COMP_Y: 0, Component.COMP_U: 1, Component.COMP_V: 1}
+    assert report.ctus[Component.COMP_Y].size == 0
+    assert report.ctus[Component.COMP_V].tolist() == [[1, 2]]
+
+
+def test_geometry_mismatch(make_seq):
+    seq, _ = make_seq(40, 24, 1)
+    other = Sequence(seq.path, seq.name, 40, 24, fmt=Format.YUV444)
+    with pytest.raises(ValueError):
+        compare_seq(seq, other)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from yuv.com_def import BitDepth, Format
+from yuv.metrics import Metric, psnr, ssim, ms_ssim, compare_seq
+
+
+def test_psnr():
+    a = np.zeros((2, 4, 4), np.uint16)
+    b = a.copy()
+    b[1] = 4
+    value = psnr(a, b, BitDepth.BitDepth10)
+    # 10比特的峰值为 255 << 2
+    assert value[0] == 999.99
+    assert value[1] == pytest.approx(10 * np.log10(1020 ** 2 / 16))
+
+
+def test_ssim():
+    rng = np.random.default_rng(0)
+    a = rng.integers(0, 256, (2, 32, 32), dtype=np.uint8)
+    b = a.copy()
+    b[1] = np.clip(b[1].astype(np.int32) + rng.integers(-20, 21, (32, 32)), 0, 255)
+    value = ssim(a, b, BitDepth.BitDepth8)
+    assert value[0] == pytest.approx(1.0)
+    assert 0 < value[1] < 0.99
+    assert ssim(a, 255 - a, BitDepth.BitDepth8).max() < value[1]
+
+
+def test_ms_ssim():
+    rng = np.random.default_rng(0)
+    a = rng.integers(0, 1024, (1, 176, 176), dtype=np.uint16)
+    assert ms_ssim(a, a, BitDepth.BitDepth10)[0] == pytest.approx(1.0)
+    assert ms_ssim(a, a // 2, BitDepth.BitDepth10)[0] < 1
+    with pytest.raises(ValueError):
+        ms_ssim(a[:, :170], a[:, :170], BitDepth.BitDepth10)
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_compare_seq(make_seq, workers):
+    seq_a, data_a = make_seq(32, 24, 6, BitDepth.BitDepth10, Format.YUV420, name="a.yuv", seed=1)
+    seq_b, data_b = make_seq(32, 24, 5, BitDepth.BitDepth10, Format.YUV420, name="b.yuv", seed=2)
+    data_b[2] = data_a[2]
+    data_b.tofile(seq_b.full_name())
+    report = compare_seq(seq_a, seq_b, (Metric.PSNR, Metric.WPSNR, Metric.SSIM), start=1, batch=2, workers=workers)
+    assert report.frames == 4 and report.start == 1
+    assert sorted(report.keys()) == ["psnr_u", "psnr_v", "psnr_y", "ssim_u", "ssim_v", "ssim_y", "wpsnr"]
+    assert report["psnr_y"][1] == 999.99 and report["ssim_y"][1] == pytest.approx(1.0)
+    y_a = data_a[3, :32 * 24].reshape(1, 24, 32)
+    y_b = data_b[3, :32 * 24].reshape(1, 24, 32)
+    assert report["psnr_y"][2] == pytest.approx(psnr(y_a, y_b, BitDepth.BitDepth10)[0])
+    frame = report.frame(2)
+    assert frame["wpsnr"] == pytest.approx((6 * frame["psnr_y"] + frame["psnr_u"] + frame["psnr_v"]) / 8)
+
+
+def test_compare_seq_mismatch(make_seq):
+    seq_a, _ = make_seq(32, 16, 2, name="a.yuv")
+    seq_b, _ = make_seq(32, 16, 2, BitDepth.BitDepth10, name="b.yuv")
+    with pytest.raises(ValueError):
+        compare_seq(seq_a, seq_b)
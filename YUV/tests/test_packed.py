@@ -0,0 +1,165 @@
+import numpy as np
+import pytest
+
+from yuv.com_def import BitDepth, Format, Component, Sequence, Frame, _get_uv_wh
+from yuv.yuv_io import YuvReader
+from yuv.packed import PackedFormat, PackedCodec, PackedReader, PackedWriter
+from yuv.cache import FrameCache
+
+
+def _planes(n, width, height, fmt, bit_depth, seed=0):
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 1 << bit_depth.value, (n, height, width), dtype=np.uint16)
+    if fmt == Format.YUV400:
+        return y, None, None
+    width_uv, height_uv = _get_uv_wh(width, height, fmt)
+    return (y, rng.integers(0, 1 << bit_depth.value, (n, height_uv, width_uv), dtype=np.uint16),
+            rng.integers(0, 1 << bit_depth.value, (n, height_uv, width_uv), dtype=np.uint16))
+
+
+def _ref_p010(y, u, v, shift):
+    """
+    逐像素的参考实现
+    """
+    out = bytearray()
+    for x in y.ravel().tolist():
+        out += (x << shift).to_bytes(2, "little")
+    for a, b in zip(u.ravel().tolist(), v.ravel().tolist()):
+        out += (a << shift).to_bytes(2, "little") + (b << shift).to_bytes(2, "little")
+    return bytes(out)
+
+
+def _ref_v210(y, u, v, width, height):
+    stride = -(-width // 48) * 128
+    out = bytearray(stride * height)
+    for r in range(height):
+        ys, us, vs = y[r].tolist() + [0] * 6, u[r].tolist() + [0] * 3, v[r].tolist() + [0] * 3
+        for g in range(-(-width // 6)):
+            s = [us[3 * g], ys[6 * g], vs[3 * g], ys[6 * g + 1], us[3 * g + 1], ys[6 * g + 2],
+                 vs[3 * g + 1], ys[6 * g + 3], us[3 * g + 2], ys[6 * g + 4], vs[3 * g + 2], ys[6 * g + 5]]
+            for k in range(4):
+                word = s[3 * k] | s[3 * k + 1] << 10 | s[3 * k + 2] << 20
+                pos = r * stride + 16 * g + 4 * k
+                out[pos:pos + 4] = word.to_bytes(4, "little")
+    return bytes(out)
+
+
+def _ref_packed10(plane):
+    values = plane.ravel().tolist()
+    values += [0] * (-len(values) % 4)
+    out = bytearray()
+    for i in range(0, len(values), 4):
+        bits = values[i] | values[i + 1] << 10 | values[i + 2] << 20 | values[i + 3] << 30
+        out += bits.to_bytes(5, "little")
+    return bytes(out)
+
+
+@pytest.mark.parametrize("fmt", [Format.YUV420, Format.YUV422, Format.YUV444])
+@pytest.mark.parametrize("bit_depth", [BitDepth.BitDepth10, BitDepth.BitDepth12, BitDepth.BitDepth16])
+def test_p010_matches_reference(fmt, bit_depth):
+    y, u, v = _planes(2, 10, 6, fmt, bit_depth)
+    codec = PackedCodec.create(PackedFormat.P010, 10, 6, bit_depth, fmt)
+    raw = codec.pack(y, u, v)
+    assert raw[1].tobytes() == _ref_p010(y[1], u[1], v[1], 16 - bit_depth.value)
+    out = [np.zeros_like(a) for a in (y, u, v)]
+    codec.unpack(raw, *out)
+    assert all(np.array_equal(a, b) for a, b in zip(out, (y, u, v)))
+
+
+@pytest.mark.parametrize("width, height", [(12, 4), (50, 3), (96, 2)])
+def test_v210_matches_reference(width, height):
+    y, u, v = _planes(2, width, height, Format.YUV422, BitDepth.BitDepth10)
+    codec = PackedCodec.create(PackedFormat.V210, width, height, BitDepth.BitDepth10, Format.YUV422)
+    raw = codec.pack(y, u, v)
+    assert raw[1].tobytes() == _ref_v210(y[1], u[1], v[1], width, height)
+    out = [np.zeros_like(a) for a in (y, u, v)]
+    codec.unpack(raw, *out)
+    assert all(np.array_equal(a, b) for a, b in zip(out, (y, u, v)))
+
+
+@pytest.mark.parametrize("fmt", list(Format))
+@pytest.mark.parametrize("width, height", [(6, 2), (11, 5)])
+def test_packed10_matches_reference(fmt, width, height):
+    planes = _planes(2, width, height, fmt, BitDepth.BitDepth10)
+    codec = PackedCodec.create(PackedFormat.PACKED10, width, height, BitDepth.BitDepth10, fmt)
+    raw = codec.pack(*planes)
+    assert raw[1].tobytes() == b"".join(_ref_packed10(a[1]) for a in planes if a is not None)
+    out = [None if a is None else np.zeros_like(a) for a in planes]
+    codec.unpack(raw, *out)
+    assert all(a is None or np.array_equal(a, b) for a, b in zip(out, planes))
+
+
+@pytest.mark.parametrize("layout, fmt, bit_depth", [
+    (PackedFormat.V210, Format.YUV420, BitDepth.BitDepth10),
+    (PackedFormat.V210, Format.YUV422, BitDepth.BitDepth12),
+    (PackedFormat.P010, Format.YUV400, BitDepth.BitDepth10),
+    (PackedFormat.P010, Format.YUV420, BitDepth.BitDepth8),
+    (PackedFormat.PACKED10, Format.YUV420, BitDepth.BitDepth12),
+])
+def test_unsupported(layout, fmt, bit_depth):
+    with pytest.raises(ValueError):
+        PackedCodec.create(layout, 16, 16, bit_depth, fmt)
+
+
+def test_base_codec_not_implemented():
+    codec = PackedCodec(16, 16, BitDepth.BitDepth10, Format.YUV420)
+    y, u, v = _planes(1, 16, 16, Format.YUV420, BitDepth.BitDepth10)
+    with pytest.raises(NotImplementedError):
+        codec.pack(y, u, v)
+    with pytest.raises(NotImplementedError):
+        codec.unpack(np.zeros((1, 0), np.uint8), y, u, v)
+
+
+@pytest.mark.parametrize("layout, fmt", [(PackedFormat.P010, Format.YUV420), (PackedFormat.V210, Format.YUV422),
+                                         (PackedFormat.PACKED10, Format.YUV420),
+                                         (PackedFormat.PACKED10, Format.YUV400)])
+@pytest.mark.parametrize("kwargs", [dict(), dict(buffers=3), dict(prefetch=2), dict(cache=FrameCache())])
+def test_reader_writer_round_trip(tmp_path, layout, fmt, kwargs):
+    n = 7
+    y, u, v = _planes(n, 64, 32, fmt, BitDepth.BitDepth10)
+    seq = Sequence(str(tmp_path), "packed.bin", 64, 32, bit_depth=BitDepth.BitDepth10, fmt=fmt)
+
+    def frame(i):
+        return Frame(64, 32, BitDepth.BitDepth10, fmt, y[i], None if u is None else u[i], None if v is None else v[i])
+
+    with PackedWriter(seq, layout) as writer:
+        writer.write_batch(y[:3], None if u is None else u[:3], None if v is None else v[:3])
+        for i in range(3, n):
+            writer.write(frame(i))
+        assert writer.frames() == n
+    with open(seq.full_name(), "rb") as fp:
+        expected = fp.read()
+    with PackedWriter(seq, layout, frames=n) as writer:
+        for i in reversed(range(n)):
+            writer.write_at(i, frame(i))
+    with open(seq.full_name(), "rb") as fp:
+        assert fp.read() == expected
+
+    with PackedReader(seq, layout, **kwargs) as reader:
+        assert reader.frames() == n
+        assert np.array_equal(reader.read()[Component.COMP_Y].get(), y[0])
+        reader.seek(2)
+        yy, uu, vv = reader.read_batch(3)
+        assert np.array_equal(yy, y[3:6])
+        if u is not None:
+            assert np.array_equal(uu, u[3:6]) and np.array_equal(vv, v[3:6])
+        reader.seek(-6)
+        assert sum(batch[0].shape[0] for batch in reader.iter_batches(4)) == n
+        with pytest.raises(EOFError):
+            reader.read()
+
+
+def test_packed_and_planar_readers_do_not_share_cache(tmp_path):
+    # P010 与 10比特平面 YUV420 的帧大小相同，以两种方式读取同一文件时不能取到彼此缓存的帧
+    y, u, v = _planes(1, 16, 8, Format.YUV420, BitDepth.BitDepth10)
+    seq = Sequence(str(tmp_path), "p010.bin", 16, 8, bit_depth=BitDepth.BitDepth10, fmt=Format.YUV420)
+    with PackedWriter(seq, PackedFormat.P010) as writer:
+        writer.write_batch(y, u, v)
+    cache = FrameCache()
+    with YuvReader(seq, cache=cache) as reader:
+        planar = reader.read()
+    with PackedReader(seq, PackedFormat.P010, cache=cache) as reader:
+        packed = reader.read()
+    assert cache.hits == 0 and len(cache) == 2
+    assert np.array_equal(packed[Component.COMP_U].get(), u[0])
+    assert np.array_equal(planar[Component.COMP_Y].get(), y[0] << 6)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from yuv.com_def import BitDepth, Format, Component, Frame, Sequence
+from yuv.parallel import map_sequence
+
+
+def _invert(frame: Frame) -> Frame:
+    # 多进程时须为模块级函数
+    planes = [frame[Component.COMP_Y].get()]
+    if frame.fmt != Format.YUV400:
+        planes += [frame[Component.COMP_U].get(), frame[Component.COMP_V].get()]
+    max_value = (1 << frame.bit_depth.value) - 1
+    return Frame(frame.width, frame.height, frame.bit_depth, frame.fmt, *[max_value - p for p in planes])
+
+
+@pytest.mark.parametrize("workers, chunk", [(None, None), (2, None), (2, 1)])
+def test_map_sequence(make_seq, tmp_path, workers, chunk):
+    seq, data = make_seq(33, 17, 5, BitDepth.BitDepth10, Format.YUV422)
+    target = Sequence(str(tmp_path), "out.yuv", 33, 17, bit_depth=BitDepth.BitDepth10, fmt=Format.YUV422)
+    map_sequence(seq, target, _invert, workers=workers, start=1, frames=3, chunk=chunk)
+    out = np.fromfile(target.full_name(), np.uint16).reshape(3, -1)
+    assert np.array_equal(out, 1023 - data[1:4])
+
+
+def test_map_sequence_past_end(make_seq, tmp_path):
+    seq, _ = make_seq(16, 8, 2)
+    target = Sequence(str(tmp_path), "out.yuv", 16, 8)
+    map_sequence(seq, target, _invert, workers=2, start=5)
+    assert np.fromfile(target.full_name(), np.uint8).size == 0
@@ -0,0 +1,62 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from yuv.com_def import BitDepth, Format, Component, Frame
+from yuv.parallel import map_frames
+from yuv.shared import SharedFrame, SharedRing
+from yuv.yuv_io import YuvReader
+
+
+def _luma_sum(frame: Frame) -> int:
+    return int(frame[Component.COMP_Y].get().sum(dtype=np.int64))
+
+
+def _fill(frame: SharedFrame, value: int) -> int:
+    frame[Component.COMP_V].get()[:] = value
+    frame.close()
+    return value
+
+
+@pytest.mark.parametrize("fmt", [Format.YUV420, Format.YUV400])
+def test_shared_frame_round_trip(make_seq, fmt):
+    seq, _ = make_seq(33, 17, 1, BitDepth.BitDepth10, fmt)
+    with YuvReader(seq) as reader:
+        frame = reader.read()
+    comps = (Component.COMP_Y,) if fmt == Format.YUV400 else tuple(Component)
+    with SharedFrame.from_frame(frame) as shared:
+        # pickle 只传递句柄，得到映射同一块内存的帧
+        attached = pickle.loads(pickle.dumps(shared))
+        assert isinstance(attached, SharedFrame) and attached.handle == shared.handle
+        for comp in comps:
+            assert np.array_equal(attached[comp].get(), frame[comp].get())
+        attached[Component.COMP_Y].get()[0, 0] = 7
+        assert shared[Component.COMP_Y].get()[0, 0] == 7
+        attached.close()
+
+
+def test_shared_frame_across_processes():
+    with SharedFrame.create(16, 8, BitDepth.BitDepth8, Format.YUV420) as shared, \
+            ProcessPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(_fill, shared, 9).result() == 9
+        assert (shared[Component.COMP_V].get() == 9).all()
+        assert not shared[Component.COMP_U].get().any()
+
+
+def test_shared_ring(make_seq):
+    seq, data = make_seq(16, 8, 2)
+    with SharedRing(16, 8, BitDepth.BitDepth8, Format.YUV420, 2) as ring:
+        assert ring.frame_size == seq.frame_size()
+        for slot in range(2):
+            ring.buffer(slot)[:] = data[slot]
+            assert np.array_equal(ring[slot][Component.COMP_Y].get().ravel(), data[slot, :16 * 8])
+        assert ring[1].handle.offset == seq.frame_size()
+
+
+@pytest.mark.parametrize("workers, slots", [(None, None), (2, None), (2, 1)])
+def test_map_frames(make_seq, workers, slots):
+    seq, data = make_seq(33, 17, 7, BitDepth.BitDepth10, Format.YUV422)
+    result = list(map_frames(seq, _luma_sum, workers=workers, start=2, frames=4, slots=slots))
+    assert result == [int(data[i, :33 * 17].sum()) for i in range(2, 6)]
@@ -0,0 +1,83 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from yuv.com_def import BitDepth, Format
+from yuv import stats
+from yuv.stats import StatsReport, stats_seq, spatial_information, temporal_information
+
+
+def test_spatial_information():
+    y = np.random.default_rng(0).integers(0, 256, (2, 12, 20), dtype=np.uint8)
+    expected = list()
+    for x in y.astype(np.float32):
+        gx = cv2.Sobel(x, cv2.CV_32F, 1, 0)[1:-1, 1:-1]
+        gy = cv2.Sobel(x, cv2.CV_32F, 0, 1)[1:-1, 1:-1]
+        expected.append(np.std(np.sqrt(gx * gx + gy * gy), dtype=np.float64))
+    np.testing.assert_allclose(spatial_information(y, BitDepth.BitDepth8), expected, rtol=1e-5)
+    # 结果换算到8比特
+    np.testing.assert_allclose(spatial_information(y.astype(np.uint16) << 2, BitDepth.BitDepth10), expected,
+                               rtol=1e-5)
+
+
+def test_temporal_information():
+    y = np.random.default_rng(0).integers(0, 1024, (3, 8, 16), dtype=np.uint16)
+    ti = temporal_information(y, BitDepth.BitDepth10)
+    assert np.isnan(ti[0])
+    np.testing.assert_allclose(ti[1:], [np.std(y[i + 1].astype(np.float64) - y[i]) / 4 for i in range(2)])
+    ti = temporal_information(y[1:], BitDepth.BitDepth10, prev=y[0])
+    np.testing.assert_allclose(ti[0], np.std(y[1].astype(np.float64) - y[0]) / 4)
+
+
+@pytest.mark.parametrize("fmt", [Format.YUV420, Format.YUV400])
+def test_stats_seq(make_seq, fmt):
+    seq, data = make_seq(32, 16, 9, BitDepth.BitDepth10, fmt)
+    report = stats_seq(seq, start=1, batch=2)
+    assert report.frames == 8 and report.start == 1
+    prev, y = data[0, :32 * 16].reshape(16, 32), data[1:, :32 * 16].reshape(8, 16, 32)
+    np.testing.assert_allclose(report["si"], spatial_information(y, BitDepth.BitDepth10))
+    np.testing.assert_allclose(report["ti"], temporal_information(y, BitDepth.BitDepth10, prev))
+    np.testing.assert_allclose(report["mean_y"], y.mean(axis=(1, 2)))
+    assert report.summary()["max_y"] == y.max()
+    assert report.histograms["y"].sum() == y.size
+    assert set(report.histograms) == ({"y"} if fmt == Format.YUV400 else {"y", "u", "v"})
+    assert report.si == report["si"].max()
+
+
+def test_stats_seq_workers(make_seq):
+    seq, _ = make_seq(32, 16, 9)
+    serial = stats_seq(seq, batch=2)
+    parallel = stats_seq(seq, batch=2, workers=2)
+    assert serial.keys() == parallel.keys()
+    for k in serial.keys():
+        np.testing.assert_allclose(parallel[k], serial[k])
+    for k, v in serial.histograms.items():
+        assert np.array_equal(parallel.histograms[k], v)
+
+
+def test_stats_seq_cache(make_seq, monkeypatch, tmp_path):
+    seq, data = make_seq(32, 16, 3)
+    report = stats_seq(seq, cache=True)
+    assert os.path.exists(seq.full_name() + ".stats.json")
+
+    def fail(*args):
+        raise AssertionError("cache not used")
+
+    with monkeypatch.context() as m:
+        m.setattr(stats, "_stats_range", fail)
+        cached = stats_seq(seq, cache=True)
+    assert np.isnan(cached["ti"][0])
+    np.testing.assert_allclose(cached["si"], report["si"])
+    assert np.array_equal(cached.histograms["u"], report.histograms["u"])
+
+    # 文件修改后缓存失效
+    data[:, 0] = 0
+    data.tofile(seq.full_name())
+    os.utime(seq.full_name(), ns=(0, 0))
+    assert stats_seq(seq, cache=True)["min_y"].max() == 0
+
+    report.to_json(str(tmp_path / "report.json"))
+    loaded = StatsReport.from_json(str(tmp_path / "report.json"))
+    assert loaded.summary() == pytest.approx(report.summary(), nan_ok=True)
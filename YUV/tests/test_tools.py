@@ -0,0 +1,274 @@
+import copy
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from yuv.com_def import BitDepth, Format, Component, Region, RegionArray, Plane, Frame, Sequence
+from yuv.com_def import cvt_bit_depth, _get_uv_wh
+from yuv.yuv_io import YuvReader
+from yuv import tools
+from yuv.tools import Converter, Concat, Cut, MotionEstimate, Mask, FormatConverter, BitDepthConverter, Scaler
+
+
+def test_concat_seq_frame_ranges(make_seq, tmp_path):
+    seq_a, data_a = make_seq(16, 8, 4, name="a.yuv", seed=1)
+    seq_b, data_b = make_seq(16, 8, 3, name="b.yuv", seed=2)
+    target = Sequence(str(tmp_path), "out.yuv", 16, 8)
+    Concat.concat_seq([seq_a, seq_b], target, frame_ranges=[(1, 3), (0, None)])
+    expected = np.concatenate([data_a[1:3], data_b])
+    assert np.array_equal(np.fromfile(target.full_name(), np.uint8), expected.ravel())
+
+
+def test_copy_bytes_short_writes(tmp_path, monkeypatch):
+    src, dst = str(tmp_path / "src.bin"), str(tmp_path / "dst.bin")
+    data = bytes(range(256)) * 40
+    with open(src, "wb") as fp:
+        fp.write(data)
+    for name in ("copy_file_range", "sendfile"):
+        monkeypatch.delattr(os, name, raising=False)
+    write = os.write
+    monkeypatch.setattr(os, "write", lambda fd, buff: write(fd, bytes(buff[:7])))
+    monkeypatch.setattr(tools, "_COPY_CHUNK", 1000)
+    fd_src, fd_dst = os.open(src, os.O_RDONLY), os.open(dst, os.O_WRONLY | os.O_CREAT)
+    try:
+        tools._copy_bytes(fd_src, fd_dst, 10, 0, 5000)
+    finally:
+        os.close(fd_src)
+        os.close(fd_dst)
+    with open(dst, "rb") as fp:
+        assert fp.read() == data[10:5010]
+
+
+def test_cut_seq_multi(make_seq, tmp_path):
+    seq, _ = make_seq(48, 32, 3, BitDepth.BitDepth10, Format.YUV420)
+    regions = [Region(8, 4, 16, 12), Region(30, 20, 18, 12)]
+    saved = [copy.copy(region) for region in regions]
+    targets = [Sequence(str(tmp_path), f"cut{i}.yuv", r.width, r.height, bit_depth=BitDepth.BitDepth10,
+                        fmt=Format.YUV420) for i, r in enumerate(regions)]
+    Cut.cut_seq_multi(seq, regions, targets)
+    assert regions == saved
+    with YuvReader(seq) as reader:
+        frames = list(reader)
+    for region, target in zip(regions, targets):
+        with YuvReader(target) as reader:
+            cut = list(reader)
+        assert len(cut) == 3
+        for frame, result in zip(frames, cut):
+            expected = Cut.cut(frame, copy.copy(region))
+            for comp in Component:
+                assert np.array_equal(result[comp].get(), expected[comp].get())
+        assert np.array_equal(cut[0][Component.COMP_Y].get(),
+                              frames[0][Component.COMP_Y].get()[region.y:region.y + region.height,
+                                                                region.x:region.x + region.width])
+
+
+def _full_search(cur: np.ndarray, ref: np.ndarray, x: int, y: int, size: int, search_range: int, cost):
+    """
+    逐个位置计算代价的全搜索，代价相同时取距离起点最近、再按行优先最先出现的位置
+    """
+    unit = cur[y:y + size, x:x + size].astype(np.int64)
+    best = None
+    for ry in range(max(0, y - search_range), min(ref.shape[0] - size, y + search_range) + 1):
+        for rx in range(max(0, x - search_range), min(ref.shape[1] - size, x + search_range) + 1):
+            diff = ref[ry:ry + size, rx:rx + size] - unit
+            c = int(np.square(diff).sum() if cost == MotionEstimate.Cost.SSE else np.abs(diff).sum())
+            key = (c, abs(rx - x) + abs(ry - y), ry, rx)
+            best = key if best is None or key < best else best
+    return (best[3] - x, best[2] - y), best[0]
+
+
+def _smooth(height: int, width: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    return (128 + 60 * np.sin(x / 5 + rng.random()) * np.cos(y / 7) + rng.integers(0, 3, (height, width))).astype(
+        np.uint8)
+
+
+@pytest.mark.parametrize("cost", list(MotionEstimate.Cost))
+@pytest.mark.parametrize("flat", [False, True])
+def test_full_search_matches_exhaustive(cost, flat):
+    rng = np.random.default_rng(1)
+    ref = np.full((40, 48), 9, np.uint16) if flat else rng.integers(0, 1024, (40, 48)).astype(np.uint16)
+    cur = np.roll(ref, (2, -3), axis=(0, 1))
+    cur[::5] = rng.integers(0, 1024, cur[::5].shape)
+    frame = Frame(48, 40, BitDepth.BitDepth10, Format.YUV400, cur.ravel())
+    ref_frame = Frame(48, 40, BitDepth.BitDepth10, Format.YUV400, ref.ravel())
+    mv, costs = MotionEstimate.me_frame(frame, ref_frame, 8, 5, MotionEstimate.Method.FULL, cost)
+    assert mv.shape == (5, 6, 2) and costs.shape == (5, 6)
+    for row in range(5):
+        for col in range(6):
+            expected_mv, expected_cost = _full_search(cur, ref, col * 8, row * 8, 8, 5, cost)
+            assert tuple(mv[row, col]) == expected_mv and costs[row, col] == expected_cost
+    region = Region(13, 7, 8, 8)
+    assert MotionEstimate.me(Plane(cur, BitDepth.BitDepth10), region, Plane(ref, BitDepth.BitDepth10), 6,
+                             MotionEstimate.Method.FULL, cost) == _full_search(cur, ref, 13, 7, 8, 6, cost)
+
+
+@pytest.mark.parametrize("method", list(MotionEstimate.Method))
+def test_me_frame_finds_global_motion(method):
+    ref = _smooth(64, 96)
+    cur = np.roll(ref, (-2, 3), axis=(0, 1))
+    frame = Frame(96, 64, BitDepth.BitDepth8, Format.YUV400, cur.ravel())
+    ref_frame = Frame(96, 64, BitDepth.BitDepth8, Format.YUV400, ref.ravel())
+    mv, costs = MotionEstimate.me_frame(frame, ref_frame, 16, 8, method)
+    # 内部的块整体平移，mv 按 (x, y) 存放
+    assert np.all(mv[1:-1, 1:-1] == (-3, 2))
+    assert np.all(costs[1:-1, 1:-1] == 0)
+
+
+def _blank(width: int, height: int, bit_depth: BitDepth = BitDepth.BitDepth8) -> Frame:
+    dtype = np.uint8 if bit_depth == BitDepth.BitDepth8 else np.uint16
+    return Frame(width, height, bit_depth, Format.YUV420, np.zeros(width * height, dtype),
+                 np.zeros(width * height // 4, dtype), np.zeros(width * height // 4, dtype))
+
+
+def _check_mask(frame: Frame, mask: np.ndarray, color_rgb: tuple):
+    """
+    检查亮度掩码处为给定颜色、其余为0，色度按2x2采样块取或
+    """
+    yuv = np.array(Converter.rgb2yuv(color_rgb)) << (frame.bit_depth.value - 8)
+    assert np.array_equal(frame[Component.COMP_Y].get(), np.where(mask, yuv[0], 0))
+    mask_uv = mask.reshape(mask.shape[0] // 2, 2, mask.shape[1] // 2, 2).any(axis=(1, 3))
+    assert np.array_equal(frame[Component.COMP_U].get(), np.where(mask_uv, yuv[1], 0))
+    assert np.array_equal(frame[Component.COMP_V].get(), np.where(mask_uv, yuv[2], 0))
+
+
+def test_draw_grid():
+    frame = _blank(16, 8, BitDepth.BitDepth10)
+    Mask.draw_grid(frame, 4, 4, (255, 0, 0))
+    mask = np.zeros((8, 16), bool)
+    mask[[0, 4]] = True
+    mask[:, [0, 4, 8, 12]] = True
+    _check_mask(frame, mask, (255, 0, 0))
+
+    frame = _blank(16, 8)
+    Mask.draw_grid(frame, 4, 4, line_width=2, region=Region(4, 2, 8, 4))
+    mask = np.zeros((8, 16), bool)
+    # 区域的右边界和下边界上也画线，水平线不超出区域
+    mask[[2, 3, 6, 7], 4:12] = True
+    mask[2:6, [4, 5, 8, 9, 12, 13]] = True
+    _check_mask(frame, mask, (255, 255, 255))
+
+
+def test_draw_partition():
+    regions = [Region(0, 0, 8, 8), Region(8, 0, 8, 8), Region(0, 8, 16, 8)]
+    mask = np.zeros((16, 16), bool)
+    mask[[0, 8]] = True
+    mask[:, 0] = True
+    mask[:8, 8] = True
+    for arg in (regions, RegionArray.from_regions(regions), np.array([(r.x, r.y, r.width, r.height) for r in regions])):
+        frame = _blank(16, 16)
+        Mask.draw_partition(frame, arg, (0, 255, 0))
+        _check_mask(frame, mask, (0, 255, 0))
+
+
+@pytest.mark.parametrize("src", list(Format))
+@pytest.mark.parametrize("dst", list(Format))
+@pytest.mark.parametrize("filt", list(FormatConverter.Filter))
+def test_format_convert_odd_size(make_seq, tmp_path, src, dst, filt):
+    seq, _ = make_seq(33, 17, 3, BitDepth.BitDepth10, src)
+    target = Sequence(str(tmp_path), "out.yuv", 33, 17, bit_depth=BitDepth.BitDepth10, fmt=dst)
+    FormatConverter.convert_seq(seq, target, filt)
+    assert os.path.getsize(target.full_name()) == 3 * target.frame_size()
+    with YuvReader(seq) as reader:
+        frame = FormatConverter.convert(reader.read(), dst, filt)
+    with YuvReader(target) as reader:
+        expected = reader.read()
+    for comp in ((Component.COMP_Y,) if dst == Format.YUV400 else tuple(Component)):
+        assert np.array_equal(frame[comp].get(), expected[comp].get())
+    if dst != Format.YUV400:
+        width_uv, height_uv = _get_uv_wh(33, 17, dst)
+        assert frame[Component.COMP_U].get().shape == (height_uv, width_uv)
+
+
+def test_format_convert_nearest_444_to_420():
+    y = np.arange(33 * 17, dtype=np.uint8).reshape(17, 33)
+    y, u, v = FormatConverter.convert_batch(y, y.copy(), y.copy(), Format.YUV444, Format.YUV420,
+                                            BitDepth.BitDepth8, FormatConverter.Filter.NEAREST)
+    assert np.array_equal(u, y[0:16:2, 0:32:2])
+
+
+@pytest.mark.parametrize("filt", [FormatConverter.Filter.BILINEAR, FormatConverter.Filter.TAP4])
+def test_format_convert_cosited_phase(filt):
+    # 水平线性斜坡：co-sited 的色度采样点应与偶数位置的亮度采样点取值相同
+    ramp = np.tile(np.arange(0, 128, 4, dtype=np.uint8), (4, 1))
+    _, u, _ = FormatConverter.convert_batch(ramp, ramp.copy(), ramp.copy(), Format.YUV444, Format.YUV422,
+                                            BitDepth.BitDepth8, filt)
+    np.testing.assert_array_equal(u[:, 1:], ramp[:, 2::2])
+    _, u, _ = FormatConverter.convert_batch(ramp, u, u.copy(), Format.YUV422, Format.YUV444, BitDepth.BitDepth8, filt)
+    np.testing.assert_array_equal(u[:, 2:-4], ramp[:, 2:-4])
+
+
+def test_bit_depth_convert_seq(make_seq, tmp_path):
+    seq, data = make_seq(33, 17, 4, BitDepth.BitDepth10, Format.YUV420)
+    target = Sequence(str(tmp_path), "out.yuv", 33, 17, bit_depth=BitDepth.BitDepth8, fmt=Format.YUV420)
+    BitDepthConverter.convert_seq(seq, target, batch=3)
+    expected = cvt_bit_depth(data, BitDepth.BitDepth10, BitDepth.BitDepth8)
+    assert np.array_equal(np.fromfile(target.full_name(), np.uint8), expected.ravel())
+
+
+@pytest.mark.parametrize("fmt, scale, size", [
+    (Format.YUV420, 0.5, (16, 8)),
+    (Format.YUV420, 0.3, (10, 4)),
+    (Format.YUV422, 0.3, (10, 5)),
+    (Format.YUV444, 0.3, (10, 5)),
+    (Format.YUV420, 0.01, (2, 2)),
+])
+def test_scaled_size(fmt, scale, size):
+    assert Scaler.scaled_size(Sequence("", "", 33, 17, fmt=fmt), scale) == size
+
+
+@pytest.mark.parametrize("interp", [cv2.INTER_AREA, cv2.INTER_CUBIC])
+def test_scale_seq_multiple_scales(make_seq, tmp_path, interp):
+    seq, _ = make_seq(32, 16, 5, BitDepth.BitDepth10, Format.YUV420)
+    scales = [0.5, 1.5]
+    targets = [Sequence(str(tmp_path), f"out{i}.yuv", *Scaler.scaled_size(seq, s), bit_depth=BitDepth.BitDepth10)
+               for i, s in enumerate(scales)]
+    Scaler.scale_seq(seq, targets, scales, interp=interp, workers=2, batch=2)
+    with YuvReader(seq) as reader:
+        frames = list(reader)
+    for target, scale in zip(targets, scales):
+        with YuvReader(target) as reader:
+            result = list(reader)
+        assert len(result) == len(frames)
+        for frame, out in zip(frames, result):
+            expected = Scaler.scale(frame, scale, interp)
+            for comp in Component:
+                assert np.array_equal(out[comp].get(), expected[comp].get())
+                assert out[comp].get().max() <= 1023
+
+
+def test_paste_rounds_bit_depth():
+    canvas = Frame(4, 2, BitDepth.BitDepth8, Format.YUV400, np.zeros(8, np.uint8))
+    sub = Frame(2, 2, BitDepth.BitDepth10, Format.YUV400, np.array([1023, 2, 3, 6], np.uint16))
+    Mask.draw_frame_with_sub_frame(canvas, sub, 1, 0)
+    assert canvas[Component.COMP_Y].get().tolist() == [[0, 255, 1, 0], [0, 1, 2, 0]]
+
+
+def test_mosaic_seq(make_seq, tmp_path):
+    seqs = [make_seq(16, 8, 3 + i, name=f"s{i}.yuv", seed=i)[0] for i in range(3)]
+    position, width, height = Concat.grid([(16, 8)] * 3, 2, 2)
+    target = Sequence(str(tmp_path), "out.yuv", width, height)
+    Concat.mosaic_seq(seqs, target, rows=2, cols=2)
+    with YuvReader(target) as reader:
+        frames = list(reader)
+    assert len(frames) == 3
+    for seq, (x, y) in zip(seqs, position):
+        with YuvReader(seq) as reader:
+            for frame in frames:
+                src = reader.read()
+                assert np.array_equal(frame[Component.COMP_Y].get()[y:y + 8, x:x + 16], src[Component.COMP_Y].get())
+    # 空白处亮度为0、色度为中间值
+    assert not frames[0][Component.COMP_Y].get()[8:, 16:].any()
+    assert np.all(frames[0][Component.COMP_U].get()[4:, 8:] == 128)
+
+
+def test_concat_spatial_seq_rejects_misaligned_position(make_seq, tmp_path):
+    seq, _ = make_seq(16, 8, 1)
+    target = Sequence(str(tmp_path), "out.yuv", 33, 8)
+    with pytest.raises(ValueError):
+        Concat.concat_spatial_seq([seq, seq], target, np.array([[0, 0], [17, 0]]))
+    with pytest.raises(ValueError):
+        Concat.mosaic_seq([seq, seq], target, rows=1)
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from yuv.com_def import BitDepth, Format, Component, Sequence, Frame
+from yuv.yuv_io import YuvReader
+from yuv.y4m import Y4mHeader, Y4mReader, Y4mWriter
+from yuv.cache import FrameCache
+
+
+@pytest.mark.parametrize("fmt, bit_depth", [(Format.YUV420, BitDepth.BitDepth8), (Format.YUV422, BitDepth.BitDepth10),
+                                            (Format.YUV444, BitDepth.BitDepth16), (Format.YUV400, BitDepth.BitDepth8)])
+def test_round_trip(make_seq, tmp_path, fmt, bit_depth):
+    seq, data = make_seq(33, 17, 5, bit_depth, fmt)
+    target = Sequence(str(tmp_path), "out.y4m", 33, 17, 25, 1, bit_depth=bit_depth, fmt=fmt)
+    with YuvReader(seq) as reader, Y4mWriter(target) as writer:
+        writer.write_batch(*reader.read_batch(2))
+        for frame in reader:
+            writer.write(frame)
+        assert writer.frames() == 5
+    with Y4mReader(target.full_name()) as reader:
+        assert (reader.sequence.fmt, reader.sequence.bit_depth, reader.sequence.fps_num) == (fmt, bit_depth, 25)
+        assert reader.frames() == 5
+        y, _, _ = reader.read_batch(10)
+        assert np.array_equal(y.reshape(5, -1), data[:, :33 * 17])
+        with pytest.raises(EOFError):
+            reader.read()
+
+
+@pytest.mark.parametrize("kwargs", [dict(), dict(prefetch=2), dict(cache=FrameCache()), dict(buffers=2),
+                                    dict(components=[Component.COMP_Y])])
+def test_seek(make_seq, tmp_path, kwargs):
+    seq, data = make_seq(16, 8, 6)
+    target = Sequence(str(tmp_path), "out.y4m", 16, 8)
+    with YuvReader(seq) as reader, Y4mWriter(target) as writer:
+        writer.write_batch(*reader.read_batch(6))
+    with Y4mReader(target, **kwargs) as reader:
+        reader.seek(4)
+        assert np.array_equal(reader.read()[Component.COMP_Y].get().ravel(), data[4, :128])
+        reader.seek(-3)
+        y, _, _ = reader.read_batch(2)
+        assert np.array_equal(y.reshape(2, -1), data[2:4, :128])
+
+
+def test_write_at_and_append(make_seq, tmp_path):
+    seq, data = make_seq(16, 8, 4)
+    target = Sequence(str(tmp_path), "out.y4m", 16, 8)
+    with YuvReader(seq) as reader:
+        frames = [reader.read() for _ in range(4)]
+    with Y4mWriter(target) as writer:
+        writer.write(frames[0])
+    with Y4mWriter(target, append=True) as writer:
+        for frame in frames[1:]:
+            writer.write(frame)
+    with open(target.full_name(), "rb") as fp:
+        expected = fp.read()
+    with Y4mWriter(target, frames=4) as writer:
+        for i in reversed(range(4)):
+            writer.write_at(i, frames[i])
+    with open(target.full_name(), "rb") as fp:
+        assert fp.read() == expected
+
+
+def test_frame_parameters_and_extensions(tmp_path):
+    path = str(tmp_path / "in.y4m")
+    header = b"YUV4MPEG2 W4 H2 F30000:1001 It A0:0 C420mpeg2 XYSCSS=420MPEG2\n"
+    with open(path, "wb") as fp:
+        fp.write(header + b"FRAME Ixyz\n" + bytes(range(12)) + b"FRAME\n" + bytes(range(12, 24)) + b"FRAME\n\0\0")
+    with Y4mReader(path) as reader:
+        assert reader.frames() == 2
+        assert reader.header.extensions == ["XYSCSS=420MPEG2"]
+        assert (reader.sequence.fps_num, reader.sequence.fps_den) == (30000, 1001)
+        reader.seek(1)
+        assert reader.read()[Component.COMP_Y].get().ravel().tolist() == list(range(12, 20))
+        reader.seek(-2)
+        assert reader.read()[Component.COMP_V].get().ravel().tolist() == [10, 11]
+
+
+@pytest.mark.parametrize("line, fmt, bit_depth", [
+    (b"YUV4MPEG2 W8 H8", Format.YUV420, BitDepth.BitDepth8),
+    (b"YUV4MPEG2 W8 H8 C422p10", Format.YUV422, BitDepth.BitDepth10),
+    (b"YUV4MPEG2 W8 H8 Cmono16", Format.YUV400, BitDepth.BitDepth16),
+    (b"YUV4MPEG2 W8 H8 C444p12", Format.YUV444, BitDepth.BitDepth12),
+])
+def test_header_parse(line, fmt, bit_depth):
+    header = Y4mHeader.parse(line)
+    assert (header.fmt, header.bit_depth) == (fmt, bit_depth)
+    assert Y4mHeader.parse(header.to_bytes()[:-1]).chroma == header.chroma
+
+
+@pytest.mark.parametrize("line", [b"YUV4MPEG W8 H8", b"YUV4MPEG2 W8", b"YUV4MPEG2 W8 H8 C420p9",
+                                  b"YUV4MPEG2 W8 H8 C444alpha"])
+def test_header_invalid(line):
+    with pytest.raises(ValueError):
+        Y4mHeader.parse(line)
+
+
+def test_size_mismatch(tmp_path):
+    target = Sequence(str(tmp_path), "out.y4m", 16, 8)
+    with Y4mWriter(target) as writer:
+        writer.write(Frame(16, 8, BitDepth.BitDepth8, Format.YUV420, np.zeros(128, np.uint8),
+                           np.zeros(32, np.uint8), np.zeros(32, np.uint8)))
+    with pytest.raises(ValueError):
+        Y4mReader(Sequence(str(tmp_path), "out.y4m", 8, 8))
@@ -0,0 +1,166 @@
+import numpy as np
+import pytest
+
+from yuv.com_def import BitDepth, Format, Component, Sequence, _get_uv_wh
+from yuv.yuv_io import YuvReader, YuvWriter, YuvMmapReader
+from yuv.cache import FrameCache
+
+
+def test_mmap_random_access(make_seq):
+    seq, data = make_seq(33, 17, 5, BitDepth.BitDepth10, Format.YUV420)
+    area_y = 33 * 17
+    width_uv, height_uv = _get_uv_wh(33, 17, Format.YUV420)
+    with YuvMmapReader(seq) as reader:
+        assert len(reader) == reader.frames() == 5
+        assert np.array_equal(reader[3][Component.COMP_Y].get().ravel(), data[3, :area_y])
+        assert np.array_equal(reader[-1][Component.COMP_V].get().ravel(), data[4, -width_uv * height_uv:])
+        frames = reader[1:4]
+        assert [np.array_equal(f[Component.COMP_Y].get().ravel(), data[i, :area_y])
+                for i, f in zip(range(1, 4), frames)] == [True] * 3
+        reader.seek(4)
+        reader.read()
+        with pytest.raises(EOFError):
+            reader.read()
+
+
+def test_mmap_copy_on_write(make_seq):
+    seq, data = make_seq(16, 8, 2)
+    with YuvMmapReader(seq, mode="c") as reader:
+        frames = list(reader)
+        frames[0][Component.COMP_Y].get()[:] = 0
+    assert len(frames) == 2
+    assert np.array_equal(np.fromfile(seq.full_name(), np.uint8), data.ravel())
+
+
+def test_mmap_empty_file(tmp_path):
+    seq = Sequence(str(tmp_path), "empty.yuv", 16, 8)
+    open(seq.full_name(), "wb").close()
+    with YuvMmapReader(seq) as reader:
+        assert len(reader) == 0
+        assert list(reader) == []
+
+
+@pytest.mark.parametrize("kwargs", [dict(), dict(buffers=2), dict(prefetch=2), dict(buffers=2, prefetch=2),
+                                    dict(cache=FrameCache())])
+def test_read_and_seek(make_seq, kwargs):
+    seq, data = make_seq(16, 8, 6)
+    area_y = 16 * 8
+    with YuvReader(seq, **kwargs) as reader:
+        assert reader.frames() == 6
+        assert np.array_equal(reader.read()[Component.COMP_Y].get().ravel(), data[0, :area_y])
+        reader.seek(2)
+        y, _, _ = reader.read_batch(2)
+        assert np.array_equal(y.reshape(2, -1), data[3:5, :area_y])
+        reader.seek(-5)
+        assert np.array_equal(reader.read()[Component.COMP_Y].get().ravel(), data[0, :area_y])
+
+
+def test_prefetch_iterates_all_frames(make_seq):
+    seq, data = make_seq(16, 8, 7)
+    with YuvReader(seq, prefetch=3) as reader:
+        frames = [f[Component.COMP_Y].get().ravel().copy() for f in reader]
+        reader.seek(-7)
+        first = reader.read()[Component.COMP_Y].get().ravel()
+    assert np.array_equal(np.stack(frames), data[:, :16 * 8])
+    assert np.array_equal(first, data[0, :16 * 8])
+
+
+def test_reused_buffers(make_seq):
+    seq, data = make_seq(16, 8, 4)
+    with YuvReader(seq, buffers=2) as reader:
+        frames = list(reader)
+    assert len(frames) == 4
+    # 第i帧的缓冲区在读取第i+2帧时被复用
+    assert np.shares_memory(frames[0][Component.COMP_Y].get(), frames[2][Component.COMP_Y].get())
+    assert np.array_equal(frames[0][Component.COMP_Y].get().ravel(), data[2, :16 * 8])
+    assert not np.shares_memory(frames[0][Component.COMP_Y].get(), frames[1][Component.COMP_Y].get())
+
+
+@pytest.mark.parametrize("fmt", list(Format))
+def test_iter_batches(make_seq, fmt):
+    seq, data = make_seq(33, 17, 5, BitDepth.BitDepth10, fmt)
+    with YuvReader(seq) as reader:
+        batches = list(reader.iter_batches(2))
+        with pytest.raises(EOFError):
+            reader.read_batch(2)
+    assert [y.shape[0] for y, _, _ in batches] == [2, 2, 1]
+    planes = [np.concatenate([p.reshape(p.shape[0], -1) for p in batch if p is not None], axis=1)
+              for batch in batches]
+    assert np.array_equal(np.concatenate(planes), data)
+    y, u, v = batches[0]
+    assert y.shape == (2, 17, 33)
+    if fmt == Format.YUV400:
+        assert u is None and v is None
+    else:
+        width_uv, height_uv = _get_uv_wh(33, 17, fmt)
+        assert u.shape == v.shape == (2, height_uv, width_uv)
+        # 各分量为同一块连续内存的视图
+        assert np.may_share_memory(y, v)
+
+
+def test_components_lazy(make_seq):
+    seq, data = make_seq(33, 17, 3, BitDepth.BitDepth10, Format.YUV420)
+    area_y = 33 * 17
+    width_uv, height_uv = _get_uv_wh(33, 17, Format.YUV420)
+    area_uv = width_uv * height_uv
+    with YuvReader(seq, components=[Component.COMP_Y]) as reader:
+        frame = reader.read()
+        assert frame.loaded(Component.COMP_Y) and not frame.loaded(Component.COMP_U)
+        assert np.array_equal(frame[Component.COMP_Y].get().ravel(), data[0, :area_y])
+        # 未读取的分量在访问时才加载
+        assert np.array_equal(frame[Component.COMP_V].get().ravel(), data[0, area_y + area_uv:])
+        assert frame.loaded(Component.COMP_V) and not frame.loaded(Component.COMP_U)
+        y, u, v = reader.read_batch(5)
+    assert u is None and v is None
+    assert np.array_equal(y.reshape(2, -1), data[1:, :area_y])
+
+
+def test_components_rejects_verify(make_seq):
+    seq, _ = make_seq(16, 8, 1)
+    with pytest.raises(ValueError):
+        YuvReader(seq, components=[Component.COMP_Y], verify=True)
+
+
+def test_write_batch_rejects_mismatched_planes(tmp_path):
+    seq = Sequence(str(tmp_path), "out.yuv", 33, 17, fmt=Format.YUV420)
+    y = np.zeros((1, 17, 33), np.uint8)
+    with YuvWriter(seq) as writer:
+        with pytest.raises(ValueError):
+            writer.write_batch(y, np.zeros((1, 9, 17), np.uint8), np.zeros((1, 9, 17), np.uint8))
+        with pytest.raises(ValueError):
+            writer.write_batch(y.astype(np.uint16), np.zeros((1, 8, 16), np.uint16), np.zeros((1, 8, 16), np.uint16))
+        with pytest.raises(ValueError):
+            writer.write_batch(y)
+    with YuvWriter(seq) as writer:
+        assert writer.frames() == 0
+
+
+@pytest.mark.parametrize("fmt", list(Format))
+def test_read_write_batch_round_trip(make_seq, tmp_path, fmt):
+    seq, data = make_seq(33, 17, 5, BitDepth.BitDepth10, fmt)
+    target = Sequence(str(tmp_path), "out.yuv", 33, 17, bit_depth=BitDepth.BitDepth10, fmt=fmt)
+    with YuvReader(seq) as reader, YuvWriter(target) as writer:
+        for batch in reader.iter_batches(2):
+            writer.write_batch(*batch)
+    assert np.array_equal(np.fromfile(target.full_name(), np.uint16), data.ravel())
+
+
+def test_write_at_preallocated(make_seq, tmp_path):
+    seq, data = make_seq(33, 17, 4, BitDepth.BitDepth10, Format.YUV422)
+    target = Sequence(str(tmp_path), "out.yuv", 33, 17, bit_depth=BitDepth.BitDepth10, fmt=Format.YUV422)
+    with YuvReader(seq) as reader:
+        frames = list(reader)
+    with YuvWriter(target, frames=5) as writer:
+        assert writer.frames() == 5
+        writer.write_at(3, frames[3])
+    # 其他写入者打开预先分配的文件时不能清空已写入的帧
+    with YuvWriter(target, truncate=False) as writer:
+        writer.write_at(0, frames[0])
+        y, u, v = (p[np.newaxis] for p in (frames[1][c].get() for c in Component))
+        writer.write_batch_at(1, y, u, v)
+    out = np.fromfile(target.full_name(), np.uint16).reshape(5, -1)
+    assert np.array_equal(out[[0, 1, 3]], data[[0, 1, 3]])
+    assert not out[[2, 4]].any()
+    with YuvWriter(target, append=True) as writer:
+        with pytest.raises(ValueError):
+            writer.write_at(0, frames[0])
@@ -0,0 +1,137 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Hashable, NoReturn, Optional, Tuple, Union
+
+import numpy as np
+
+from yuv.com_def import Component, Sequence
+
+# 进程内默认缓存的容量（字节）
+DEFAULT_BUDGET = 1 << 30
+
+# 缓存的帧数据：整帧的一维缓冲区，或部分分量的数组
+CacheItem = Union[np.ndarray, Dict[Component, np.ndarray]]
+
+
+def _nbytes(item: CacheItem) -> int:
+    if isinstance(item, np.ndarray):
+        return item.nbytes
+    return sum(buff.nbytes for buff in item.values())
+
+
+def _freeze(item: CacheItem) -> NoReturn:
+    """
+    将缓存的数据设为只读，避免调用者原地修改缓存的内容
+    """
+    for buff in (item,) if isinstance(item, np.ndarray) else item.values():
+        buff.flags.writeable = False
+
+
+class FrameCache(object):
+    """
+    按字节数限制容量的LRU帧缓存，线程安全。
+    键由文件名、修改时间、解码后的宽高、格式、比特深度、文件的存储方式、帧序号和分量组成，
+    以不同参数读取同一文件时不会共享缓存；文件被修改后旧的缓存不会再被命中，并随LRU被淘汰
+    """
+
+    def __init__(self, budget: int = DEFAULT_BUDGET):
+        """
+        :param budget: 缓存的最大字节数
+        """
+        self._budget = budget
+        self._items: "OrderedDict[Hashable, CacheItem]" = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(seq: Sequence, mtime_ns: int, idx: int, components: Optional[FrozenSet[Component]] = None,
+            layout: Hashable = None) -> Tuple:
+        """
+        :param seq: 序列对象，宽高、格式和比特深度为解码后的帧
+        :param components: 读取的分量，None 表示整帧
+        :param layout: 文件中帧的存储方式（如平面、Y4M 或某种打包格式）
+        """
+        return seq.full_name(), mtime_ns, seq.width, seq.height, seq.fmt, seq.bit_depth, layout, idx, components
+
+    @property
+    def budget(self) -> int:
+        return self._budget
+
+    @budget.setter
+    def budget(self, budget: int):
+        with self._lock:
+            self._budget = budget
+            self._evict()
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key: Hashable):
+        return key in self._items
+
+    def get(self, key: Hashable) -> Optional[CacheItem]:
+        """
+        :return: 缓存的只读数据，未命中时返回None
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, key: Hashable, item: CacheItem) -> NoReturn:
+        """
+        缓存一帧的数据，数据被设为只读，调用者之后不能再修改。超过容量的数据不缓存
+        """
+        size = _nbytes(item)
+        if size > self._budget:
+            return
+        _freeze(item)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._nbytes -= _nbytes(old)
+            self._items[key] = item
+            self._nbytes += size
+            self._evict()
+
+    def _evict(self) -> NoReturn:
+        while self._nbytes > self._budget and self._items:
+            _, item = self._items.popitem(last=False)
+            self._nbytes -= _nbytes(item)
+
+    def clear(self) -> NoReturn:
+        with self._lock:
+            self._items.clear()
+            self._nbytes = 0
+
+    def reset_stats(self) -> NoReturn:
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        :return: 命中次数、未命中次数、命中率、缓存的帧数和字节数
+        """
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "frames": len(self._items), "nbytes": self._nbytes, "budget": self._budget}
+
+
+_default_cache = FrameCache()
+
+
+def default_cache() -> FrameCache:
+    """
+    :return: 进程内共享的默认缓存，`YuvReader(cache=True)` 使用该缓存
+    """
+    return _default_cache
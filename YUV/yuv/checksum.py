@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NoReturn, Optional, Tuple, Union
+
+from yuv.com_def import Sequence
+
+# 每次读取的帧数
+_BATCH = 16
+
+
+def digest(data: Union[bytes, memoryview], plane_sizes: Tuple[int, ...], algorithm: str,
+           per_plane: bool) -> Union[str, List[str]]:
+    """
+    计算一帧数据的摘要
+    :param data: 一帧的数据
+    :param plane_sizes: 各分量的字节数
+    :param algorithm: hashlib 支持的算法名
+    :param per_plane: 为True时分别计算各分量的摘要
+    :return: 整帧的摘要，或各分量的摘要列表
+    """
+    if not per_plane:
+        return hashlib.new(algorithm, data).hexdigest()
+    result = list()
+    offset = 0
+    for size in plane_sizes:
+        result.append(hashlib.new(algorithm, data[offset:offset + size]).hexdigest())
+        offset += size
+    return result
+
+
+def _digest_range(path: str, plane_sizes: Tuple[int, ...], start: int, frames: int,
+                  algorithm: str, per_plane: bool) -> List[Union[str, List[str]]]:
+    """
+    计算 [start, start + frames) 范围内各帧的摘要，作为进程池的任务
+    """
+    frame_size = sum(plane_sizes)
+    buff = bytearray(frame_size * min(_BATCH, max(frames, 1)))
+    result = list()
+    with open(path, "rb") as fp:
+        fp.seek(start * frame_size, os.SEEK_SET)
+        while frames > 0:
+            n = min(_BATCH, frames)
+            view = memoryview(buff)[:n * frame_size]
+            if fp.readinto(view) < view.nbytes:
+                raise EOFError(f"End of file: {path}")
+            for i in range(n):
+                result.append(digest(view[i * frame_size:(i + 1) * frame_size], plane_sizes, algorithm, per_plane))
+            frames -= n
+    return result
+
+
+class FrameIndex(object):
+    """
+    序列的逐帧摘要索引，保存在序列旁的 `<序列文件名>.idx.json` 文件中。
+    文件大小或修改时间变化后索引自动失效。序列所在目录不可写时索引只保存在内存中
+    """
+    SUFFIX = ".idx.json"
+
+    def __init__(self, seq: Sequence, algorithm: str, per_plane: bool, digests: List[Union[str, List[str]]],
+                 size: int, mtime_ns: int):
+        self.sequence = seq
+        self.algorithm = algorithm
+        self.per_plane = per_plane
+        self.digests = digests
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self._plane_sizes = seq.plane_sizes()
+
+    @staticmethod
+    def path(seq: Sequence) -> str:
+        return seq.full_name() + FrameIndex.SUFFIX
+
+    def __len__(self):
+        return len(self.digests)
+
+    def __getitem__(self, idx: int) -> Union[str, List[str]]:
+        return self.digests[idx]
+
+    def verify(self, idx: int, data: Union[bytes, memoryview]) -> bool:
+        """
+        校验一帧的数据
+        :param idx: 帧序号
+        :param data: 该帧的数据
+        :return: 是否与索引一致
+        """
+        return digest(data, self._plane_sizes, self.algorithm, self.per_plane) == self.digests[idx]
+
+    def find(self, value: Union[str, List[str]]) -> List[int]:
+        """
+        :param value: 帧（或各分量）的摘要
+        :return: 摘要相同的帧序号列表
+        """
+        return [i for i, d in enumerate(self.digests) if d == value]
+
+    def duplicates(self) -> List[List[int]]:
+        """
+        :return: 内容相同的帧序号分组，只包含出现多次的帧
+        """
+        groups: Dict[str, List[int]] = dict()
+        for i, d in enumerate(self.digests):
+            groups.setdefault(str(d), list()).append(i)
+        return [g for g in groups.values() if len(g) > 1]
+
+    def diff(self, other) -> List[int]:
+        """
+        :param other: 另一个序列的索引，算法和分量设置须相同
+        :return: 摘要不同的帧序号，帧数不同时多出的帧也计入
+        """
+        assert (self.algorithm, self.per_plane) == (other.algorithm, other.per_plane)
+        common = min(len(self), len(other))
+        result = [i for i in range(common) if self.digests[i] != other.digests[i]]
+        return result + list(range(common, max(len(self), len(other))))
+
+    def save(self) -> NoReturn:
+        with open(self.path(self.sequence), "w") as fp:
+            json.dump({
+                "name": self.sequence.name,
+                "frame_size": sum(self._plane_sizes),
+                "algorithm": self.algorithm,
+                "per_plane": self.per_plane,
+                "size": self.size,
+                "mtime_ns": self.mtime_ns,
+                "digests": self.digests,
+            }, fp)
+
+    @staticmethod
+    def load(seq: Sequence) -> Optional["FrameIndex"]:
+        """
+        读取序列的索引
+        :param seq: 序列对象
+        :return: 索引对象，索引不存在或已失效时返回None
+        """
+        path = FrameIndex.path(seq)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "r") as fp:
+            data = json.load(fp)
+        st = os.stat(seq.full_name())
+        if (data["size"], data["mtime_ns"], data["frame_size"]) != (st.st_size, st.st_mtime_ns, seq.frame_size()):
+            return None
+        return FrameIndex(seq, data["algorithm"], data["per_plane"], data["digests"], data["size"], data["mtime_ns"])
+
+    @staticmethod
+    def build(seq: Sequence, algorithm: str = "md5", per_plane: bool = False,
+              workers: Optional[int] = None) -> "FrameIndex":
+        """
+        计算序列的逐帧摘要并保存索引，无法保存时给出警告并只返回内存中的索引
+        :param seq: 序列对象
+        :param algorithm: hashlib 支持的算法名，如 "md5"，追求速度时可用 "blake2b"
+        :param per_plane: 为True时分别计算各分量的摘要
+        :param workers: 进程数，None 或 1 表示在当前进程中计算
+        :return: 索引对象
+        """
+        plane_sizes = seq.plane_sizes()
+        st = os.stat(seq.full_name())
+        frames = st.st_size // sum(plane_sizes)
+        if workers is None or workers <= 1 or frames <= _BATCH:
+            digests = _digest_range(seq.full_name(), plane_sizes, 0, frames, algorithm, per_plane)
+        else:
+            step = -(-frames // workers)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_digest_range, seq.full_name(), plane_sizes, s, min(step, frames - s),
+                                           algorithm, per_plane) for s in range(0, frames, step)]
+                digests = [d for f in futures for d in f.result()]
+        index = FrameIndex(seq, algorithm, per_plane, digests, st.st_size, st.st_mtime_ns)
+        try:
+            index.save()
+        except OSError as e:
+            # 如只读的共享目录，索引只保存在内存中
+            warnings.warn(f"Can not save frame index {FrameIndex.path(seq)}, keeping it in memory: {e}")
+        return index
+
+    @staticmethod
+    def get(seq: Sequence, algorithm: str = "md5", per_plane: bool = False,
+            workers: Optional[int] = None) -> "FrameIndex":
+        """
+        读取序列的索引，索引不存在、已失效或设置不同时重新计算
+        :return: 索引对象
+        """
+        index = FrameIndex.load(seq)
+        if index is None or (index.algorithm, index.per_plane) != (algorithm, per_plane):
+            index = FrameIndex.build(seq, algorithm, per_plane, workers)
+        return index
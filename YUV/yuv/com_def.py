@@ -4,7 +4,7 @@ import os
 import cv2
 import numpy as np
 import re
-from typing import Optional, Union, Dict, List
+from typing import Optional, Union, Dict, List, Callable, Tuple
 
 
 class BitDepth(Enum):
@@ -44,7 +44,7 @@ def _get_uv_wh(width: int, height: int, fmt: Format):
         width_uv = width
         height_uv = height
     elif fmt == Format.YUV422:
-        width_uv = width
+        width_uv = width >> 1
         height_uv = height
     elif fmt == Format.YUV420:
         width_uv = width >> 1
@@ -55,7 +55,58 @@ def _get_uv_wh(width: int, height: int, fmt: Format):
     return width_uv, height_uv
 
 
+def _dtype(bit_depth: BitDepth):
+    return np.uint8 if bit_depth == BitDepth.BitDepth8 else np.uint16
+
+
+def cvt_bit_depth(buff: np.ndarray, bit_depth: BitDepth, target_bit_depth: BitDepth,
+                  out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    转换像素数据的比特深度。升高时左移，降低时加上舍入偏移 1 << (shift - 1) 后右移并截断到目标范围。
+    数据类型只在需要时提升一次，中间结果尽量原地计算
+    :param buff: 像素数据
+    :param bit_depth: 源比特深度
+    :param target_bit_depth: 目标比特深度
+    :param out: 存放结果的数组，类型须与目标比特深度一致，可以与 buff 相同以原地转换；为None时分配新的数组
+    :return: 目标比特深度的像素数据
+    """
+    dtype = _dtype(target_bit_depth)
+    shift = target_bit_depth.value - bit_depth.value
+    if shift >= 0:
+        return np.left_shift(buff, shift, out=out, dtype=dtype)
+    return _round_shift(buff, bit_depth, -shift, (1 << target_bit_depth.value) - 1, dtype, out)
+
+
+def _round_shift(buff: np.ndarray, bit_depth: BitDepth, shift: int, max_value: int, dtype,
+                 out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    加上舍入偏移 1 << (shift - 1) 后右移 shift 位，并截断到 max_value
+    :param buff: 像素数据
+    :param bit_depth: 源比特深度，源数据占满数据类型的所有位（如16比特的 uint16）时先提升一次类型，避免加上舍入偏移后溢出
+    :param shift: 右移的位数，须大于0
+    :param max_value: 结果的最大值
+    :param dtype: 结果的数据类型
+    :param out: 存放结果的数组，可以与 buff 相同以原地计算；为None时分配新的数组
+    :return: 结果
+    """
+    itemsize = buff.dtype.itemsize
+    work_dtype = buff.dtype if bit_depth.value < 8 * itemsize else (np.uint32 if itemsize > 1 else np.uint16)
+    if out is not None and out.dtype == work_dtype:
+        tmp = np.add(buff, 1 << (shift - 1), out=out, dtype=work_dtype)
+    else:
+        tmp = np.add(buff, 1 << (shift - 1), dtype=work_dtype)
+    np.right_shift(tmp, shift, out=tmp)
+    np.minimum(tmp, max_value, out=tmp)
+    if out is None:
+        return tmp.astype(dtype, copy=False)
+    if out is not tmp:
+        out[...] = tmp
+    return out
+
+
 class Region(object):
+    __slots__ = ("x", "y", "width", "height")
+
     def __init__(self, x, y, w, h):
         self.x = x
         self.y = y
@@ -96,7 +147,131 @@ class Region(object):
         return f"{self.x}, {self.y}, {self.width}, {self.height}"
 
 
+class RegionArray(object):
+    """
+    以形状为 (N, 4) 的整数数组存放的一组区域，每行为 (x, y, width, height)。
+    批量地裁剪、移位和求交，代替对大量 `Region` 逐个操作
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data=None):
+        """
+        :param data: 形状为 (N, 4) 的数组或可以转换为该形状的序列，会被拷贝
+        """
+        if data is None:
+            data = np.empty((0, 4), dtype=np.int64)
+        self.data = np.array(data, dtype=np.int64).reshape(-1, 4)
+
+    @staticmethod
+    def from_regions(regions: List[Region]) -> "RegionArray":
+        return RegionArray([(r.x, r.y, r.width, r.height) for r in regions])
+
+    @staticmethod
+    def grid(width: int, height: int, block_width: int, block_height: int,
+             include_incomplete_border: bool = False) -> "RegionArray":
+        """
+        按行优先划分图像得到的所有块，如全部CTU
+        :param include_incomplete_border: 是否包含不完整的边界块，包含时边界块的大小被裁剪到图像内
+        """
+        rows, cols = height // block_height, width // block_width
+        if include_incomplete_border:
+            rows, cols = -(-height // block_height), -(-width // block_width)
+        ys, xs = np.mgrid[0:rows * block_height:block_height, 0:cols * block_width:block_width]
+        data = np.empty((rows * cols, 4), dtype=np.int64)
+        data[:, 0] = xs.ravel()
+        data[:, 1] = ys.ravel()
+        data[:, 2] = block_width
+        data[:, 3] = block_height
+        result = RegionArray.__new__(RegionArray)
+        result.data = data
+        return result.clip(width, height)
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.data[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.data[:, 1]
+
+    @property
+    def width(self) -> np.ndarray:
+        return self.data[:, 2]
+
+    @property
+    def height(self) -> np.ndarray:
+        return self.data[:, 3]
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, item) -> Union[Region, "RegionArray"]:
+        if isinstance(item, (int, np.integer)):
+            x, y, w, h = self.data[item].tolist()
+            return Region(x, y, w, h)
+        return RegionArray(self.data[item])
+
+    def __iter__(self):
+        for x, y, w, h in self.data.tolist():
+            yield Region(x, y, w, h)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.data if dtype is None else self.data.astype(dtype)
+
+    def area(self) -> np.ndarray:
+        return self.data[:, 2] * self.data[:, 3]
+
+    def clip(self, width: int, height: int) -> "RegionArray":
+        """
+        原地将所有区域裁剪到 width x height 的图像内，与 `Plane.ensure_roi` 的规则一致
+        :return: self
+        """
+        d = self.data
+        np.clip(d[:, 0], 0, width, out=d[:, 0])
+        np.clip(d[:, 1], 0, height, out=d[:, 1])
+        np.minimum(d[:, 2], width - d[:, 0], out=d[:, 2])
+        np.minimum(d[:, 3], height - d[:, 1], out=d[:, 3])
+        return self
+
+    def intersect(self, other: Union[Region, "RegionArray"]) -> "RegionArray":
+        """
+        求各区域与另一个区域（或逐行与另一组区域）的交集，不相交时宽高为0
+        :return: 新的区域数组
+        """
+        o = np.array([[other.x, other.y, other.width, other.height]]) if isinstance(other, Region) else other.data
+        x0 = np.maximum(self.data[:, 0], o[:, 0])
+        y0 = np.maximum(self.data[:, 1], o[:, 1])
+        x1 = np.minimum(self.data[:, 0] + self.data[:, 2], o[:, 0] + o[:, 2])
+        y1 = np.minimum(self.data[:, 1] + self.data[:, 3], o[:, 1] + o[:, 3])
+        return RegionArray(np.stack([x0, y0, np.maximum(x1 - x0, 0), np.maximum(y1 - y0, 0)], axis=1))
+
+    def __ilshift__(self, shift: int):
+        self.data <<= shift
+        return self
+
+    def __lshift__(self, shift: int):
+        return RegionArray(self.data << shift)
+
+    def __irshift__(self, shift: int):
+        self.data >>= shift
+        return self
+
+    def __rshift__(self, shift: int):
+        return RegionArray(self.data >> shift)
+
+    def __str__(self):
+        return str(self.data)
+
+
+# 各格式的色度下采样 (sx, sy)
+_UV_SCALE = {Format.YUV444: (0, 0), Format.YUV422: (1, 0), Format.YUV420: (1, 1)}
+# 以 `Component.value` 为下标的分量
+_COMPONENTS = tuple(Component)
+
+
 class MetaData(object):
+    __slots__ = ("region", "fmt", "bit_depth")
+
     def __init__(self, region: Region, fmt: Format = None, bit_depth: BitDepth = None):
         self.region = region
         self.fmt = fmt
@@ -110,36 +285,59 @@ class MetaData(object):
     def uv_scale(self):
         if self.fmt == Format.YUV400:
             raise ValueError("YUV400 no uv")
-        if self.fmt == Format.YUV444:
-            return 0, 0
-        if self.fmt == Format.YUV420:
-            return 1, 1
-        if self.fmt == Format.YUV422:
-            return 1, 0
+        return _UV_SCALE.get(self.fmt)
+
+    def plane_sizes(self) -> Tuple[int, ...]:
+        """
+        :return: 一帧中各分量的字节数，YUV400 格式只有亮度分量
+        """
+        shift = 0 if self.bit_depth == BitDepth.BitDepth8 else 1
+        size_y = (self.region.width * self.region.height) << shift
+        if self.fmt == Format.YUV400:
+            return size_y,
+        width_uv, height_uv = _get_uv_wh(self.region.width, self.region.height, self.fmt)
+        size_uv = (width_uv * height_uv) << shift
+        return size_y, size_uv, size_uv
+
+    def frame_size(self) -> int:
+        """
+        :return: 一帧数据的字节数
+        """
+        return sum(self.plane_sizes())
 
 
 class Plane(MetaData):
+    __slots__ = ("buff",)
+
     def __init__(self, buff: np.ndarray, bit_depth: BitDepth):
         h, w = buff.shape
-        MetaData.__init__(self, Region(0, 0, w, h), fmt=Format.YUV400, bit_depth=bit_depth)
+        self.region = Region(0, 0, w, h)
+        self.fmt = Format.YUV400
+        self.bit_depth = bit_depth
         self.buff = buff
 
     def __ilshift__(self, shift: int):
+        if self.buff.dtype == np.uint8 and shift > 0:
+            # 8比特数据左移会溢出，先提升为 uint16
+            self.buff = self.buff.astype(np.uint16)
         self.buff <<= shift
         return self
 
     def __lshift__(self, shift: int):
-        return Plane(self.buff << shift, bit_depth=self.bit_depth)
+        dtype = np.uint16 if shift > 0 else self.buff.dtype
+        return Plane(np.left_shift(self.buff, shift, dtype=dtype), bit_depth=self.bit_depth)
 
     def __irshift__(self, shift: int):
-        self.buff += (shift >> 1)
-        self.buff >>= shift
+        if shift > 0:
+            _round_shift(self.buff, self.bit_depth, shift, ((1 << self.bit_depth.value) - 1) >> shift,
+                         self.buff.dtype, out=self.buff)
         return self
 
     def __rshift__(self, shift: int):
-        buff = self.buff + (shift >> 1)
-        buff >>= shift
-        return Plane(buff, bit_depth=self.bit_depth)
+        if shift <= 0:
+            return Plane(self.buff.copy(), bit_depth=self.bit_depth)
+        return Plane(_round_shift(self.buff, self.bit_depth, shift, ((1 << self.bit_depth.value) - 1) >> shift,
+                                  self.buff.dtype), bit_depth=self.bit_depth)
 
     def __getitem__(self, region: Region):
         self.ensure_roi(region)
@@ -161,18 +359,36 @@ class Plane(MetaData):
         return self.width * self.height
 
     def cvt_bit_depth(self, target_bit_depth: BitDepth):
-        bd_diff = target_bit_depth.value - self.bit_depth.value
-        if bd_diff > 0:
-            self.__ilshift__(bd_diff)
-        elif bd_diff < 0:
-            self.__irshift__(-bd_diff)
-
+        # 数据类型不变且可写时原地转换
+        out = None
+        if self.buff.dtype == _dtype(target_bit_depth) and self.buff.flags.writeable:
+            out = self.buff
+        self.buff = cvt_bit_depth(self.buff, self.bit_depth, target_bit_depth, out=out)
         self.bit_depth = target_bit_depth
         return self
 
     def update(self, buff):
         self.__init__(buff, self.bit_depth)
 
+    def blocks(self, block_width: int, block_height: int, pad: bool = False) -> np.ndarray:
+        """
+        将平面划分为互不重叠的块，返回四维视图，不拷贝数据
+        :param block_width: 块的宽度
+        :param block_height: 块的高度
+        :param pad: 为True时将不完整的边界块按边缘像素填充（此时会拷贝数据），否则丢弃不完整的边界块
+        :return: 形状为 (rows, cols, block_height, block_width) 的数组，[r, c] 为第r行第c列的块
+        """
+        buff = self.buff
+        rows, cols = self.height // block_height, self.width // block_width
+        if pad:
+            rows, cols = -(-self.height // block_height), -(-self.width // block_width)
+            pad_h, pad_w = rows * block_height - self.height, cols * block_width - self.width
+            if pad_h or pad_w:
+                buff = np.pad(buff, ((0, pad_h), (0, pad_w)), mode="edge")
+        sy, sx = buff.strides
+        return np.lib.stride_tricks.as_strided(buff, shape=(rows, cols, block_height, block_width),
+                                               strides=(sy * block_height, sx * block_width, sy, sx))
+
     def ensure_roi(self, region: Region):
         region.x = _clip3(region.x, 0, self.width)
         region.y = _clip3(region.y, 0, self.height)
@@ -183,7 +399,13 @@ class Plane(MetaData):
             region.height = self.height - region.y
 
 
-class Frame(Dict[Component, Plane], MetaData):
+class Frame(MetaData):
+    """
+    一帧图像。各分量存放在以 `Component.value` 为下标的定长列表中，
+    支持 `frame[comp]`、`frame.get(comp)`、`comp in frame`、`keys()`、`items()` 等与字典相同的分量访问方式
+    """
+    __slots__ = ("_planes",)
+
     @property
     def width(self):
         return self.region.width
@@ -203,14 +425,53 @@ class Frame(Dict[Component, Plane], MetaData):
         MetaData.__init__(self, region=Region(0, 0, width, height), fmt=fmt, bit_depth=bit_depth)
         # 将Y分量reshape到指定分辨率的二维数组
         assert width * height == buff_y.size
-        self[Component.COMP_Y] = Plane(np.resize(buff_y, (self.height, self.width)), bit_depth=bit_depth)
+        self._planes: List[Optional[Plane]] = [Plane(buff_y.reshape(height, width), bit_depth=bit_depth),
+                                               None, None]
 
         if self.fmt != Format.YUV400:
             # 将U、V分量reshape到指定分辨率的二维数组
-            width_uv, height_uv = _get_uv_wh(self.width, self.height, self.fmt)
-            assert width_uv * height_uv == buff_u.flatten().shape[0] == buff_v.flatten().shape[0]
-            self[Component.COMP_U] = Plane(np.resize(buff_u, (height_uv, width_uv)), bit_depth=bit_depth)
-            self[Component.COMP_V] = Plane(np.resize(buff_v, (height_uv, width_uv)), bit_depth=bit_depth)
+            width_uv, height_uv = _get_uv_wh(width, height, self.fmt)
+            assert width_uv * height_uv == buff_u.size == buff_v.size
+            self._planes[1] = Plane(buff_u.reshape(height_uv, width_uv), bit_depth=bit_depth)
+            self._planes[2] = Plane(buff_v.reshape(height_uv, width_uv), bit_depth=bit_depth)
+
+    @staticmethod
+    def _wrap(width: int, height: int, bit_depth: BitDepth, fmt: Format, planes: List[Optional[Plane]]) -> "Frame":
+        """
+        直接以分量对象构造帧，不做reshape和检查
+        """
+        frame = Frame.__new__(Frame)
+        frame.region = Region(0, 0, width, height)
+        frame.fmt = fmt
+        frame.bit_depth = bit_depth
+        frame._planes = planes
+        return frame
+
+    def get(self, comp: Component, default=None):
+        # `_value_` 即 `value`，但不经过 Enum 的描述符，访问更快
+        plane = self._planes[comp._value_]
+        return default if plane is None else plane
+
+    def __setitem__(self, comp: Component, plane: Plane):
+        self._planes[comp._value_] = plane
+
+    def __contains__(self, comp: Component):
+        return isinstance(comp, Component) and self._planes[comp._value_] is not None
+
+    def keys(self) -> List[Component]:
+        return [comp for comp in Component if self._planes[comp.value] is not None]
+
+    def values(self) -> List[Plane]:
+        return [plane for plane in self._planes if plane is not None]
+
+    def items(self):
+        return [(comp, self._planes[comp.value]) for comp in Component if self._planes[comp.value] is not None]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.values())
 
     def __ilshift__(self, shift: int):
         buff_y = self.get(Component.COMP_Y).__ilshift__(shift).get()
@@ -254,38 +515,64 @@ class Frame(Dict[Component, Plane], MetaData):
 
     def __getitem__(self, item: Union[Component, Region]):
         if isinstance(item, Component):
-            return self.get(item)
-        w, h = item.width, item.height
-        by = self[Component.COMP_Y][item]
-        bu, bv = None, None
+            plane = self._planes[item._value_]
+            # 未加载的分量交给 get 处理（如 LazyFrame 的延迟读取）
+            return self.get(item) if plane is None else plane
+        plane_y = self.get(Component.COMP_Y)
+        plane_y.ensure_roi(item)
+        x, y, w, h = item.x, item.y, item.width, item.height
+        by = plane_y.buff[y:y + h, x:x + w]
+        planes = [Plane(by, self.bit_depth), None, None]
         if self.fmt != Format.YUV400:
-            if self.fmt == Format.YUV420:
-                item = item >> 1
-            if self.fmt == Format.YUV422:
-                item.y = item.y >> 1
-                item.height = item.height >> 1
-            bu = self[Component.COMP_U][item]
-            bv = self[Component.COMP_V][item]
-
-        return Frame(w, h, self.bit_depth, self.fmt, by, bu, bv)
+            sx, sy = _UV_SCALE[self.fmt]
+            x, y, w, h = x >> sx, y >> sy, w >> sx, h >> sy
+            for i in (1, 2):
+                planes[i] = Plane(self.get(_COMPONENTS[i]).buff[y:y + h, x:x + w], self.bit_depth)
+        # 区域超出图像时会被裁剪，以实际裁剪得到的大小为准
+        h, w = by.shape
+        return Frame._wrap(w, h, self.bit_depth, self.fmt, planes)
 
     def roi(self, region: Region):
         return self.__getitem__(region)
 
+    def rois(self, regions: RegionArray) -> List["Frame"]:
+        """
+        批量截取多个区域，区域先整体裁剪到图像内，不修改传入的区域数组
+        :param regions: 区域数组
+        :return: 帧列表，各分量均为本帧的视图
+        """
+        regions = RegionArray(regions.data).clip(self.width, self.height)
+        bit_depth, fmt = self.bit_depth, self.fmt
+        # 通过 get 获取分量，LazyFrame 未加载的分量在此时加载
+        bufs = [self.get(comp).buff for comp in (_COMPONENTS[:1] if fmt == Format.YUV400 else _COMPONENTS)]
+        sx, sy = _UV_SCALE.get(fmt, (0, 0))
+        result = list()
+        for x, y, w, h in regions.data.tolist():
+            by = bufs[0][y:y + h, x:x + w]
+            planes = [Plane(by, bit_depth), None, None]
+            if fmt != Format.YUV400:
+                cx, cy, cw, ch = x >> sx, y >> sy, w >> sx, h >> sy
+                planes[1] = Plane(bufs[1][cy:cy + ch, cx:cx + cw], bit_depth)
+                planes[2] = Plane(bufs[2][cy:cy + ch, cx:cx + cw], bit_depth)
+            result.append(Frame._wrap(by.shape[1], by.shape[0], bit_depth, fmt, planes))
+        return result
+
     def ctu_all(self, ctu_size, include_incomplete_border=False) -> List:
-        ctu = list()
-        ih = self.height // ctu_size
-        iw = self.width // ctu_size
-        if include_incomplete_border:
-            ih += 1 if self.height % ctu_size != 0 else 0
-            iw += 1 if self.width % ctu_size != 0 else 0
-        for h in range(ih):
-            for w in range(iw):
-                x = w * ctu_size
-                y = h * ctu_size
-                region = Region(x, y, ctu_size, ctu_size)
-                ctu.append(self.roi(region))
-        return ctu
+        return self.rois(RegionArray.grid(self.width, self.height, ctu_size, ctu_size, include_incomplete_border))
+
+    def ctu_view(self, ctu_size: int, pad: bool = False) -> Dict[Component, np.ndarray]:
+        """
+        以四维视图的形式返回所有CTU，不拷贝数据，便于对所有CTU做一次性的统计
+        :param ctu_size: 亮度CTU的大小，色度分量按 `uv_scale()` 缩放
+        :param pad: 为True时将不完整的边界CTU按边缘像素填充（此时会拷贝数据），否则丢弃不完整的边界CTU
+        :return: 各分量的数组，形状为 (rows, cols, ctu_h, ctu_w)
+        """
+        views = {Component.COMP_Y: self[Component.COMP_Y].blocks(ctu_size, ctu_size, pad)}
+        if self.fmt != Format.YUV400:
+            sx, sy = self.uv_scale()
+            for comp in (Component.COMP_U, Component.COMP_V):
+                views[comp] = self[comp].blocks(ctu_size >> sx, ctu_size >> sy, pad)
+        return views
 
     def save(self, file_name):
         if self.fmt == Format.YUV420:
@@ -312,12 +599,46 @@ class Frame(Dict[Component, Plane], MetaData):
         cv2.imwrite(file_name, image)
 
 
-class Sequence(Region, MetaData):
+class LazyFrame(Frame):
+    """
+    延迟加载的帧，未提供的分量在第一次访问时才通过 loader 读取，未访问的分量不产生读取和内存分配
+    """
+    __slots__ = ("_loader",)
+
+    def __init__(self, width: int, height: int, bit_depth: BitDepth, fmt: Format,
+                 loader: Callable[[Component], np.ndarray],
+                 planes: Optional[Dict[Component, np.ndarray]] = None):
+        """
+        :param loader: 分量加载函数，输入分量，返回该分量的二维数组
+        :param planes: 已经读取的分量
+        """
+        MetaData.__init__(self, region=Region(0, 0, width, height), fmt=fmt, bit_depth=bit_depth)
+        self._loader = loader
+        self._planes = [None, None, None]
+        for comp, buff in (planes or dict()).items():
+            self._planes[comp.value] = Plane(buff, bit_depth=bit_depth)
+
+    def loaded(self, comp: Component) -> bool:
+        """
+        :return: 分量是否已经加载
+        """
+        return self._planes[comp._value_] is not None
+
+    def get(self, comp: Component, default=None):
+        if not self.loaded(comp) and (comp == Component.COMP_Y or self.fmt != Format.YUV400):
+            self._planes[comp._value_] = Plane(self._loader(comp), bit_depth=self.bit_depth)
+        return Frame.get(self, comp, default)
+
+
+class Sequence(MetaData):
+    """
+    序列的元数据。x、y、width、height 与 `region` 中的对应属性相同
+    """
+
     def __init__(self, seq_path: str, name: str, width: int = None, height: int = None,
                  fps_num: int = None, fps_den: int = 1,
                  bit_depth: BitDepth = BitDepth.BitDepth8, fmt: Format = Format.YUV420):
-        Region.__init__(self, 0, 0, width, height)
-        MetaData.__init__(self, self, fmt, bit_depth)
+        MetaData.__init__(self, Region(0, 0, width, height), fmt, bit_depth)
         self.path = seq_path
         self.name = name
         self.fmt = fmt
@@ -334,5 +655,37 @@ class Sequence(Region, MetaData):
         if self.width is None or self.height is None:
             raise ValueError("Width and Height must be provided")
 
+    @property
+    def x(self):
+        return self.region.x
+
+    @x.setter
+    def x(self, value):
+        self.region.x = value
+
+    @property
+    def y(self):
+        return self.region.y
+
+    @y.setter
+    def y(self, value):
+        self.region.y = value
+
+    @property
+    def width(self):
+        return self.region.width
+
+    @width.setter
+    def width(self, value):
+        self.region.width = value
+
+    @property
+    def height(self):
+        return self.region.height
+
+    @height.setter
+    def height(self, value):
+        self.region.height = value
+
     def full_name(self):
         return os.path.join(self.path, self.name)
@@ -0,0 +1,117 @@
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from yuv.com_def import BitDepth, Component, Format, Sequence, MetaData
+from yuv.yuv_io import YuvMmapReader
+
+# 每次比较的字节数
+_CHUNK = 64 << 20
+
+
+class MismatchReport(object):
+    """
+    两个序列的比较结果。
+    不一致时记录第一个不一致的帧、分量、像素坐标及其所在的CTU，以及该帧所有不一致的CTU
+    """
+
+    def __init__(self, frames_a: int, frames_b: int, ctu_size: int):
+        self.frames_a = frames_a
+        self.frames_b = frames_b
+        self.ctu_size = ctu_size
+        # 第一个不一致的位置，内容一致时均为None
+        self.frame: Optional[int] = None
+        self.component: Optional[Component] = None
+        self.x: Optional[int] = None
+        self.y: Optional[int] = None
+        self.ctu: Optional[Tuple[int, int]] = None
+        # 第一个不一致的帧中，各分量不一致的CTU (row, col) 列表及不一致的像素数
+        self.ctus: Dict[Component, np.ndarray] = dict()
+        self.pixels: Dict[Component, int] = dict()
+
+    @property
+    def identical(self) -> bool:
+        return self.frame is None and self.frames_a == self.frames_b
+
+    def __str__(self):
+        if self.identical:
+            return f"identical, {self.frames_a} frames"
+        if self.frame is None:
+            return f"frame count mismatch: {self.frames_a} vs {self.frames_b}, common frames identical"
+        ctus = ", ".join(f"{comp.name}: {len(ctus)} CTUs / {self.pixels[comp]} pixels"
+                         for comp, ctus in self.ctus.items() if len(ctus))
+        return (f"first mismatch at frame {self.frame}, {self.component.name} ({self.x}, {self.y}), "
+                f"CTU {self.ctu}; mismatched in this frame: {ctus}")
+
+
+def _first_diff(a: np.ndarray, b: np.ndarray) -> Optional[int]:
+    """
+    分块比较两个一维字节数组，返回第一个不同的字节偏移，完全相同时返回None
+    """
+    size = a.size
+    for begin in range(0, size, _CHUNK):
+        end = min(begin + _CHUNK, size)
+        aligned = begin + ((end - begin) & ~7)
+        # 按8字节为单位比较，减少元素个数
+        if aligned > begin and not np.array_equal(a[begin:aligned].view(np.uint64), b[begin:aligned].view(np.uint64)):
+            return begin + int(np.flatnonzero(a[begin:aligned] != b[begin:aligned])[0])
+        if aligned < end and not np.array_equal(a[aligned:end], b[aligned:end]):
+            return aligned + int(np.flatnonzero(a[aligned:end] != b[aligned:end])[0])
+    return None
+
+
+def _map(seq: Sequence, size: int) -> np.ndarray:
+    if size == 0:
+        return np.empty(0, dtype=np.uint8)
+    return np.memmap(seq.full_name(), dtype=np.uint8, mode="r", shape=(size,))
+
+
+def compare_seq(seq_a: Sequence, seq_b: Sequence, ctu_size: int = 64) -> MismatchReport:
+    """
+    按字节比较两个序列（如编码器的重建序列与解码器的输出），定位第一个不一致的帧、分量和CTU
+    :param seq_a: 序列对象
+    :param seq_b: 序列对象，宽高、格式和比特深度须与 seq_a 一致
+    :param ctu_size: 亮度CTU的大小，色度分量按 `uv_scale()` 缩放
+    :return: 比较结果
+    """
+    if (seq_a.width, seq_a.height, seq_a.fmt, seq_a.bit_depth) != \
+            (seq_b.width, seq_b.height, seq_b.fmt, seq_b.bit_depth):
+        raise ValueError(f"Sequences mismatch: {seq_a.full_name()} vs {seq_b.full_name()}")
+    frame_size = seq_a.frame_size()
+    frames_a = os.path.getsize(seq_a.full_name()) // frame_size
+    frames_b = os.path.getsize(seq_b.full_name()) // frame_size
+    report = MismatchReport(frames_a, frames_b, ctu_size)
+
+    common = min(frames_a, frames_b) * frame_size
+    offset = _first_diff(_map(seq_a, common), _map(seq_b, common))
+    if offset is None:
+        return report
+
+    # 定位第一个不一致的帧、分量和像素
+    report.frame = offset // frame_size
+    itemsize = 1 if seq_a.bit_depth == BitDepth.BitDepth8 else 2
+    sample = (offset % frame_size) // itemsize
+    with YuvMmapReader(seq_a) as reader_a, YuvMmapReader(seq_b) as reader_b:
+        frame_a = reader_a[report.frame]
+        frame_b = reader_b[report.frame]
+        comps = (Component.COMP_Y,) if seq_a.fmt == Format.YUV400 else tuple(Component)
+        for comp in comps:
+            plane = frame_a[comp]
+            if sample < plane.size:
+                report.component = comp
+                report.y, report.x = divmod(sample, plane.width)
+                break
+            sample -= plane.size
+
+        # 按CTU网格统计该帧中所有不一致的CTU
+        views_a = frame_a.ctu_view(ctu_size, pad=True)
+        views_b = frame_b.ctu_view(ctu_size, pad=True)
+        for comp in views_a:
+            report.ctus[comp] = np.argwhere(np.any(views_a[comp] != views_b[comp], axis=(2, 3)))
+            report.pixels[comp] = int(np.count_nonzero(frame_a[comp].get() != frame_b[comp].get()))
+
+    sx, sy = (0, 0) if report.component == Component.COMP_Y else MetaData(None, seq_a.fmt).uv_scale()
+    report.ctu = (report.y // (ctu_size >> sy), report.x // (ctu_size >> sx))
+    return report
+
@@ -0,0 +1,262 @@
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from yuv.com_def import BitDepth, Format, Sequence
+from yuv.yuv_io import YuvReader
+
+
+class Metric(Enum):
+    PSNR = 0
+    WPSNR = 1
+    SSIM = 2
+    MS_SSIM = 3
+
+
+# 与 HM/VTM 一致，PSNR 完全相同时的取值
+_PSNR_IDENTICAL = 999.99
+# SSIM 的高斯窗口及常数
+_SSIM_WINDOW = 11
+_SSIM_SIGMA = 1.5
+_SSIM_K1 = 0.01
+_SSIM_K2 = 0.03
+# MS-SSIM 各尺度的权重
+_MS_SSIM_WEIGHTS = np.array([0.0448, 0.2856, 0.3001, 0.2363, 0.1333])
+
+
+def _gaussian_kernel(size: int = _SSIM_WINDOW, sigma: float = _SSIM_SIGMA) -> np.ndarray:
+    x = np.arange(size, dtype=np.float64) - (size - 1) / 2
+    k = np.exp(-(x * x) / (2 * sigma * sigma))
+    return (k / k.sum()).astype(np.float32)
+
+
+_KERNEL = _gaussian_kernel()
+
+
+def _filter_valid(x: np.ndarray, kernel: np.ndarray = _KERNEL) -> np.ndarray:
+    """
+    对一批图像做可分离的二维滤波，只保留完整窗口覆盖的区域（valid）
+    :param x: 形状为 (n, H, W) 的数组
+    :param kernel: 一维滤波核
+    :return: 形状为 (n, H - k + 1, W - k + 1) 的数组
+    """
+    k = kernel.size
+    h = x.shape[1] - k + 1
+    w = x.shape[2] - k + 1
+    tmp = kernel[0] * x[:, 0:h, :]
+    for i in range(1, k):
+        tmp += kernel[i] * x[:, i:i + h, :]
+    out = kernel[0] * tmp[:, :, 0:w]
+    for i in range(1, k):
+        out += kernel[i] * tmp[:, :, i:i + w]
+    return out
+
+
+def _max_value(bit_depth: BitDepth) -> int:
+    return (1 << bit_depth.value) - 1
+
+
+def psnr(a: np.ndarray, b: np.ndarray, bit_depth: BitDepth) -> np.ndarray:
+    """
+    逐帧计算PSNR，峰值与 HM/VTM 一致取 255 << (bit_depth - 8)
+    :param a: 形状为 (n, H, W) 的数组
+    :param b: 形状为 (n, H, W) 的数组
+    :param bit_depth: 比特深度
+    :return: 长度为n的PSNR数组，两帧完全相同时为 999.99
+    """
+    diff = a.astype(np.int32) - b.astype(np.int32)
+    mse = np.mean(np.square(diff, dtype=np.float64), axis=(1, 2))
+    peak = float(255 << (bit_depth.value - 8))
+    with np.errstate(divide="ignore"):
+        value = 10 * np.log10(peak * peak / mse)
+    return np.where(mse == 0, _PSNR_IDENTICAL, value)
+
+
+def _ssim_cs(a: np.ndarray, b: np.ndarray, max_value: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    计算一批图像的SSIM以及对比度-结构项（cs）的逐帧均值
+    :return: (ssim, cs)，长度均为n
+    """
+    if min(a.shape[1:]) < _SSIM_WINDOW:
+        raise ValueError(f"Plane size {a.shape[1:]} is smaller than the SSIM window {_SSIM_WINDOW}")
+    c1 = (_SSIM_K1 * max_value) ** 2
+    c2 = (_SSIM_K2 * max_value) ** 2
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    mu1 = _filter_valid(a)
+    mu2 = _filter_valid(b)
+    mu1_sq = mu1 * mu1
+    mu2_sq = mu2 * mu2
+    mu12 = mu1 * mu2
+    s11 = _filter_valid(a * a) - mu1_sq
+    s22 = _filter_valid(b * b) - mu2_sq
+    s12 = _filter_valid(a * b) - mu12
+    cs_map = (2 * s12 + c2) / (s11 + s22 + c2)
+    ssim_map = (2 * mu12 + c1) / (mu1_sq + mu2_sq + c1) * cs_map
+    return ssim_map.mean(axis=(1, 2), dtype=np.float64), cs_map.mean(axis=(1, 2), dtype=np.float64)
+
+
+def ssim(a: np.ndarray, b: np.ndarray, bit_depth: BitDepth) -> np.ndarray:
+    """
+    逐帧计算SSIM（11x11高斯窗口，sigma=1.5）
+    :param a: 形状为 (n, H, W) 的数组
+    :param b: 形状为 (n, H, W) 的数组
+    :param bit_depth: 比特深度
+    :return: 长度为n的SSIM数组
+    """
+    return _ssim_cs(a, b, _max_value(bit_depth))[0]
+
+
+def _down2(x: np.ndarray) -> np.ndarray:
+    """
+    2x2 均值下采样
+    """
+    h = x.shape[1] >> 1 << 1
+    w = x.shape[2] >> 1 << 1
+    x = x[:, :h, :w]
+    return (x[:, 0::2, 0::2] + x[:, 1::2, 0::2] + x[:, 0::2, 1::2] + x[:, 1::2, 1::2]) * 0.25
+
+
+def ms_ssim(a: np.ndarray, b: np.ndarray, bit_depth: BitDepth) -> np.ndarray:
+    """
+    逐帧计算5个尺度的MS-SSIM
+    :param a: 形状为 (n, H, W) 的数组
+    :param b: 形状为 (n, H, W) 的数组
+    :param bit_depth: 比特深度
+    :return: 长度为n的MS-SSIM数组
+    """
+    scales = _MS_SSIM_WEIGHTS.size
+    if min(a.shape[1:]) >> (scales - 1) < _SSIM_WINDOW:
+        raise ValueError(f"Plane size {a.shape[1:]} is too small for {scales}-scale MS-SSIM")
+    max_value = _max_value(bit_depth)
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    result = np.ones(a.shape[0], dtype=np.float64)
+    for i, weight in enumerate(_MS_SSIM_WEIGHTS):
+        value, cs = _ssim_cs(a, b, max_value)
+        if i == scales - 1:
+            result *= np.maximum(value, 0) ** weight
+        else:
+            result *= np.maximum(cs, 0) ** weight
+            a = _down2(a)
+            b = _down2(b)
+    return result
+
+
+class QualityReport(object):
+    """
+    两个序列之间的客观质量结果。
+    `report["psnr_y"]` 为逐帧的结果数组，`report.mean()` 为整个序列的平均结果
+    """
+
+    def __init__(self, values: Dict[str, np.ndarray], start: int = 0):
+        self.values = values
+        self.start = start
+
+    @property
+    def frames(self) -> int:
+        return len(next(iter(self.values.values()))) if self.values else 0
+
+    def keys(self):
+        return self.values.keys()
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.values[key]
+
+    def frame(self, idx: int) -> Dict[str, float]:
+        """
+        :param idx: 相对于 start 的帧序号
+        :return: 该帧的各项指标
+        """
+        return {k: float(v[idx]) for k, v in self.values.items()}
+
+    def mean(self) -> Dict[str, float]:
+        """
+        :return: 各项指标的逐帧平均值
+        """
+        return {k: float(np.mean(v)) for k, v in self.values.items()}
+
+    def __str__(self):
+        return ", ".join(f"{k}: {v:.4f}" for k, v in self.mean().items())
+
+
+def _batch_metrics(batch_a: Tuple, batch_b: Tuple, fmt: Format, bit_depth: BitDepth,
+                   metrics: Iterable[Metric]) -> Dict[str, np.ndarray]:
+    """
+    计算一批帧的各项指标
+    :param batch_a: `YuvReader.read_batch` 的结果
+    :param batch_b: `YuvReader.read_batch` 的结果
+    :return: 指标名到逐帧结果的映射
+    """
+    planes = ("y",) if fmt == Format.YUV400 else ("y", "u", "v")
+    values = dict()
+    if Metric.PSNR in metrics or Metric.WPSNR in metrics:
+        p = [psnr(batch_a[i], batch_b[i], bit_depth) for i in range(len(planes))]
+        if Metric.PSNR in metrics:
+            for name, v in zip(planes, p):
+                values[f"psnr_{name}"] = v
+        if Metric.WPSNR in metrics:
+            values["wpsnr"] = p[0] if len(p) == 1 else (6 * p[0] + p[1] + p[2]) / 8
+    if Metric.SSIM in metrics:
+        for i, name in enumerate(planes):
+            values[f"ssim_{name}"] = ssim(batch_a[i], batch_b[i], bit_depth)
+    if Metric.MS_SSIM in metrics:
+        values["ms_ssim_y"] = ms_ssim(batch_a[0], batch_b[0], bit_depth)
+    return values
+
+
+def _compare_range(seq_a: Sequence, seq_b: Sequence, start: int, frames: int,
+                   metrics: Tuple[Metric, ...], batch: int) -> Dict[str, np.ndarray]:
+    """
+    计算 [start, start + frames) 范围内各帧的指标，作为进程池的任务
+    """
+    results: List[Dict[str, np.ndarray]] = list()
+    with YuvReader(seq_a) as reader_a, YuvReader(seq_b) as reader_b:
+        reader_a.seek(start)
+        reader_b.seek(start)
+        while frames > 0:
+            n = min(batch, frames)
+            results.append(_batch_metrics(reader_a.read_batch(n), reader_b.read_batch(n),
+                                          seq_a.fmt, seq_a.bit_depth, metrics))
+            frames -= n
+    if not results:
+        return dict()
+    return {k: np.concatenate([r[k] for r in results]) for k in results[0]}
+
+
+def compare_seq(seq_a: Sequence, seq_b: Sequence,
+                metrics: Iterable[Metric] = (Metric.PSNR, Metric.WPSNR, Metric.SSIM),
+                start: int = 0, frames: Optional[int] = None,
+                batch: int = 4, workers: Optional[int] = None) -> QualityReport:
+    """
+    计算两个序列之间的客观质量
+    :param seq_a: 序列对象，通常为原始序列
+    :param seq_b: 序列对象，通常为重建或解码序列
+    :param metrics: 需要计算的指标
+    :param start: 起始帧
+    :param frames: 计算的帧数，默认为两个序列中较短者的剩余帧数
+    :param batch: 每次读取的帧数，决定了内存占用
+    :param workers: 进程数，None 或 1 表示在当前进程中计算
+    :return: 质量结果
+    """
+    if (seq_a.width, seq_a.height, seq_a.fmt, seq_a.bit_depth) != \
+            (seq_b.width, seq_b.height, seq_b.fmt, seq_b.bit_depth):
+        raise ValueError(f"Sequences mismatch: {seq_a.full_name()} vs {seq_b.full_name()}")
+    metrics = tuple(metrics)
+    with YuvReader(seq_a) as reader_a, YuvReader(seq_b) as reader_b:
+        total = min(reader_a.frames(), reader_b.frames()) - start
+    frames = total if frames is None else min(frames, total)
+    frames = max(0, frames)
+
+    if workers is None or workers <= 1 or frames <= batch:
+        return QualityReport(_compare_range(seq_a, seq_b, start, frames, metrics, batch), start)
+
+    # 按帧范围划分任务，每个进程打开自己的文件
+    step = -(-frames // workers)
+    ranges = [(s, min(step, start + frames - s)) for s in range(start, start + frames, step)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_compare_range, seq_a, seq_b, s, n, metrics, batch) for s, n in ranges]
+        results = [f.result() for f in futures]
+    return QualityReport({k: np.concatenate([r[k] for r in results]) for k in results[0]}, start)
@@ -0,0 +1,302 @@
+import os
+from abc import ABC
+from enum import Enum
+from typing import Hashable, List, NoReturn, Optional, Tuple, Union
+
+import numpy as np
+
+from yuv.com_def import BitDepth, Format, Component, Sequence, Frame, _get_uv_wh
+from yuv.yuv_io import YuvReader, YuvWriter
+from yuv.cache import FrameCache
+
+
+class PackedFormat(Enum):
+    # 半平面格式，Y 平面之后为 UV 交织的平面，每个样本占16比特且高位对齐。
+    # 4:2:0 10比特即 P010，比特深度和色度格式不同时对应 P012、P016、P210、P410 等
+    P010 = 0
+    # 4:2:2 10比特，每 16 字节（4 个 32 比特字）存放 6 个像素，每行按 128 字节对齐
+    V210 = 1
+    # 平面格式，每个分量的样本按小端比特序紧密排列，每 4 个样本占 5 字节
+    PACKED10 = 2
+
+
+class PackedCodec(object):
+    """
+    打包格式与平面格式之间的转换。平面格式即 `YuvReader.read_batch` 的返回值：Y、U、V 三个 uint16 数组，
+    形状分别为 (n, H, W)、(n, H_uv, W_uv)、(n, H_uv, W_uv)
+    """
+
+    def __init__(self, width: int, height: int, bit_depth: BitDepth, fmt: Format):
+        self.width = width
+        self.height = height
+        self.bit_depth = bit_depth
+        self.fmt = fmt
+        self.uv_width, self.uv_height = _get_uv_wh(width, height, fmt)
+        # 一帧打包数据的字节数
+        self.frame_size = 0
+
+    def unpack(self, raw: np.ndarray, y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray]) -> NoReturn:
+        """
+        将n帧打包数据解包到给定的平面数组中
+        :param raw: 形状为 (n, frame_size) 的 uint8 数组
+        :param y: 形状为 (n, H, W) 的 uint16 数组
+        :param u: 形状为 (n, H_uv, W_uv) 的 uint16 数组，YUV400 格式时为None
+        :param v: 形状为 (n, H_uv, W_uv) 的 uint16 数组，YUV400 格式时为None
+        """
+        raise NotImplementedError
+
+    def pack(self, y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray]) -> np.ndarray:
+        """
+        将n帧平面数据打包
+        :return: 形状为 (n, frame_size) 的 uint8 数组
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def create(layout: PackedFormat, width: int, height: int, bit_depth: BitDepth, fmt: Format) -> "PackedCodec":
+        """
+        :param layout: 打包格式
+        :return: 对应的转换器，格式与比特深度、色度格式不匹配时抛出 ValueError
+        """
+        codec = {PackedFormat.P010: P010Codec, PackedFormat.V210: V210Codec, PackedFormat.PACKED10: Packed10Codec}
+        return codec[layout](width, height, bit_depth, fmt)
+
+
+class P010Codec(PackedCodec):
+    """
+    P010 等高位对齐的半平面格式，样本为小端 uint16，有效位在高 bit_depth 位
+    """
+
+    def __init__(self, width: int, height: int, bit_depth: BitDepth, fmt: Format):
+        super().__init__(width, height, bit_depth, fmt)
+        if fmt == Format.YUV400 or bit_depth == BitDepth.BitDepth8:
+            raise ValueError(f"P010 layout does not support {fmt.name} with {bit_depth.value} bits")
+        self._shift = 16 - bit_depth.value
+        self._area_y = width * height
+        self.frame_size = (self._area_y + 2 * self.uv_width * self.uv_height) * 2
+
+    def unpack(self, raw: np.ndarray, y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray]) -> NoReturn:
+        n = raw.shape[0]
+        words = raw.view("<u2")
+        np.right_shift(words[:, :self._area_y].reshape(n, self.height, self.width), self._shift, out=y)
+        uv = words[:, self._area_y:].reshape(n, self.uv_height, self.uv_width, 2)
+        np.right_shift(uv[..., 0], self._shift, out=u)
+        np.right_shift(uv[..., 1], self._shift, out=v)
+
+    def pack(self, y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray]) -> np.ndarray:
+        n = y.shape[0]
+        raw = np.empty((n, self.frame_size), dtype=np.uint8)
+        words = raw.view("<u2")
+        np.left_shift(y, self._shift, out=words[:, :self._area_y].reshape(n, self.height, self.width),
+                      casting="unsafe")
+        uv = words[:, self._area_y:].reshape(n, self.uv_height, self.uv_width, 2)
+        np.left_shift(u, self._shift, out=uv[..., 0], casting="unsafe")
+        np.left_shift(v, self._shift, out=uv[..., 1], casting="unsafe")
+        return raw
+
+
+class V210Codec(PackedCodec):
+    """
+    v210 格式：每个 32 比特小端字的低 30 位存放 3 个 10 比特样本，
+    每 4 个字依次为 Cb0 Y0 Cr0 | Y1 Cb1 Y2 | Cr1 Y3 Cb2 | Y4 Cr2 Y5，即 6 个像素。
+    每行的像素数向上补齐到 6 的倍数，每行的字节数向上补齐到 128 的倍数
+    """
+
+    def __init__(self, width: int, height: int, bit_depth: BitDepth, fmt: Format):
+        super().__init__(width, height, bit_depth, fmt)
+        if fmt != Format.YUV422 or bit_depth != BitDepth.BitDepth10:
+            raise ValueError(f"v210 layout only supports 10-bit YUV422, got {fmt.name} with {bit_depth.value} bits")
+        self._groups = -(-width // 6)
+        # 每行的字数
+        self._stride = -(-width // 48) * 32
+        self.frame_size = self._stride * 4 * height
+
+    def unpack(self, raw: np.ndarray, y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray]) -> NoReturn:
+        n = raw.shape[0]
+        words = raw.view("<u4").reshape(n, self.height, self._stride)[:, :, :self._groups * 4]
+        words = words.reshape(n, self.height, self._groups, 4)
+        # 每组 12 个样本，依次为 Cb Y Cr Y Cb Y Cr Y Cb Y Cr Y
+        samples = np.empty((n, self.height, self._groups, 12), dtype=np.uint16)
+        for i in range(3):
+            np.bitwise_and(words >> (10 * i), 0x3FF, out=samples[..., i::3], casting="unsafe")
+        y[...] = samples[..., 1::2].reshape(n, self.height, -1)[:, :, :self.width]
+        u[...] = samples[..., 0::4].reshape(n, self.height, -1)[:, :, :self.uv_width]
+        v[...] = samples[..., 2::4].reshape(n, self.height, -1)[:, :, :self.uv_width]
+
+    def pack(self, y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray]) -> np.ndarray:
+        n = y.shape[0]
+        samples = np.zeros((n, self.height, self._groups, 12), dtype=np.uint32)
+        # 补齐到整组的像素为0
+        for start, step, plane, width in ((1, 2, y, self.width), (0, 4, u, self.uv_width), (2, 4, v, self.uv_width)):
+            padded = np.zeros((n, self.height, self._groups * 12 // step), dtype=np.uint32)
+            np.bitwise_and(plane, 0x3FF, out=padded[:, :, :width], casting="unsafe")
+            samples[..., start::step] = padded.reshape(n, self.height, self._groups, -1)
+        words = np.zeros((n, self.height, self._stride), dtype="<u4")
+        words[:, :, :self._groups * 4] = (samples[..., 0::3] | (samples[..., 1::3] << 10) |
+                                          (samples[..., 2::3] << 20)).reshape(n, self.height, -1)
+        return words.view(np.uint8).reshape(n, self.frame_size)
+
+
+class Packed10Codec(PackedCodec):
+    """
+    紧密排列的10比特平面格式：Y、U、V 依次存放，每个分量的第i个样本位于该分量比特流的 [10i, 10i + 10) 位，
+    比特流按小端顺序存放，即每 4 个样本占 5 字节。分量的样本数不是4的倍数时末尾补0
+    """
+
+    def __init__(self, width: int, height: int, bit_depth: BitDepth, fmt: Format):
+        super().__init__(width, height, bit_depth, fmt)
+        if bit_depth != BitDepth.BitDepth10:
+            raise ValueError(f"Packed 10-bit layout does not support {bit_depth.value} bits")
+        areas = [width * height]
+        if fmt != Format.YUV400:
+            areas += [self.uv_width * self.uv_height] * 2
+        # 各分量的样本数、打包后的起始字节和组数
+        self._planes: List[Tuple[int, int, int]] = list()
+        offset = 0
+        for area in areas:
+            groups = -(-area // 4)
+            self._planes.append((area, offset, groups))
+            offset += groups * 5
+        self.frame_size = offset
+
+    def unpack(self, raw: np.ndarray, y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray]) -> NoReturn:
+        n = raw.shape[0]
+        for (area, offset, groups), plane in zip(self._planes, (y, u, v)):
+            b = raw[:, offset:offset + groups * 5].reshape(n, groups, 5).astype(np.uint16)
+            samples = np.empty((n, groups, 4), dtype=np.uint16)
+            samples[..., 0] = b[..., 0] | ((b[..., 1] & 0x03) << 8)
+            samples[..., 1] = (b[..., 1] >> 2) | ((b[..., 2] & 0x0F) << 6)
+            samples[..., 2] = (b[..., 2] >> 4) | ((b[..., 3] & 0x3F) << 4)
+            samples[..., 3] = (b[..., 3] >> 6) | (b[..., 4] << 2)
+            plane[...] = samples.reshape(n, -1)[:, :area].reshape(plane.shape)
+
+    def pack(self, y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray]) -> np.ndarray:
+        n = y.shape[0]
+        raw = np.empty((n, self.frame_size), dtype=np.uint8)
+        for (area, offset, groups), plane in zip(self._planes, (y, u, v)):
+            samples = np.zeros((n, groups * 4), dtype=np.uint16)
+            np.bitwise_and(plane.reshape(n, area), 0x3FF, out=samples[:, :area], casting="unsafe")
+            s = samples.reshape(n, groups, 4)
+            b = raw[:, offset:offset + groups * 5].reshape(n, groups, 5)
+            b[..., 0] = s[..., 0]
+            b[..., 1] = (s[..., 0] >> 8) | (s[..., 1] << 2)
+            b[..., 2] = (s[..., 1] >> 6) | (s[..., 2] << 4)
+            b[..., 3] = (s[..., 2] >> 4) | (s[..., 3] << 6)
+            b[..., 4] = s[..., 3] >> 2
+        return raw
+
+
+class PackedReader(YuvReader, ABC):
+    """
+    打包格式的输入类，接口与 `YuvReader` 相同，读取时用向量化的位运算解包为平面格式。
+    `read` 逐帧流式读取，`read_batch` 一次读取并解包多帧；支持复用缓冲区、预读和帧缓存，不支持只读取部分分量
+    """
+
+    def __init__(self, seq: Sequence, layout: PackedFormat, buffers: int = 0, prefetch: int = 0,
+                 cache: Union[bool, FrameCache] = False):
+        """
+        :param seq: 序列对象，宽高、比特深度和色度格式为解包后的平面格式
+        :param layout: 文件的打包格式
+        :param buffers: 同 `YuvReader`
+        :param prefetch: 同 `YuvReader`
+        :param cache: 同 `YuvReader`
+        """
+        self.layout = layout
+        self._codec = PackedCodec.create(layout, seq.width, seq.height, seq.bit_depth, seq.fmt)
+        self._raw: Optional[np.ndarray] = None
+        super().__init__(seq, buffers, prefetch, cache=cache)
+
+    def _frame_offset(self, idx: int) -> int:
+        return idx * self._codec.frame_size
+
+    def _frame_index(self) -> int:
+        return self.fp.tell() // self._codec.frame_size
+
+    def _cache_layout(self) -> Hashable:
+        return type(self).__name__, self.layout
+
+    def seek(self, frames) -> NoReturn:
+        """
+        移动文件指针，以帧为单位移动
+        :param frames: 移动的帧数，负数表示向前移动，正数表示向后移动
+        :return:
+        """
+        if self._prefetch:
+            return super().seek(frames)
+        self.fp.seek(frames * self._codec.frame_size, os.SEEK_CUR)
+
+    def frames(self) -> int:
+        """
+        获取当前序列的总帧数，不移动文件指针
+        :return: 当前序列的总帧数
+        """
+        return os.fstat(self.fp.fileno()).st_size // self._codec.frame_size
+
+    def _split(self, raw: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        将形状为 (n, _pixel_area_yuv) 的平面数据按分量切分为三维数组的视图
+        """
+        n = raw.shape[0]
+        end_y = self._pixel_area_y
+        end_u = end_y + self._pixel_area_u
+        y = raw[:, :end_y].reshape(n, self.sequence.height, self.sequence.width)
+        if self.sequence.fmt == Format.YUV400:
+            return y, None, None
+        shape_uv = (n, self._uv_height, self._uv_width)
+        return y, raw[:, end_y:end_u].reshape(shape_uv), raw[:, end_u:].reshape(shape_uv)
+
+    def _read_into(self, buff: np.ndarray) -> int:
+        """
+        从当前文件指针处读取若干帧打包数据，解包后填入给定的平面缓冲区
+        :param buff: 长度为 `_pixel_area_yuv` 整数倍的C连续数组
+        :return: 解包得到的平面数据的字节数，小于缓冲区大小表示已到文件尾
+        """
+        n = buff.size // self._pixel_area_yuv
+        if self._raw is None or self._raw.shape[0] < n:
+            self._raw = np.empty((n, self._codec.frame_size), dtype=np.uint8)
+        raw = self._raw[:n]
+        m = super()._read_into(raw) // self._codec.frame_size
+        if m:
+            self._codec.unpack(raw[:m], *self._split(buff.reshape(n, self._pixel_area_yuv)[:m]))
+        return m * self._frame_size_yuv
+
+
+class PackedWriter(YuvWriter, ABC):
+    """
+    打包格式的输出类，接口与 `YuvWriter` 相同，写出前将平面数据打包。
+    `write_batch` 一次打包并写出多帧，`write_at` 与预先分配按打包后的帧大小计算位置
+    """
+
+    def __init__(self, seq: Sequence, layout: PackedFormat, append: bool = False, frames: Optional[int] = None,
+                 truncate: bool = True):
+        """
+        :param seq: 序列对象，宽高、比特深度和色度格式为打包前的平面格式
+        :param layout: 文件的打包格式
+        :param append: 同 `YuvWriter`
+        :param frames: 同 `YuvWriter`
+        :param truncate: 同 `YuvWriter`
+        """
+        self.layout = layout
+        self._codec = PackedCodec.create(layout, seq.width, seq.height, seq.bit_depth, seq.fmt)
+        super().__init__(seq, append, frames, truncate)
+
+    def _frame_offset(self, idx: int) -> int:
+        return idx * self._codec.frame_size
+
+    def frames(self) -> int:
+        """
+        获取当前文件中的总帧数
+        :return: 当前文件中的总帧数
+        """
+        return os.fstat(self.fp.fileno()).st_size // self._codec.frame_size
+
+    def _planes(self, frame: Frame) -> List[np.ndarray]:
+        y = frame[Component.COMP_Y].get()[np.newaxis]
+        if frame.fmt == Format.YUV400:
+            return [self._codec.pack(y, None, None)]
+        u = frame[Component.COMP_U].get()[np.newaxis]
+        v = frame[Component.COMP_V].get()[np.newaxis]
+        return [self._codec.pack(y, u, v)]
+
+    def _batch_planes(self, y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray]) -> List[np.ndarray]:
+        return [self._codec.pack(y, u, v)]
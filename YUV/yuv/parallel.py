@@ -0,0 +1,130 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, NoReturn, Optional
+
+import numpy as np
+
+from yuv.com_def import BitDepth, Format, Component
+from yuv.com_def import Sequence, Frame, _get_uv_wh
+from yuv.yuv_io import YuvReader, YuvWriter
+from yuv.shared import FrameHandle, SharedFrame, SharedRing
+
+
+def _copy_frame(frame: Frame, seq: Sequence, row: np.ndarray) -> NoReturn:
+    """
+    将帧数据按文件中的排列方式拷贝到一帧大小的一维数组中
+    :param frame: 帧对象，元数据须与 seq 一致
+    :param seq: 目标序列
+    :param row: 长度为一帧像素数的一维数组
+    """
+    assert (frame.width, frame.height, frame.fmt) == (seq.width, seq.height, seq.fmt)
+    area_y = seq.width * seq.height
+    np.copyto(row[:area_y].reshape(seq.height, seq.width), frame[Component.COMP_Y].get(), casting="unsafe")
+    if seq.fmt != Format.YUV400:
+        width_uv, height_uv = _get_uv_wh(seq.width, seq.height, seq.fmt)
+        area_uv = width_uv * height_uv
+        for i, comp in enumerate((Component.COMP_U, Component.COMP_V)):
+            begin = area_y + i * area_uv
+            np.copyto(row[begin:begin + area_uv].reshape(height_uv, width_uv), frame[comp].get(), casting="unsafe")
+
+
+def _map_range(src: Sequence, dst: Sequence, fn: Callable[[Frame], Frame],
+               src_start: int, dst_start: int, frames: int) -> NoReturn:
+    """
+    处理源序列 [src_start, src_start + frames) 范围内的帧，并写入目标文件从 dst_start 开始的位置，作为进程池的任务。
+    目标文件以共享的内存映射方式写入
+    """
+    dtype = np.uint8 if dst.bit_depth == BitDepth.BitDepth8 else np.uint16
+    frame_size = dst.frame_size()
+    out = np.memmap(dst.full_name(), dtype=dtype, mode="r+", offset=dst_start * frame_size,
+                    shape=(frames, frame_size // np.dtype(dtype).itemsize))
+    with YuvReader(src) as reader:
+        reader.seek(src_start)
+        for i in range(frames):
+            _copy_frame(fn(reader.read()), dst, out[i])
+    out.flush()
+    del out
+
+
+def map_sequence(src: Sequence, dst: Sequence, fn: Callable[[Frame], Frame], workers: Optional[int] = None,
+                 start: int = 0, frames: Optional[int] = None, chunk: Optional[int] = None) -> NoReturn:
+    """
+    对序列的每一帧做变换并写入目标序列，按帧范围划分到多个进程并行处理。
+    目标文件预先分配，各进程打开自己的 `YuvReader`，并通过共享的内存映射写入各自帧范围的固定位置，因此输出的帧顺序是确定的
+    :param src: 源序列
+    :param dst: 目标序列，其元数据须与 fn 输出的帧一致
+    :param fn: 帧变换函数，多进程时须可被 pickle（模块级函数或 functools.partial）
+    :param workers: 进程数，None 或 1 表示在当前进程中处理
+    :param start: 源序列的起始帧
+    :param frames: 处理的帧数，默认处理到源序列末尾
+    :param chunk: 每个任务的帧数，默认将所有帧平均分给各进程
+    :return: None
+    """
+    with YuvReader(src) as reader:
+        total = max(0, reader.frames() - start)
+    frames = total if frames is None else min(frames, total)
+
+    with YuvWriter(dst, frames=frames):
+        pass
+    if frames == 0:
+        return
+
+    if workers is None or workers <= 1:
+        _map_range(src, dst, fn, start, 0, frames)
+        return
+    if chunk is None:
+        chunk = -(-frames // workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_map_range, src, dst, fn, start + s, s, min(chunk, frames - s))
+                   for s in range(0, frames, chunk)]
+        for f in futures:
+            f.result()
+
+
+def _apply(fn: Callable[[Frame], Any], handle: FrameHandle) -> Any:
+    """
+    在子进程中映射共享内存帧并调用 fn，作为进程池的任务
+    """
+    frame = SharedFrame.attach(handle)
+    try:
+        return fn(frame)
+    finally:
+        frame.close()
+
+
+def map_frames(seq: Sequence, fn: Callable[[Frame], Any], workers: Optional[int] = None,
+               start: int = 0, frames: Optional[int] = None, slots: Optional[int] = None) -> Iterator[Any]:
+    """
+    对序列的每一帧调用 fn 并按帧顺序产出结果，适合逐帧分析（指标、运动估计、统计等）。
+    当前进程将帧读入共享内存的循环槽位，子进程只接收帧的句柄，像素数据不经过 pickle。
+    槽位在对应帧的结果返回后才被复用，内存占用为 slots 帧
+    :param seq: 序列对象
+    :param fn: 帧处理函数，多进程时须可被 pickle，返回值应为较小的结果且不能引用帧的数据
+    :param workers: 进程数，None 或 1 表示在当前进程中处理
+    :param start: 起始帧
+    :param frames: 处理的帧数，默认处理到序列末尾
+    :param slots: 共享内存槽位的个数，默认为 2 * workers
+    :return: 逐帧的 fn 结果
+    """
+    with YuvReader(seq) as reader:
+        total = max(0, reader.frames() - start)
+        frames = total if frames is None else min(frames, total)
+        reader.seek(start)
+        if workers is None or workers <= 1:
+            for _ in range(frames):
+                yield fn(reader.read())
+            return
+
+        slots = slots or 2 * workers
+        with SharedRing(seq.width, seq.height, seq.bit_depth, seq.fmt, slots) as ring, \
+                ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for i in range(frames):
+                if len(pending) == slots:
+                    yield pending.popleft().result()
+                slot = i % slots
+                if reader._read_into(ring.buffer(slot)) < ring.frame_size:
+                    raise EOFError(f"End of file: {seq.full_name()}")
+                pending.append(executor.submit(_apply, fn, ring[slot].handle))
+            while pending:
+                yield pending.popleft().result()
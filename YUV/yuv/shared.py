@@ -0,0 +1,163 @@
+import sys
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from typing import NamedTuple, NoReturn
+
+import numpy as np
+
+from yuv.com_def import BitDepth, Format, Component, Region, MetaData, Frame, _dtype, _get_uv_wh
+
+# 每个进程缓存的已映射共享内存段的个数
+_ATTACHED_MAX = 16
+_attached: "OrderedDict[str, shared_memory.SharedMemory]" = OrderedDict()
+
+
+class FrameHandle(NamedTuple):
+    """
+    共享内存帧的句柄，只包含共享内存段的名字、帧在段内的偏移和帧的元数据，可以廉价地在进程间传递
+    """
+    name: str
+    offset: int
+    width: int
+    height: int
+    bit_depth: BitDepth
+    fmt: Format
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    映射已有的共享内存段，同一进程内按名字缓存，避免每帧重复映射
+    """
+    shm = _attached.pop(name, None)
+    if shm is None:
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            # 3.13 之前映射时总会向 resource_tracker 注册。进程池的子进程与创建者共享同一个 resource_tracker，
+            # 重复注册不会产生影响，段仍由创建者 unlink
+            shm = shared_memory.SharedMemory(name=name)
+        while len(_attached) >= _ATTACHED_MAX:
+            _, old = _attached.popitem(last=False)
+            try:
+                old.close()
+            except BufferError:
+                # 仍有帧引用该段，等其被回收后再释放
+                pass
+    _attached[name] = shm
+    return shm
+
+
+class SharedFrame(Frame):
+    """
+    以 `multiprocessing.shared_memory` 为存储的帧，Y、U、V依次连续存放。
+    pickle 时只传递 `FrameHandle`，在另一进程中 unpickle 得到映射同一块内存的帧，不拷贝像素数据。
+    共享内存段由创建者负责释放，其他进程只映射
+    """
+    __slots__ = ("_shm", "_offset", "_owner")
+
+    def __init__(self, width: int, height: int, bit_depth: BitDepth, fmt: Format,
+                 shm: shared_memory.SharedMemory, offset: int = 0, owner: bool = False):
+        """
+        :param shm: 共享内存段
+        :param offset: 帧在段内的字节偏移
+        :param owner: 是否为段的创建者，创建者在 `close` 时释放该段
+        """
+        self._shm = shm
+        self._offset = offset
+        self._owner = owner
+        dtype = _dtype(bit_depth)
+        width_uv, height_uv = _get_uv_wh(width, height, fmt)
+        area_y = width * height
+        area_uv = width_uv * height_uv
+        buff = np.ndarray((area_y + 2 * area_uv,), dtype=dtype, buffer=shm.buf, offset=offset)
+        super().__init__(width, height, bit_depth, fmt,
+                         buff[:area_y], buff[area_y:area_y + area_uv], buff[area_y + area_uv:])
+
+    @staticmethod
+    def create(width: int, height: int, bit_depth: BitDepth, fmt: Format) -> "SharedFrame":
+        """
+        在新的共享内存段中分配一帧
+        """
+        size = MetaData(Region(0, 0, width, height), fmt, bit_depth).frame_size()
+        shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+        return SharedFrame(width, height, bit_depth, fmt, shm, owner=True)
+
+    @staticmethod
+    def from_frame(frame: Frame) -> "SharedFrame":
+        """
+        将帧拷贝到新的共享内存段中
+        """
+        result = SharedFrame.create(frame.width, frame.height, frame.bit_depth, frame.fmt)
+        for comp in (Component.COMP_Y,) if frame.fmt == Format.YUV400 else tuple(Component):
+            np.copyto(result[comp].get(), frame[comp].get(), casting="unsafe")
+        return result
+
+    @staticmethod
+    def attach(handle: FrameHandle) -> "SharedFrame":
+        """
+        根据句柄映射另一进程创建的帧
+        """
+        return SharedFrame(handle.width, handle.height, handle.bit_depth, handle.fmt,
+                           _attach(handle.name), handle.offset)
+
+    @property
+    def handle(self) -> FrameHandle:
+        return FrameHandle(self._shm.name, self._offset, self.width, self.height, self.bit_depth, self.fmt)
+
+    def __reduce__(self):
+        return SharedFrame.attach, (self.handle,)
+
+    def close(self) -> NoReturn:
+        """
+        释放对共享内存的引用，创建者同时释放共享内存段。之后不能再访问该帧的数据
+        """
+        self._planes = [None, None, None]
+        if self._owner:
+            self._owner = False
+            self._shm.close()
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SharedRing(object):
+    """
+    由一个共享内存段划分的若干帧槽位，用于在进程间循环传递帧
+    """
+
+    def __init__(self, width: int, height: int, bit_depth: BitDepth, fmt: Format, slots: int):
+        self.slots = slots
+        self.frame_size = MetaData(Region(0, 0, width, height), fmt, bit_depth).frame_size()
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, self.frame_size * slots))
+        self._frames = [SharedFrame(width, height, bit_depth, fmt, self._shm, i * self.frame_size)
+                        for i in range(slots)]
+        dtype = _dtype(bit_depth)
+        self._buffs = np.ndarray((slots, self.frame_size // np.dtype(dtype).itemsize), dtype=dtype,
+                                 buffer=self._shm.buf)
+
+    def __getitem__(self, slot: int) -> SharedFrame:
+        return self._frames[slot]
+
+    def buffer(self, slot: int) -> np.ndarray:
+        """
+        :return: 槽位的一维数组，Y、U、V依次连续存放
+        """
+        return self._buffs[slot]
+
+    def close(self) -> NoReturn:
+        for frame in self._frames:
+            frame.close()
+        self._frames = list()
+        self._buffs = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
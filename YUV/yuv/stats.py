@@ -0,0 +1,259 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NoReturn, Optional, Tuple
+
+import numpy as np
+
+from yuv.com_def import BitDepth, Format, Plane, Sequence
+from yuv.yuv_io import YuvReader
+
+# 缓存文件的后缀
+_CACHE_SUFFIX = ".stats.json"
+
+
+def _scale(bit_depth: BitDepth) -> float:
+    """
+    :return: 将样本值换算到8比特的系数，使不同比特深度的 SI/TI 可以直接比较
+    """
+    return 1.0 / (1 << (bit_depth.value - 8))
+
+
+def sobel(x: np.ndarray) -> np.ndarray:
+    """
+    对一批图像做Sobel滤波，只保留完整窗口覆盖的区域
+    :param x: 形状为 (n, H, W) 的数组
+    :return: 形状为 (n, H - 2, W - 2) 的梯度幅值，float32
+    """
+    x = x.astype(np.float32)
+    # 可分离的Sobel算子：一个方向求差分，另一个方向做 [1, 2, 1] 平滑
+    s = x[:, :-2] + 2 * x[:, 1:-1] + x[:, 2:]
+    gx = s[:, :, 2:] - s[:, :, :-2]
+    d = x[:, 2:] - x[:, :-2]
+    gy = d[:, :, :-2] + 2 * d[:, :, 1:-1] + d[:, :, 2:]
+    return np.sqrt(gx * gx + gy * gy)
+
+
+def spatial_information(y: np.ndarray, bit_depth: BitDepth) -> np.ndarray:
+    """
+    逐帧计算 ITU-T P.910 的空间信息（Sobel梯度幅值的标准差）
+    :param y: 亮度分量，形状为 (n, H, W) 的数组
+    :param bit_depth: 比特深度，结果换算到8比特
+    :return: 长度为n的SI数组
+    """
+    return np.std(sobel(y), axis=(1, 2), dtype=np.float64) * _scale(bit_depth)
+
+
+def temporal_information(y: np.ndarray, bit_depth: BitDepth, prev: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    逐帧计算 ITU-T P.910 的时间信息（与前一帧差值的标准差）
+    :param y: 亮度分量，形状为 (n, H, W) 的数组
+    :param bit_depth: 比特深度，结果换算到8比特
+    :param prev: 第一帧的前一帧，形状为 (H, W)，None 表示第一帧没有前一帧，其TI为NaN
+    :return: 长度为n的TI数组
+    """
+    result = np.empty(y.shape[0], dtype=np.float64)
+    if y.shape[0] > 1:
+        diff = y[1:].astype(np.float32) - y[:-1]
+        result[1:] = np.std(diff, axis=(1, 2), dtype=np.float64)
+    if prev is None:
+        result[0] = np.nan
+    else:
+        result[0] = np.std(y[0].astype(np.float32) - prev, dtype=np.float64)
+    return result * _scale(bit_depth)
+
+
+def plane_stats(plane: Plane) -> Dict[str, float]:
+    """
+    计算单个分量的均值、方差、最小值和最大值
+    :param plane: 分量对象
+    :return: 各项统计量
+    """
+    buff = plane.get()
+    return {"mean": float(np.mean(buff, dtype=np.float64)), "var": float(np.var(buff, dtype=np.float64)),
+            "min": int(buff.min()), "max": int(buff.max())}
+
+
+class StatsReport(object):
+    """
+    序列的内容统计结果。
+    `report["si"]` 等为逐帧的结果数组，`report.histograms["y"]` 为整个序列各分量的直方图，
+    `report.si` 与 `report.ti` 为 P.910 定义的序列 SI/TI（逐帧结果的最大值）
+    """
+
+    def __init__(self, values: Dict[str, np.ndarray], histograms: Dict[str, np.ndarray], start: int = 0):
+        self.values = values
+        self.histograms = histograms
+        self.start = start
+
+    @property
+    def frames(self) -> int:
+        return len(next(iter(self.values.values()))) if self.values else 0
+
+    @property
+    def si(self) -> float:
+        return float(np.max(self.values["si"])) if self.frames else float("nan")
+
+    @property
+    def ti(self) -> float:
+        ti = self.values["ti"] if self.frames else np.empty(0)
+        return float(np.nanmax(ti)) if np.any(~np.isnan(ti)) else float("nan")
+
+    def keys(self):
+        return self.values.keys()
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.values[key]
+
+    def summary(self) -> Dict[str, float]:
+        """
+        :return: 整个序列的统计量：SI/TI 取最大值，均值和方差取逐帧平均，最小值和最大值取全局的最值
+        """
+        result = {"si": self.si, "ti": self.ti}
+        for k, v in self.values.items():
+            if k.startswith("min_"):
+                result[k] = int(np.min(v))
+            elif k.startswith("max_"):
+                result[k] = int(np.max(v))
+            elif k not in result:
+                result[k] = float(np.mean(v))
+        return result
+
+    def __str__(self):
+        return ", ".join(f"{k}: {v:.4f}" if isinstance(v, float) else f"{k}: {v}" for k, v in self.summary().items())
+
+    def to_dict(self) -> Dict:
+        return {
+            "start": self.start,
+            # NaN 不是合法的JSON，写为null
+            "values": {k: [None if np.isnan(x) else x for x in v.tolist()] for k, v in self.values.items()},
+            "histograms": {k: v.tolist() for k, v in self.histograms.items()},
+        }
+
+    @staticmethod
+    def from_dict(data: Dict) -> "StatsReport":
+        values = {k: np.array([np.nan if x is None else x for x in v], dtype=np.float64)
+                  for k, v in data["values"].items()}
+        histograms = {k: np.array(v, dtype=np.int64) for k, v in data["histograms"].items()}
+        return StatsReport(values, histograms, data["start"])
+
+    def to_json(self, path: str) -> NoReturn:
+        with open(path, "w") as fp:
+            json.dump(self.to_dict(), fp)
+
+    @staticmethod
+    def from_json(path: str) -> "StatsReport":
+        with open(path, "r") as fp:
+            return StatsReport.from_dict(json.load(fp))
+
+    def to_csv(self, path: str) -> NoReturn:
+        """
+        以CSV格式写出逐帧的结果，每帧一行
+        """
+        keys = list(self.values.keys())
+        with open(path, "w", newline="") as fp:
+            writer = csv.writer(fp)
+            writer.writerow(["frame"] + keys)
+            for i in range(self.frames):
+                writer.writerow([self.start + i] + [self.values[k][i] for k in keys])
+
+
+def _batch_stats(batch: Tuple, fmt: Format, bit_depth: BitDepth, prev: Optional[np.ndarray],
+                 histograms: Optional[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """
+    计算一批帧的各项统计量，并将直方图累加到 histograms 中
+    :param batch: `YuvReader.read_batch` 的结果
+    :param prev: 这批帧之前的一帧亮度，用于计算第一帧的TI
+    :return: 统计量名到逐帧结果的映射
+    """
+    planes = ("y",) if fmt == Format.YUV400 else ("y", "u", "v")
+    values = {"si": spatial_information(batch[0], bit_depth),
+              "ti": temporal_information(batch[0], bit_depth, prev)}
+    max_value = (1 << bit_depth.value) - 1
+    for name, x in zip(planes, batch):
+        values[f"mean_{name}"] = np.mean(x, axis=(1, 2), dtype=np.float64)
+        values[f"var_{name}"] = np.var(x, axis=(1, 2), dtype=np.float64)
+        values[f"min_{name}"] = x.min(axis=(1, 2)).astype(np.float64)
+        values[f"max_{name}"] = x.max(axis=(1, 2)).astype(np.float64)
+        if histograms is not None:
+            # 超出比特深度范围的值计入最后一个区间
+            histograms[name] += np.bincount(np.minimum(x, max_value).ravel(), minlength=max_value + 1)
+    return values
+
+
+def _stats_range(seq: Sequence, start: int, frames: int, batch: int,
+                 histogram: bool) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    计算 [start, start + frames) 范围内各帧的统计量，作为进程池的任务。
+    不是从第0帧开始时额外读取前一帧，以计算第一帧的TI
+    """
+    planes = ("y",) if seq.fmt == Format.YUV400 else ("y", "u", "v")
+    histograms = {name: np.zeros(1 << seq.bit_depth.value, dtype=np.int64) for name in planes} if histogram else None
+    results: List[Dict[str, np.ndarray]] = list()
+    with YuvReader(seq) as reader:
+        prev = None
+        if start > 0:
+            reader.seek(start - 1)
+            prev = reader.read_batch(1)[0][0]
+        else:
+            reader.seek(start)
+        while frames > 0:
+            n = min(batch, frames)
+            data = reader.read_batch(n)
+            results.append(_batch_stats(data, seq.fmt, seq.bit_depth, prev, histograms))
+            prev = data[0][-1]
+            frames -= n
+    values = {k: np.concatenate([r[k] for r in results]) for k in results[0]} if results else dict()
+    return values, histograms or dict()
+
+
+def _cache_key(seq: Sequence, start: int, frames: int, histogram: bool) -> Dict:
+    st = os.stat(seq.full_name())
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "width": seq.width, "height": seq.height,
+            "fmt": seq.fmt.name, "bit_depth": seq.bit_depth.value,
+            "start": start, "frames": frames, "histogram": histogram}
+
+
+def stats_seq(seq: Sequence, start: int = 0, frames: Optional[int] = None, batch: int = 8,
+              workers: Optional[int] = None, histogram: bool = True, cache: bool = False) -> StatsReport:
+    """
+    一次流式读取序列，计算逐帧的 SI/TI（亮度，换算到8比特）以及各分量的均值、方差、最小值、最大值和直方图
+    :param seq: 序列对象
+    :param start: 起始帧
+    :param frames: 计算的帧数，默认计算到序列末尾
+    :param batch: 每次读取的帧数，决定了内存占用
+    :param workers: 进程数，None 或 1 表示在当前进程中计算
+    :param histogram: 是否统计直方图
+    :param cache: 为True时将结果缓存到序列旁的 `.stats.json` 文件中，文件大小或修改时间变化后缓存失效
+    :return: 统计结果
+    """
+    with YuvReader(seq) as reader:
+        total = max(0, reader.frames() - start)
+    frames = total if frames is None else min(frames, total)
+
+    cache_path = seq.full_name() + _CACHE_SUFFIX
+    if cache:
+        key = _cache_key(seq, start, frames, histogram)
+        if os.path.exists(cache_path):
+            with open(cache_path, "r") as fp:
+                data = json.load(fp)
+            if data.get("key") == key:
+                return StatsReport.from_dict(data["report"])
+
+    if workers is None or workers <= 1 or frames <= batch:
+        values, histograms = _stats_range(seq, start, frames, batch, histogram)
+    else:
+        step = -(-frames // workers)
+        ranges = [(s, min(step, start + frames - s)) for s in range(start, start + frames, step)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_stats_range, seq, s, n, batch, histogram) for s, n in ranges]
+            results = [f.result() for f in futures]
+        values = {k: np.concatenate([r[0][k] for r in results]) for k in results[0][0]}
+        histograms = {k: sum(r[1][k] for r in results) for k in results[0][1]}
+    report = StatsReport(values, histograms, start)
+
+    if cache:
+        with open(cache_path, "w") as fp:
+            json.dump({"key": key, "report": report.to_dict()}, fp)
+    return report
@@ -1,12 +1,18 @@
 import copy
+import errno
+import os
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import List, NoReturn, Optional, Union
+from functools import partial
+from typing import List, NoReturn, Optional, Union, Tuple
 
 import cv2
 import numpy as np
 
-from yuv.com_def import Region, MetaData, Plane, Frame, Sequence, Format, Component
-from yuv.yuv_io import YuvReader, YuvWriter
+from yuv.com_def import Region, RegionArray, MetaData, Plane, Frame, Sequence, Format, Component, BitDepth, _get_uv_wh
+from yuv.com_def import cvt_bit_depth, _dtype
+from yuv.yuv_io import YuvReader, YuvWriter, YuvMmapReader
+from yuv.parallel import map_sequence
 
 
 class Converter(object):
@@ -20,7 +26,7 @@ class Converter(object):
         ])
         # @formatter:on
         return tuple(
-            (np.matmul(matrix, np.array([list(rgb)]).T).astype(np.int) + np.array([[0], [128], [128]])).flatten())
+            (np.matmul(matrix, np.array([list(rgb)]).T).astype(int) + np.array([[0], [128], [128]])).flatten())
 
     @staticmethod
     def yuv2rgb(yuv):
@@ -32,23 +38,132 @@ class Converter(object):
         ])
         # @formatter:on
         return tuple(
-            np.matmul(matrix, np.array([list(yuv)]).T - np.array([[0], [128], [128]])).astype(np.int).flatten())
+            np.matmul(matrix, np.array([list(yuv)]).T - np.array([[0], [128], [128]])).astype(int).flatten())
+
+
+# 回退到用户态拷贝时的缓冲区大小
+_COPY_CHUNK = 16 << 20
+
+
+def _copy_bytes(fd_src: int, fd_dst: int, offset_src: int, offset_dst: int, count: int) -> NoReturn:
+    """
+    将源文件 [offset_src, offset_src + count) 的数据拷贝到目标文件的 offset_dst 处。
+    优先使用内核态拷贝（copy_file_range、sendfile），不支持时回退到大缓冲区的读写
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            while count > 0:
+                n = os.copy_file_range(fd_src, fd_dst, count, offset_src, offset_dst)
+                if n == 0:
+                    raise EOFError("Unexpected end of source file")
+                offset_src += n
+                offset_dst += n
+                count -= n
+            return
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+    if hasattr(os, "sendfile"):
+        try:
+            os.lseek(fd_dst, offset_dst, os.SEEK_SET)
+            while count > 0:
+                n = os.sendfile(fd_dst, fd_src, offset_src, count)
+                if n == 0:
+                    raise EOFError("Unexpected end of source file")
+                offset_src += n
+                offset_dst += n
+                count -= n
+            return
+        except OSError as e:
+            if e.errno not in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+    os.lseek(fd_src, offset_src, os.SEEK_SET)
+    os.lseek(fd_dst, offset_dst, os.SEEK_SET)
+    while count > 0:
+        data = os.read(fd_src, min(count, _COPY_CHUNK))
+        if not data:
+            raise EOFError("Unexpected end of source file")
+        # 处理部分写入，直到这一块全部写出
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd_dst, view):]
+        count -= len(data)
 
 
 class Concat(object):
     """
-    YUV 图像拼接器
-    TODO：按空域拼接
+    YUV 图像拼接器，支持按时域拼接和按空域拼接（左右、上下及 N×M 宫格）
     """
 
+    @staticmethod
+    def grid(sizes: List[Tuple[int, int]], rows: int, cols: int) -> Tuple[np.ndarray, int, int]:
+        """
+        按行优先将若干图像排列为 rows×cols 的宫格，每列的宽度取该列图像的最大宽度，每行的高度取该行图像的最大高度。
+        左右拼接即 rows=1，上下拼接即 cols=1
+        :param sizes: 各图像的 (width, height)
+        :param rows: 行数
+        :param cols: 列数
+        :return: (position, width, height)，position 为形状 (N, 2) 的 (x, y) 数组，width、height 为拼接后的大小
+        """
+        assert len(sizes) <= rows * cols
+        col_w = [0] * cols
+        row_h = [0] * rows
+        for i, (w, h) in enumerate(sizes):
+            r, c = divmod(i, cols)
+            col_w[c] = max(col_w[c], w)
+            row_h[r] = max(row_h[r], h)
+        xs = np.concatenate([[0], np.cumsum(col_w)])
+        ys = np.concatenate([[0], np.cumsum(row_h)])
+        position = np.array([(xs[i % cols], ys[i // cols]) for i in range(len(sizes))], dtype=int).reshape(-1, 2)
+        return position, int(xs[-1]), int(ys[-1])
+
+    @staticmethod
+    def _check_position(position: np.ndarray, count: int, fmt: Format) -> np.ndarray:
+        """
+        检查各图像的位置，色度下采样时位置须与色度采样网格对齐
+        :return: 形状为 (count, 2) 的 (x, y) 数组
+        """
+        position = np.asarray(position, dtype=int).reshape(-1, 2)
+        assert position.shape[0] == count
+        if fmt != Format.YUV400:
+            sx, sy = MetaData(None, fmt).uv_scale()
+            if np.any(position[:, 0] & ((1 << sx) - 1)) or np.any(position[:, 1] & ((1 << sy) - 1)):
+                raise ValueError(f"Position must be aligned to the chroma subsampling of {fmt.name}")
+        return position
+
+    @staticmethod
+    def _canvas(width: int, height: int, bit_depth: BitDepth, fmt: Format) -> Frame:
+        """
+        分配拼接结果的帧，各分量连续存放，空白处亮度为0、色度为中间值
+        """
+        dtype = _dtype(bit_depth)
+        areas = [size // np.dtype(dtype).itemsize
+                 for size in MetaData(Region(0, 0, width, height), fmt, bit_depth).plane_sizes()]
+        buff = np.zeros(sum(areas), dtype=dtype)
+        buff[areas[0]:] = 1 << (bit_depth.value - 1)
+        return Frame(width, height, bit_depth, fmt, *np.split(buff, np.cumsum(areas)[:-1]))
+
+    @staticmethod
+    def _mosaic(canvas: Frame, frames: List[Frame], position: np.ndarray) -> Frame:
+        """
+        将各帧按位置拷贝到 canvas 中，超出 canvas 的部分被裁剪
+        """
+        for frame, (x, y) in zip(frames, position):
+            Mask.draw_frame_with_sub_frame(canvas, frame, int(x), int(y))
+        return canvas
+
     @staticmethod
     def concat(frames_list: List[List[Frame]], position: np.ndarray = None) -> List[Frame]:
         """
         将帧列表的列表拼接在一起，类似numpy的flatten方法
         :param frames_list: 帧列表的列表
-        :param position: 如果传入该列表，则按空域拼接. 该参数的信息与frame_list 一一对应
+        :param position: 如果传入该列表，则按空域拼接. 该参数的信息与frame_list 一一对应，
+                         为形状 (N, 2) 的 (x, y) 数组，可由 `Concat.grid` 得到。
+                         按空域拼接时，结果的第t帧由各帧列表的第t帧拼接而成，帧数取各列表帧数的最小值
         :return:帧列表
         """
+        if position is not None:
+            return Concat._concat_spatial(frames_list, position)
 
         def check_res():
             """
@@ -72,13 +187,34 @@ class Concat(object):
         return result
 
     @staticmethod
-    def concat_seq(seq_list: List[Sequence], target_seq: Sequence) -> NoReturn:
+    def _concat_spatial(frames_list: List[List[Frame]], position: np.ndarray) -> List[Frame]:
+        first = frames_list[0][0]
+        for frames in frames_list:
+            for frame in frames:
+                assert frame.fmt == first.fmt
+        position = Concat._check_position(position, len(frames_list), first.fmt)
+        width = max(int(x) + frames[0].width for frames, (x, _) in zip(frames_list, position))
+        height = max(int(y) + frames[0].height for frames, (_, y) in zip(frames_list, position))
+        result = list()
+        for t in range(min(len(frames) for frames in frames_list)):
+            canvas = Concat._canvas(width, height, first.bit_depth, first.fmt)
+            result.append(Concat._mosaic(canvas, [frames[t] for frames in frames_list], position))
+        return result
+
+    @staticmethod
+    def concat_seq(seq_list: List[Sequence], target_seq: Sequence,
+                   frame_ranges: Optional[List[Tuple[int, Optional[int]]]] = None,
+                   position: np.ndarray = None) -> NoReturn:
         """
-        拼接多个序列
+        拼接多个序列。按时域拼接时由于各序列的元数据相同，直接按字节拷贝文件内容，不解码为帧
         :param seq_list: 序列对象列表
         :param target_seq: 待写入的目标文件序列对象
+        :param frame_ranges: 每个序列需要拼接的帧范围 [start, end)，end 为None表示到序列末尾；默认拼接全部帧
+        :param position: 如果传入该参数，则按空域拼接，参见 `concat_spatial_seq`
         :return:
         """
+        if position is not None:
+            return Concat.concat_spatial_seq(seq_list, target_seq, position, frame_ranges)
 
         def check_res():
             """
@@ -93,15 +229,79 @@ class Concat(object):
                 pre_seq = _seq
 
         check_res()
+        if frame_ranges is None:
+            frame_ranges = [(0, None)] * len(seq_list)
+        assert len(frame_ranges) == len(seq_list)
 
         writer = YuvWriter(target_seq)
-        for seq in seq_list:
+        writer.fp.flush()
+        offset_dst = writer.fp.tell()
+        for seq, (start, end) in zip(seq_list, frame_ranges):
             reader = YuvReader(seq)
-            for frame in reader:
-                writer.write(frame)
+            frames = reader.frames()
+            end = frames if end is None else min(end, frames)
+            start = min(max(start, 0), end)
+            count = (end - start) * reader._frame_size_yuv
+            _copy_bytes(reader.fp.fileno(), writer.fp.fileno(), start * reader._frame_size_yuv, offset_dst, count)
+            offset_dst += count
             reader.close()
+        writer.fp.seek(offset_dst, os.SEEK_SET)
         writer.close()
 
+    @staticmethod
+    def concat_spatial_seq(seq_list: List[Sequence], target_seq: Sequence, position: np.ndarray,
+                           frame_ranges: Optional[List[Tuple[int, Optional[int]]]] = None) -> NoReturn:
+        """
+        按空域拼接多个序列，输出的每一帧由各序列的对应帧拼接而成，帧数取各序列帧数的最小值。
+        逐帧流式处理，各序列只占用一个复用的帧缓冲区，输出帧预先分配并复用
+        :param seq_list: 序列对象列表，格式须与目标序列相同，比特深度不同时转换到目标序列的比特深度
+        :param target_seq: 待写入的目标文件序列对象，其宽高即拼接结果的大小，超出的部分被裁剪
+        :param position: 各序列左上角在目标序列中的位置，形状为 (N, 2) 的 (x, y) 数组，可由 `Concat.grid` 得到
+        :param frame_ranges: 每个序列需要拼接的帧范围 [start, end)，end 为None表示到序列末尾；默认拼接全部帧
+        :return:
+        """
+        for seq in seq_list:
+            assert seq.fmt == target_seq.fmt
+        position = Concat._check_position(position, len(seq_list), target_seq.fmt)
+        if frame_ranges is None:
+            frame_ranges = [(0, None)] * len(seq_list)
+        assert len(frame_ranges) == len(seq_list)
+
+        readers = [YuvReader(seq, buffers=1) for seq in seq_list]
+        frames = None
+        for reader, (start, end) in zip(readers, frame_ranges):
+            total = reader.frames()
+            end = total if end is None else min(end, total)
+            start = min(max(start, 0), end)
+            reader.seek(start)
+            frames = end - start if frames is None else min(frames, end - start)
+
+        canvas = Concat._canvas(target_seq.width, target_seq.height, target_seq.bit_depth, target_seq.fmt)
+        with YuvWriter(target_seq) as writer:
+            for _ in range(frames or 0):
+                writer.write(Concat._mosaic(canvas, [reader.read() for reader in readers], position))
+        for reader in readers:
+            reader.close()
+
+    @staticmethod
+    def mosaic_seq(seq_list: List[Sequence], target_seq: Sequence, rows: int = 1, cols: Optional[int] = None,
+                   frame_ranges: Optional[List[Tuple[int, Optional[int]]]] = None) -> NoReturn:
+        """
+        将多个序列按行优先排列为 rows×cols 的宫格并拼接，左右拼接即 rows=1，上下拼接即 cols=1
+        :param seq_list: 序列对象列表
+        :param target_seq: 待写入的目标文件序列对象，其宽高须与 `Concat.grid` 计算的大小一致
+        :param rows: 行数
+        :param cols: 列数，默认为 ceil(len(seq_list) / rows)
+        :param frame_ranges: 每个序列需要拼接的帧范围
+        :return:
+        """
+        if cols is None:
+            cols = -(-len(seq_list) // rows)
+        position, width, height = Concat.grid([(seq.width, seq.height) for seq in seq_list], rows, cols)
+        if (target_seq.width, target_seq.height) != (width, height):
+            raise ValueError(f"Target size {target_seq.width}x{target_seq.height} mismatch, expect {width}x{height}")
+        Concat.concat_spatial_seq(seq_list, target_seq, position, frame_ranges)
+
 
 class Cut(object):
     """
@@ -127,13 +327,29 @@ class Cut(object):
         :param target_seq:目标序列
         :return:None
         """
+        Cut.cut_seq_multi(seq, [region], [target_seq])
 
-        writer = YuvWriter(target_seq)
-        reader = YuvReader(seq)
+    @staticmethod
+    def cut_seq_multi(seq: Sequence, regions: List[Region], target_seqs: List[Sequence]) -> NoReturn:
+        """
+        一次遍历源序列，裁剪出多个区域并分别写入各自的目标序列。
+        源文件通过内存映射访问，每帧只拷贝各区域所在行的数据，不读取整帧
+        :param seq: 序列对象
+        :param regions: 裁剪区域列表
+        :param target_seqs: 目标序列列表，与 regions 一一对应
+        :return: None
+        """
+        assert len(regions) == len(target_seqs)
+        # 拷贝区域对象，避免裁剪时修改调用者传入的区域
+        regions = [copy.copy(region) for region in regions]
+        writers = [YuvWriter(target_seq) for target_seq in target_seqs]
+        reader = YuvMmapReader(seq)
         for frame in reader:
-            writer.write(Cut.cut(frame, region))
+            for region, writer in zip(regions, writers):
+                writer.write(Cut.cut(frame, copy.copy(region)))
         reader.close()
-        writer.close()
+        for writer in writers:
+            writer.close()
 
 
 class MotionEstimate(object):
@@ -142,54 +358,319 @@ class MotionEstimate(object):
         STEP3 = 1
         DIAM = 2
 
+    class Cost(Enum):
+        SAD = 0
+        SSE = 1
+
+    # 大菱形和小菱形搜索模板，(x, y)
+    _LARGE_DIAMOND = np.array([(0, 0), (-2, 0), (2, 0), (0, -2), (0, 2), (-1, -1), (1, -1), (-1, 1), (1, 1)])
+    _SMALL_DIAMOND = np.array([(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)])
+    # 全搜索时一次计算代价的候选块的像素总数上限
+    _CHUNK_PIXELS = 1 << 22
+
     @staticmethod
-    def _full_me(unit: np.ndarray, ref: np.ndarray, center=None):
+    def _windows(ref: np.ndarray, uh: int, uw: int) -> np.ndarray:
+        """
+        参考平面上所有候选块的视图，不拷贝数据
+        :param ref: 参考平面
+        :param uh: 块的高度
+        :param uw: 块的宽度
+        :return: 形状为 (H - uh + 1, W - uw + 1, uh, uw) 的只读视图，[y, x] 为左上角在 (x, y) 处的块
+        """
         height, width = ref.shape
-        uh, uw = unit.shape
         assert uh <= height
         assert uw <= width
-        dist = 1 << 32
-        for h in range(height - uh):
-            for w in range(width - uw):
-                pass
+        sy, sx = ref.strides
+        return np.lib.stride_tricks.as_strided(ref, shape=(height - uh + 1, width - uw + 1, uh, uw),
+                                               strides=(sy, sx, sy, sx), writeable=False)
 
     @staticmethod
-    def _step3_me(unit: np.ndarray, ref: np.ndarray, center=None):
-        pass
+    def _costs(units: np.ndarray, windows: np.ndarray, pos: np.ndarray, cost: Cost) -> np.ndarray:
+        """
+        批量计算每个块与其候选位置上参考块之间的代价
+        :param units: 形状为 (N, uh, uw) 的当前块
+        :param windows: `_windows` 得到的候选块视图
+        :param pos: 形状为 (N, 2) 的候选位置 (x, y)
+        :return: 形状为 (N,) 的代价
+        """
+        diff = windows[pos[:, 1], pos[:, 0]].astype(np.int32) - units
+        if cost == MotionEstimate.Cost.SSE:
+            return np.square(diff, dtype=np.int64).sum(axis=(1, 2))
+        return np.abs(diff).sum(axis=(1, 2), dtype=np.int64)
 
     @staticmethod
-    def _diam_me(unit: np.ndarray, ref: np.ndarray, center=None):
-        pass
+    def _search(units: np.ndarray, windows: np.ndarray, best: np.ndarray, lo: np.ndarray, hi: np.ndarray,
+                pattern: np.ndarray, cost: Cost, best_cost: np.ndarray = None, idx: np.ndarray = None):
+        """
+        以每个块当前的最优位置为中心，按给定模板搜索一次并原地更新最优位置和代价
+        :param best: 形状为 (N, 2) 的最优位置，原地更新
+        :param lo: 形状为 (N, 2) 的搜索范围下界（含）
+        :param hi: 形状为 (N, 2) 的搜索范围上界（含）
+        :param pattern: 形状为 (K, 2) 的偏移模板，第一个偏移须为 (0, 0)
+        :param best_cost: 形状为 (N,) 的最优代价，原地更新，为 None 时先计算中心点的代价
+        :param idx: 参与搜索的块序号，默认为全部块
+        :return: (最优代价, 最优位置是否改变)
+        """
+        if idx is None:
+            idx = np.arange(units.shape[0])
+        if best_cost is None:
+            best_cost = MotionEstimate._costs(units, windows, best, cost)
+        center = best[idx].copy()
+        moved = np.zeros(units.shape[0], dtype=bool)
+        for offset in pattern[1:]:
+            cand = center + offset
+            valid = np.all((cand >= lo[idx]) & (cand <= hi[idx]), axis=1)
+            sel = idx[valid]
+            if sel.size == 0:
+                continue
+            c = MotionEstimate._costs(units[sel], windows, cand[valid], cost)
+            better = c < best_cost[sel]
+            sel = sel[better]
+            best[sel] = cand[valid][better]
+            best_cost[sel] = c[better]
+            moved[sel] = True
+        return best_cost, moved
 
     @staticmethod
-    def me(plane: Plane, region: Region, ref_plane: Plane, search_range: int = None, method: Method = Method.FULL):
-        region = copy.copy(region)
-        region.x -= search_range
-        region.y -= search_range
-        region.width = search_range << 1
-        region.height = search_range << 1
-        ref_plane.ensure_roi(region)
+    def _tile(n: int) -> int:
+        """
+        :return: 将长度n均分为至多8段时的段长，段数取不超过8的n的最大因数
+        """
+        return n // max(g for g in range(1, min(n, 8) + 1) if n % g == 0)
+
+    @staticmethod
+    def _best_first(unit: np.ndarray, windows: np.ndarray, bound: np.ndarray, lo: np.ndarray, width: int,
+                    start: np.ndarray, cost: Cost):
+        """
+        按代价下界从小到大分批计算候选位置的代价，下界超过已找到的最小代价后停止，结果与逐个计算全部候选位置相同。
+        代价相同时保留距离起点较近的位置，距离也相同时保留按行优先先出现的位置
+        :param unit: 形状为 (uh, uw) 的当前块
+        :param windows: `_windows` 得到的候选块视图
+        :param bound: 搜索范围内各候选位置代价的下界，按行优先展开为一维
+        :param lo: 搜索范围左上角的位置 (x, y)
+        :param width: 搜索范围的宽度
+        :param start: 搜索起点 (x, y)
+        :return: (最优位置, 最优代价)
+        """
+        order = np.argsort(bound, kind="stable")
+        costs = np.full(bound.size, np.iinfo(np.int64).max)
+        best_cost = costs[0]
+        first, chunk = 0, 16
+        limit = max(1, MotionEstimate._CHUNK_PIXELS // unit.size)
+        while first < order.size and bound[order[first]] <= best_cost:
+            sel = order[first:first + chunk]
+            sel = sel[bound[sel] <= best_cost]
+            pos = np.stack([sel % width, sel // width], axis=1) + lo
+            costs[sel] = MotionEstimate._costs(np.broadcast_to(unit, (sel.size,) + unit.shape), windows, pos, cost)
+            best_cost = min(best_cost, costs[sel].min())
+            first += chunk
+            chunk = min(chunk * 2, limit)
+        ties = np.flatnonzero(costs == best_cost)
+        pos = np.stack([ties % width, ties // width], axis=1) + lo
+        return pos[np.argmin(np.abs(pos - start).sum(axis=1))], best_cost
+
+    @staticmethod
+    def _full_me(units: np.ndarray, ref: np.ndarray, start: np.ndarray, lo: np.ndarray, hi: np.ndarray,
+                 cost: Cost):
+        """
+        全搜索。将块均分为子块，由参考平面的积分图一次得到搜索范围内所有候选位置各子块之和，
+        子块之和的差给出代价的下界（SAD 为差的绝对值之和，SSE 为差的平方除以子块像素数之和），
+        再按下界从小到大只计算可能优于当前最优的候选位置的代价。代价相同时保留距离起点较近的位置
+        :param units: 形状为 (N, uh, uw) 的当前块
+        :param ref: 参考平面
+        :param start: 形状为 (N, 2) 的搜索起点 (x, y)
+        :param lo: 形状为 (N, 2) 的搜索范围下界（含）
+        :param hi: 形状为 (N, 2) 的搜索范围上界（含）
+        :return: (最优位置, 最优代价)
+        """
+        n, uh, uw = units.shape
+        windows = MotionEstimate._windows(ref, uh, uw)
+        th, tw = MotionEstimate._tile(uh), MotionEstimate._tile(uw)
+        # box[y, x] 为参考平面上左上角在 (x, y) 处的 th×tw 子块之和
+        integral = np.zeros((ref.shape[0] + 1, ref.shape[1] + 1), dtype=np.int64)
+        np.cumsum(np.cumsum(ref, axis=0, dtype=np.int64), axis=1, out=integral[1:, 1:])
+        box = integral[th:, tw:] - integral[:-th, tw:] - integral[th:, :-tw] + integral[:-th, :-tw]
+        unit_sums = units.reshape(n, uh // th, th, uw // tw, tw).sum(axis=(2, 4), dtype=np.int64)
+        sy, sx = box.strides
+        best = start.copy()
+        best_cost = np.empty(n, dtype=np.int64)
+        for i in range(n):
+            (x0, y0), (x1, y1) = lo[i], hi[i]
+            # sums[j, k, y, x] 为候选位置 (x0 + x, y0 + y) 处参考块的第 (j, k) 个子块之和
+            sums = np.lib.stride_tricks.as_strided(box[y0:, x0:], shape=(uh // th, uw // tw, y1 - y0 + 1, x1 - x0 + 1),
+                                                   strides=(th * sy, tw * sx, sy, sx), writeable=False)
+            diff = sums - unit_sums[i, :, :, np.newaxis, np.newaxis]
+            if cost == MotionEstimate.Cost.SSE:
+                bound = (np.square(diff) // (th * tw)).sum(axis=(0, 1))
+            else:
+                bound = np.abs(diff).sum(axis=(0, 1))
+            best[i], best_cost[i] = MotionEstimate._best_first(units[i], windows, bound.ravel(), lo[i],
+                                                               x1 - x0 + 1, start[i], cost)
+        return best, best_cost
+
+    @staticmethod
+    def _step3_me(units: np.ndarray, ref: np.ndarray, start: np.ndarray, lo: np.ndarray, hi: np.ndarray,
+                  cost: Cost):
+        """
+        三步搜索，步长从不超过搜索半径的最大的2的幂开始逐次减半，参数同 `_full_me`
+        """
+        windows = MotionEstimate._windows(ref, units.shape[1], units.shape[2])
+        best = start.copy()
+        radius = int(max(np.max(start - lo, initial=0), np.max(hi - start, initial=0)))
+        step = 1 << (radius.bit_length() - 1) if radius > 0 else 0
+        best_cost = None
+        square = np.array([(0, 0), (-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)])
+        while step > 0:
+            best_cost, _ = MotionEstimate._search(units, windows, best, lo, hi, square * step, cost, best_cost)
+            step >>= 1
+        if best_cost is None:
+            best_cost = MotionEstimate._costs(units, windows, best, cost)
+        return best, best_cost
+
+    @staticmethod
+    def _diam_me(units: np.ndarray, ref: np.ndarray, start: np.ndarray, lo: np.ndarray, hi: np.ndarray,
+                 cost: Cost):
+        """
+        菱形搜索，重复大菱形搜索直到最优点位于中心，再做一次小菱形搜索，参数同 `_full_me`
+        """
+        windows = MotionEstimate._windows(ref, units.shape[1], units.shape[2])
+        best = start.copy()
+        radius = int(max(np.max(start - lo, initial=0), np.max(hi - start, initial=0)))
+        best_cost = MotionEstimate._costs(units, windows, best, cost)
+        active = np.arange(units.shape[0])
+        # 每次移动至少一个像素，迭代次数不会超过搜索范围
+        for _ in range(2 * radius + 1):
+            if active.size == 0:
+                break
+            best_cost, moved = MotionEstimate._search(units, windows, best, lo, hi,
+                                                      MotionEstimate._LARGE_DIAMOND, cost, best_cost, active)
+            active = active[moved[active]]
+        best_cost, _ = MotionEstimate._search(units, windows, best, lo, hi,
+                                              MotionEstimate._SMALL_DIAMOND, cost, best_cost)
+        return best, best_cost
+
+    @staticmethod
+    def _method(method: Method):
         funcs = {
             MotionEstimate.Method.FULL: MotionEstimate._full_me,
             MotionEstimate.Method.STEP3: MotionEstimate._step3_me,
             MotionEstimate.Method.DIAM: MotionEstimate._diam_me,
         }
-        return funcs[method](plane.get(), ref_plane.get(), region)
+        return funcs[method]
+
+    @staticmethod
+    def me(plane: Plane, region: Region, ref_plane: Plane, search_range: int = 64, method: Method = Method.FULL,
+           cost: Cost = Cost.SAD):
+        """
+        对单个块做运动估计，搜索范围限制在参考平面内
+        :param plane: 当前平面
+        :param region: 当前块的区域
+        :param ref_plane: 参考平面
+        :param search_range: 搜索范围，水平和垂直方向均为 [-search_range, search_range]
+        :param method: 搜索方法
+        :param cost: 代价函数
+        :return: ((mv_x, mv_y), 代价)
+        """
+        region = copy.copy(region)
+        unit = plane[region]
+        uh, uw = unit.shape
+        ref = ref_plane.get()
+        assert uh <= ref.shape[0]
+        assert uw <= ref.shape[1]
+        start = np.array([[region.x, region.y]])
+        lo = np.maximum(start - search_range, 0)
+        hi = np.minimum(start + search_range, [[ref.shape[1] - uw, ref.shape[0] - uh]])
+        best, best_cost = MotionEstimate._method(method)(unit[np.newaxis], ref, start, lo, hi, cost)
+        mv = best[0] - start[0]
+        return (int(mv[0]), int(mv[1])), int(best_cost[0])
+
+    @staticmethod
+    def me_frame(frame: Frame, ref_frame: Frame, ctu_size: int = 64, search_range: int = 64,
+                 method: Method = Method.DIAM, cost: Cost = Cost.SAD, comp: Component = Component.COMP_Y):
+        """
+        对整帧的所有CTU批量做运动估计。不完整的边界CTU以及参考平面按边缘像素填充到CTU的整数倍
+        :param frame: 当前帧
+        :param ref_frame: 参考帧
+        :param ctu_size: 亮度CTU的大小，色度分量按 `uv_scale()` 缩放
+        :param search_range: 搜索范围，以该分量的像素为单位
+        :param method: 搜索方法
+        :param cost: 代价函数
+        :param comp: 分量
+        :return: (mv, 代价)，形状分别为 (rows, cols, 2) 和 (rows, cols)，mv 按 (x, y) 存放
+        """
+        bw, bh = ctu_size, ctu_size
+        if comp != Component.COMP_Y:
+            sx, sy = frame.uv_scale()
+            bw, bh = ctu_size >> sx, ctu_size >> sy
+        cur = frame[comp].get()
+        ref = ref_frame[comp].get()
+        assert cur.shape == ref.shape
+        height, width = cur.shape
+        rows, cols = -(-height // bh), -(-width // bw)
+        pad = ((0, rows * bh - height), (0, cols * bw - width))
+        cur = np.pad(cur, pad, mode="edge")
+        ref = np.pad(ref, pad, mode="edge")
+
+        units = cur.reshape(rows, bh, cols, bw).swapaxes(1, 2).reshape(-1, bh, bw)
+        ys, xs = np.meshgrid(np.arange(rows) * bh, np.arange(cols) * bw, indexing="ij")
+        start = np.stack([xs.ravel(), ys.ravel()], axis=1)
+        lo = np.maximum(start - search_range, 0)
+        hi = np.minimum(start + search_range, [ref.shape[1] - bw, ref.shape[0] - bh])
+        best, best_cost = MotionEstimate._method(method)(units, ref, start, lo, hi, cost)
+        return (best - start).reshape(rows, cols, 2), best_cost.reshape(rows, cols)
 
 
 class Mask(object):
     @staticmethod
-    def _add_colored_points(frame: Frame, points: list, color_yuv: tuple):
+    def _color(frame: Frame, color_yuv: tuple) -> np.ndarray:
         scale = frame.bit_depth.value - 8
-        yuv = np.array(color_yuv) << scale
+        return np.array(color_yuv, dtype=np.int64) << scale
 
-        for point in points:
-            x, y = point
-            if x < 0 or y < 0 or x >= frame.width or y >= frame.height:
-                continue
-            frame.get(Component.COMP_Y).get()[y, x] = yuv[0]
-            frame.get(Component.COMP_U).get()[y >> 1, x >> 1] = yuv[1]
-            frame.get(Component.COMP_V).get()[y >> 1, x >> 1] = yuv[2]
+    @staticmethod
+    def _uv_range(v0: int, v1: int, shift: int) -> Tuple[int, int]:
+        """
+        将亮度坐标范围 [v0, v1) 映射为色度坐标范围，部分覆盖的色度像素也计入
+        """
+        return v0 >> shift, (v1 + (1 << shift) - 1) >> shift
+
+    @staticmethod
+    def _fill_rect(frame: Frame, x0: int, y0: int, x1: int, y1: int, color_yuv: tuple):
+        """
+        用给定颜色填充矩形区域 [x0, x1) x [y0, y1)，超出图像的部分被裁剪
+        :param color_yuv: 8比特的YUV颜色，按帧的比特深度缩放
+        """
+        x0, x1 = max(x0, 0), min(x1, frame.width)
+        y0, y1 = max(y0, 0), min(y1, frame.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        yuv = Mask._color(frame, color_yuv)
+        frame[Component.COMP_Y].get()[y0:y1, x0:x1] = yuv[0]
+        if frame.fmt != Format.YUV400:
+            sx, sy = frame.uv_scale()
+            ux0, ux1 = Mask._uv_range(x0, x1, sx)
+            uy0, uy1 = Mask._uv_range(y0, y1, sy)
+            frame[Component.COMP_U].get()[uy0:uy1, ux0:ux1] = yuv[1]
+            frame[Component.COMP_V].get()[uy0:uy1, ux0:ux1] = yuv[2]
+
+    @staticmethod
+    def _fill_mask(frame: Frame, mask: np.ndarray, color_yuv: tuple):
+        """
+        用给定颜色填充掩码为真的亮度像素，以及与之对应的色度像素
+        :param mask: 与亮度平面同大小的布尔数组
+        """
+        yuv = Mask._color(frame, color_yuv)
+        frame[Component.COMP_Y].get()[mask] = yuv[0]
+        if frame.fmt != Format.YUV400:
+            sx, sy = frame.uv_scale()
+            plane_u = frame[Component.COMP_U].get()
+            uh, uw = plane_u.shape
+            # 亮度掩码补齐到色度采样的整数倍，再按采样块取或
+            padded = np.zeros((uh << sy, uw << sx), dtype=bool)
+            h, w = min(mask.shape[0], padded.shape[0]), min(mask.shape[1], padded.shape[1])
+            padded[:h, :w] = mask[:h, :w]
+            mask_uv = padded.reshape(uh, 1 << sy, uw, 1 << sx).any(axis=(1, 3))
+            plane_u[mask_uv] = yuv[1]
+            frame[Component.COMP_V].get()[mask_uv] = yuv[2]
 
     @staticmethod
     def _calc_line_width(line_width: int):
@@ -201,64 +682,418 @@ class Mask(object):
     @staticmethod
     def draw_line_hor(frame: Frame, y: int, x0: int, x1: int, color_rgb: tuple = (255, 255, 255), line_width: int = 1):
         line_width, half_line_width_0, half_line_width_1 = Mask._calc_line_width(line_width)
-        points = list()
-        y_range = (y - half_line_width_0, y + half_line_width_1)
-        for y in range(*y_range):
-            for x in range(x0, x1):
-                points.append((x, y))
-        Mask._add_colored_points(frame, points=points, color_yuv=Converter.rgb2yuv(color_rgb))
+        Mask._fill_rect(frame, x0, y - half_line_width_0, x1, y + half_line_width_1, Converter.rgb2yuv(color_rgb))
 
     @staticmethod
     def draw_line_ver(frame: Frame, x: int, y0: int, y1: int, color_rgb: tuple = (255, 255, 255), line_width: int = 1):
         line_width, half_line_width_0, half_line_width_1 = Mask._calc_line_width(line_width)
-        points = list()
-        x_range = (x - half_line_width_0, x + half_line_width_1)
-        for y in range(y0, y1):
-            for x in range(*x_range):
-                points.append((x, y))
-        Mask._add_colored_points(frame, points=points, color_yuv=Converter.rgb2yuv(color_rgb))
+        Mask._fill_rect(frame, x - half_line_width_0, y0, x + half_line_width_1, y1, Converter.rgb2yuv(color_rgb))
 
     @staticmethod
     def draw_grid(frame: Frame, grid_width: int, grid_height: int, color_rgb: tuple = (255, 255, 255),
                   line_width: int = 1, region: Region = None):
         if region is None:
             region = Region(0, 0, frame.width, frame.height)
-        for h in range(0, region.height // grid_height + 1):
-            Mask.draw_line_hor(frame, region.y + h * grid_height, region.x, region.x + region.width, color_rgb,
-                               line_width)
-        for w in range(0, region.width // grid_width + 1):
-            Mask.draw_line_ver(frame, region.x + w * grid_width, region.y, region.y + region.height, color_rgb,
-                               line_width)
+        line_width, half_line_width_0, half_line_width_1 = Mask._calc_line_width(line_width)
+        thickness = np.arange(-half_line_width_0, half_line_width_1)
+        ys = region.y + np.arange(0, region.height // grid_height + 1) * grid_height
+        xs = region.x + np.arange(0, region.width // grid_width + 1) * grid_width
+        ys = (ys[:, np.newaxis] + thickness).ravel()
+        xs = (xs[:, np.newaxis] + thickness).ravel()
+        ys = np.unique(ys[(ys >= 0) & (ys < frame.height)])
+        xs = np.unique(xs[(xs >= 0) & (xs < frame.width)])
+        x0, x1 = max(region.x, 0), min(region.x + region.width, frame.width)
+        y0, y1 = max(region.y, 0), min(region.y + region.height, frame.height)
+
+        mask = np.zeros((frame.height, frame.width), dtype=bool)
+        mask[ys, x0:x1] = True
+        mask[y0:y1, xs] = True
+        Mask._fill_mask(frame, mask, Converter.rgb2yuv(color_rgb))
+
+    @staticmethod
+    def draw_partition(frame: Frame, regions: Union[np.ndarray, RegionArray, List[Region]],
+                       color_rgb: tuple = (255, 255, 255), line_width: int = 1):
+        """
+        一次绘制大量矩形（如解码器输出的CU划分）的边框，相邻矩形的公共边重合
+        :param frame: 帧对象
+        :param regions: 形状为 (N, 4) 的数组，每行为 (x, y, width, height)，或区域数组、区域对象列表
+        :param color_rgb: 边框颜色
+        :param line_width: 线宽
+        :return:
+        """
+        if isinstance(regions, RegionArray):
+            regions = regions.data
+        elif not isinstance(regions, np.ndarray):
+            regions = np.array([(r.x, r.y, r.width, r.height) for r in regions])
+        regions = np.asarray(regions, dtype=np.int64).reshape(-1, 4)
+        line_width, half_line_width_0, half_line_width_1 = Mask._calc_line_width(line_width)
+        x, y, w, h = regions.T
+        # 每个矩形的上、下、左、右四条边，均表示为 [x0, x1) x [y0, y1) 的细长矩形
+        x0 = np.concatenate([x, x, x - half_line_width_0, x + w - half_line_width_0])
+        x1 = np.concatenate([x + w, x + w, x + half_line_width_1, x + w + half_line_width_1])
+        y0 = np.concatenate([y - half_line_width_0, y + h - half_line_width_0, y, y])
+        y1 = np.concatenate([y + half_line_width_1, y + h + half_line_width_1, y + h, y + h])
+        x0, x1 = np.clip(x0, 0, frame.width), np.clip(x1, 0, frame.width)
+        y0, y1 = np.clip(y0, 0, frame.height), np.clip(y1, 0, frame.height)
+        valid = (x0 < x1) & (y0 < y1)
+        x0, x1, y0, y1 = x0[valid], x1[valid], y0[valid], y1[valid]
+
+        # 二维差分后做两次前缀和，得到每个像素被覆盖的次数
+        diff = np.zeros((frame.height + 1, frame.width + 1), dtype=np.int32)
+        np.add.at(diff, (y0, x0), 1)
+        np.add.at(diff, (y0, x1), -1)
+        np.add.at(diff, (y1, x0), -1)
+        np.add.at(diff, (y1, x1), 1)
+        mask = diff.cumsum(axis=0).cumsum(axis=1)[:frame.height, :frame.width] > 0
+        Mask._fill_mask(frame, mask, Converter.rgb2yuv(color_rgb))
 
     @staticmethod
     def draw_border(frame: Frame, color_rgb: tuple = (255, 255, 255), line_width: int = 1):
         Mask.draw_grid(frame, frame.width - line_width, frame.height - line_width, color_rgb, line_width)
 
+    @staticmethod
+    def _paste(dst: np.ndarray, src: np.ndarray, x: int, y: int, bit_depth: Optional[BitDepth] = None,
+               target_bit_depth: Optional[BitDepth] = None):
+        """
+        将 src 拷贝到 dst 的 (x, y) 处，超出 dst 的部分被裁剪
+        :param bit_depth: src 的比特深度，与 target_bit_depth 不同时通过 `cvt_bit_depth` 转换
+        :param target_bit_depth: dst 的比特深度
+        """
+        h, w = dst.shape
+        sh, sw = src.shape
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sw, w), min(y + sh, h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        block = src[y0 - y:y1 - y, x0 - x:x1 - x]
+        if bit_depth != target_bit_depth:
+            block = cvt_bit_depth(block, bit_depth, target_bit_depth)
+        dst[y0:y1, x0:x1] = block
+
     @staticmethod
     def draw_frame_with_sub_frame(frame: Frame, sub_frame: Frame, x: int, y: int):
-        pos_x, pos_y = x, y
-        for y in range(0, sub_frame.height):
-            for x in range(0, sub_frame.width):
-                color = (sub_frame[Component.COMP_Y].get()[y, x],
-                         sub_frame[Component.COMP_U].get()[y >> 1, x >> 1],
-                         sub_frame[Component.COMP_V].get()[y >> 1, x >> 1],
-                         )
-                Mask._add_colored_points(frame, [(x + pos_x, y + pos_y)], color)
+        bit_depths = sub_frame.bit_depth, frame.bit_depth
+        Mask._paste(frame[Component.COMP_Y].get(), sub_frame[Component.COMP_Y].get(), x, y, *bit_depths)
+        if frame.fmt != Format.YUV400 and sub_frame.fmt != Format.YUV400:
+            sx, sy = frame.uv_scale()
+            for comp in (Component.COMP_U, Component.COMP_V):
+                Mask._paste(frame[comp].get(), sub_frame[comp].get(), x >> sx, y >> sy, *bit_depths)
 
 
 class Scaler(object):
+    # 可能产生过冲的插值方法，高比特深度时需要截断到有效范围
+    _OVERSHOOT = (cv2.INTER_CUBIC, cv2.INTER_LANCZOS4)
+
+    @staticmethod
+    def scaled_size(frame: MetaData, scale: Union[float, int]) -> Tuple[int, int]:
+        """
+        计算缩放后的宽高，按色度采样对齐（YUV420 宽高均为偶数，YUV422 宽为偶数，YUV444/YUV400 不对齐）
+        :param frame: 帧或序列对象
+        :param scale: 缩放比例
+        :return: (宽, 高)
+        """
+        sx, sy = (0, 0) if frame.fmt == Format.YUV400 else frame.uv_scale()
+        h, w = int(frame.height * scale + 0.5), int(frame.width * scale + 0.5)
+        h, w = max(h >> sy << sy, 1 << sy), max(w >> sx << sx, 1 << sx)
+        return w, h
+
     @staticmethod
-    def scale(frame: Frame, scale: Union[float, int]):
-        h, w = frame.height, frame.width
-        h, w = int(h * scale + 0.5), int(w * scale + 0.5)
-        h, w = h >> 1 << 1, w >> 1 << 1
-        y = cv2.resize(frame[Component.COMP_Y].get(), (w, h))
+    def scale(frame: Frame, scale: Union[float, int], interp: int = cv2.INTER_LINEAR):
+        """
+        缩放一帧，保持数据类型不变
+        :param frame: 帧对象
+        :param scale: 缩放比例
+        :param interp: cv2 的插值方法
+        :return: 缩放后的帧对象
+        """
+        w, h = Scaler.scaled_size(frame, scale)
+
+        def resize(buff: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+            out = cv2.resize(buff, size, interpolation=interp)
+            if interp in Scaler._OVERSHOOT and frame.bit_depth.value < 16 and buff.dtype == np.uint16:
+                np.minimum(out, (1 << frame.bit_depth.value) - 1, out=out)
+            return out
+
+        y = resize(frame[Component.COMP_Y].get(), (w, h))
         u = v = None
         if frame.fmt != Format.YUV400:
-            u = cv2.resize(frame[Component.COMP_U].get(), (w >> frame.uv_scale()[0], h >> frame.uv_scale()[1]))
-            v = cv2.resize(frame[Component.COMP_V].get(), (w >> frame.uv_scale()[0], h >> frame.uv_scale()[1]))
+            size_uv = (w >> frame.uv_scale()[0], h >> frame.uv_scale()[1])
+            u = resize(frame[Component.COMP_U].get(), size_uv)
+            v = resize(frame[Component.COMP_V].get(), size_uv)
         return Frame(width=w, height=h, bit_depth=frame.bit_depth, fmt=frame.fmt, buff_y=y, buff_u=u, buff_v=v)
 
+    @staticmethod
+    def scale_seq(seq: Sequence, target_seqs: Union[Sequence, List[Sequence]],
+                  scales: Union[float, int, List[Union[float, int]]], interp: int = cv2.INTER_AREA,
+                  workers: Optional[int] = None, batch: int = 8) -> NoReturn:
+        """
+        缩放序列，一次读取即可输出多个缩放比例的序列。cv2 在缩放时释放GIL，因此各帧在线程池中并行缩放
+        :param seq: 序列对象
+        :param target_seqs: 目标序列或目标序列列表，宽高须与 `scaled_size` 的结果一致
+        :param scales: 缩放比例或缩放比例列表，与 target_seqs 一一对应
+        :param interp: cv2 的插值方法
+        :param workers: 线程数，None 表示由线程池决定
+        :param batch: 每批并行处理的帧数
+        :return: None
+        """
+        if isinstance(target_seqs, Sequence):
+            target_seqs = [target_seqs]
+        if isinstance(scales, (int, float)):
+            scales = [scales]
+        assert len(target_seqs) == len(scales)
+        for target_seq, scale in zip(target_seqs, scales):
+            assert (target_seq.fmt, target_seq.bit_depth) == (seq.fmt, seq.bit_depth)
+            assert (target_seq.width, target_seq.height) == Scaler.scaled_size(seq, scale)
+
+        def scale_all(frame: Frame) -> List[Frame]:
+            return [Scaler.scale(frame, scale, interp) for scale in scales]
+
+        writers = [YuvWriter(target_seq) for target_seq in target_seqs]
+        reader = YuvReader(seq)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                frames = list()
+                for _ in range(batch):
+                    try:
+                        frames.append(reader.read())
+                    except EOFError:
+                        break
+                for results in executor.map(scale_all, frames):
+                    for writer, frame in zip(writers, results):
+                        writer.write(frame)
+                if len(frames) < batch:
+                    break
+        reader.close()
+        for writer in writers:
+            writer.close()
+
+
+class FormatConverter(object):
+    """
+    色度格式转换器，支持 YUV444、YUV422、YUV420、YUV400 之间的相互转换。
+    色度采样位置与 HM/VTM 默认的 chroma location type 0 一致：水平方向与亮度采样点重合（co-sited），
+    YUV420 的垂直方向位于两个亮度采样点的中间
+    """
+
+    class Filter(Enum):
+        # 下采样直接抽取，上采样直接复制
+        NEAREST = 0
+        # 水平方向：下采样为 [1, 2, 1] / 4，上采样偶数点复制、奇数点取相邻两点的均值；
+        # 垂直方向：下采样取相邻两点的均值，上采样按 1/4、3/4 相位线性插值
+        BILINEAR = 1
+        # 水平方向：下采样为 [1, 2, 1] / 4，上采样偶数点复制、奇数点为 VVC 色度插值滤波器 1/2 相位的4抽头滤波器；
+        # 垂直方向：下采样为 [1, 3, 3, 1] / 8，上采样为 VVC 色度插值滤波器 1/4、3/4 相位的4抽头滤波器
+        TAP4 = 2
+
+    _UP_TAP4_EVEN = np.array([-2, 16, 54, -4])
+    _UP_TAP4_ODD = np.array([-4, 54, 16, -2])
+    _UP_TAP4_HALF = np.array([-4, 36, 36, -4])
+
+    @staticmethod
+    def _pad(a: np.ndarray, before: int, after: int) -> np.ndarray:
+        """
+        沿最后一维按边缘像素填充
+        """
+        return np.pad(a, [(0, 0)] * (a.ndim - 1) + [(before, after)], mode="edge")
+
+    @staticmethod
+    def _down2(a: np.ndarray, filt: Filter, cosited: bool) -> np.ndarray:
+        """
+        沿最后一维做2:1下采样
+        :param cosited: 为True时色度采样点与偶数位置的亮度采样点重合，否则位于两个亮度采样点的中间
+        """
+        odd = a.shape[-1] & 1
+        if filt == FormatConverter.Filter.NEAREST:
+            return a[..., 0::2]
+        a = a.astype(np.int32)
+        if cosited:
+            p = FormatConverter._pad(a, 1, 1)
+            return (p[..., 0:-2:2] + 2 * p[..., 1:-1:2] + p[..., 2::2] + 2) >> 2
+        if filt == FormatConverter.Filter.BILINEAR:
+            p = FormatConverter._pad(a, 0, odd)
+            return (p[..., 0::2] + p[..., 1::2] + 1) >> 1
+        p = FormatConverter._pad(a, 1, 1 + odd)
+        return (p[..., 0:-3:2] + 3 * p[..., 1:-2:2] + 3 * p[..., 2:-1:2] + p[..., 3::2] + 4) >> 3
+
+    @staticmethod
+    def _up2(a: np.ndarray, filt: Filter, max_value: int, cosited: bool) -> np.ndarray:
+        """
+        沿最后一维做1:2上采样，是 `_down2` 的逆过程
+        :param cosited: 同 `_down2`，为True时偶数点直接复制，奇数点按 1/2 相位插值
+        """
+        if filt == FormatConverter.Filter.NEAREST:
+            return np.repeat(a, 2, axis=-1)
+        a = a.astype(np.int32)
+        length = a.shape[-1]
+        if cosited and filt == FormatConverter.Filter.BILINEAR:
+            p = FormatConverter._pad(a, 0, 1)
+            even = a
+            odd = (p[..., 0:length] + p[..., 1:length + 1] + 1) >> 1
+        elif cosited:
+            p = FormatConverter._pad(a, 1, 2)
+            even = a
+            odd = sum(c * p[..., i:i + length] for i, c in enumerate(FormatConverter._UP_TAP4_HALF))
+            odd = np.clip((odd + 32) >> 6, 0, max_value)
+        elif filt == FormatConverter.Filter.BILINEAR:
+            p = FormatConverter._pad(a, 1, 1)
+            even = (p[..., 0:length] + 3 * p[..., 1:length + 1] + 2) >> 2
+            odd = (3 * p[..., 1:length + 1] + p[..., 2:length + 2] + 2) >> 2
+        else:
+            p = FormatConverter._pad(a, 2, 2)
+            taps = [p[..., i:i + length] for i in range(5)]
+            even = sum(c * t for c, t in zip(FormatConverter._UP_TAP4_EVEN, taps[0:4]))
+            odd = sum(c * t for c, t in zip(FormatConverter._UP_TAP4_ODD, taps[1:5]))
+            even = np.clip((even + 32) >> 6, 0, max_value)
+            odd = np.clip((odd + 32) >> 6, 0, max_value)
+        return np.stack([even, odd], axis=-1).reshape(a.shape[:-1] + (length << 1,))
+
+    @staticmethod
+    def _resample(a: np.ndarray, shift_x: int, shift_y: int, filt: Filter, max_value: int) -> np.ndarray:
+        """
+        对色度平面做重采样，水平方向按 co-sited 的相位，垂直方向按位于两个亮度采样点中间的相位
+        :param shift_x: 水平方向的采样率变化，1 表示下采样，-1 表示上采样，0 表示不变
+        :param shift_y: 垂直方向的采样率变化
+        """
+        if shift_x > 0:
+            a = FormatConverter._down2(a, filt, cosited=True)
+        elif shift_x < 0:
+            a = FormatConverter._up2(a, filt, max_value, cosited=True)
+        if shift_y != 0:
+            a = np.swapaxes(a, -1, -2)
+            if shift_y > 0:
+                a = FormatConverter._down2(a, filt, cosited=False)
+            else:
+                a = FormatConverter._up2(a, filt, max_value, cosited=False)
+            a = np.swapaxes(a, -1, -2)
+        return a
+
+    @staticmethod
+    def _fit(a: np.ndarray, height: int, width: int) -> np.ndarray:
+        """
+        将重采样后的色度平面裁剪或按边缘像素填充到指定的宽高。
+        宽高为奇数时，2:1下采样得到的宽高向上取整，1:2上采样得到的宽高为偶数，均可能与 `_get_uv_wh` 不一致
+        """
+        a = a[..., :height, :width]
+        pad_y, pad_x = height - a.shape[-2], width - a.shape[-1]
+        if pad_y or pad_x:
+            a = np.pad(a, [(0, 0)] * (a.ndim - 2) + [(0, pad_y), (0, pad_x)], mode="edge")
+        return a
+
+    @staticmethod
+    def convert_batch(y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray],
+                      fmt: Format, target_fmt: Format, bit_depth: BitDepth,
+                      filt: Filter = Filter.TAP4) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        转换一个或一批平面的色度格式
+        :param y: 形状为 (H, W) 或 (n, H, W) 的亮度数组
+        :param u: 色度数组，YUV400 格式时为None
+        :param v: 色度数组，YUV400 格式时为None
+        :param fmt: 源格式
+        :param target_fmt: 目标格式
+        :param bit_depth: 比特深度
+        :param filt: 重采样滤波器
+        :return: 目标格式的 Y、U、V 数组，目标为 YUV400 时U、V为None
+        """
+        if target_fmt == Format.YUV400:
+            return y, None, None
+        if fmt == target_fmt:
+            return y, u, v
+        if fmt == Format.YUV400:
+            height, width = y.shape[-2:]
+            width_uv, height_uv = _get_uv_wh(width, height, target_fmt)
+            u = np.full(y.shape[:-2] + (height_uv, width_uv), 1 << (bit_depth.value - 1), dtype=y.dtype)
+            return y, u, u.copy()
+        src_x, src_y = MetaData(None, fmt).uv_scale()
+        dst_x, dst_y = MetaData(None, target_fmt).uv_scale()
+        max_value = (1 << bit_depth.value) - 1
+        height, width = y.shape[-2:]
+        width_uv, height_uv = _get_uv_wh(width, height, target_fmt)
+        result = list()
+        for a in (u, v):
+            a = FormatConverter._resample(a, dst_x - src_x, dst_y - src_y, filt, max_value)
+            result.append(FormatConverter._fit(a, height_uv, width_uv).astype(y.dtype))
+        return y, result[0], result[1]
+
+    @staticmethod
+    def convert(frame: Frame, target_fmt: Format, filt: Filter = Filter.TAP4) -> Frame:
+        """
+        转换一帧的色度格式
+        :param frame: 帧对象
+        :param target_fmt: 目标格式
+        :param filt: 重采样滤波器
+        :return: 目标格式的帧对象
+        """
+        u = v = None
+        if frame.fmt != Format.YUV400:
+            u, v = frame[Component.COMP_U].get(), frame[Component.COMP_V].get()
+        y, u, v = FormatConverter.convert_batch(frame[Component.COMP_Y].get(), u, v, frame.fmt, target_fmt,
+                                                frame.bit_depth, filt)
+        return Frame(frame.width, frame.height, frame.bit_depth, target_fmt, y, u, v)
+
+    @staticmethod
+    def convert_seq(seq: Sequence, target_seq: Sequence, filt: Filter = Filter.TAP4,
+                    batch: int = 8, workers: Optional[int] = None) -> NoReturn:
+        """
+        转换序列的色度格式，按批流式处理
+        :param seq: 序列对象
+        :param target_seq: 目标序列，其格式即为目标格式，宽高和比特深度须与源序列一致
+        :param filt: 重采样滤波器
+        :param batch: 每次处理的帧数
+        :param workers: 进程数，None 或 1 表示在当前进程中按批处理，大于1时通过 `map_sequence` 按帧范围多进程处理
+        :return: None
+        """
+        assert (seq.width, seq.height, seq.bit_depth) == (target_seq.width, target_seq.height, target_seq.bit_depth)
+        if workers is None or workers <= 1:
+            writer = YuvWriter(target_seq)
+            reader = YuvReader(seq)
+            for y, u, v in reader.iter_batches(batch):
+                writer.write_batch(*FormatConverter.convert_batch(y, u, v, seq.fmt, target_seq.fmt,
+                                                                  seq.bit_depth, filt))
+            reader.close()
+            writer.close()
+            return
+
+        map_sequence(seq, target_seq, partial(FormatConverter.convert, target_fmt=target_seq.fmt, filt=filt),
+                     workers=workers)
+
+
+class BitDepthConverter(object):
+    """
+    比特深度转换器
+    """
+
+    @staticmethod
+    def convert(frame: Frame, target_bit_depth: BitDepth) -> Frame:
+        """
+        转换一帧的比特深度，返回新的帧对象，不修改原帧
+        :param frame: 帧对象
+        :param target_bit_depth: 目标比特深度
+        :return: 目标比特深度的帧对象
+        """
+        buffs = [cvt_bit_depth(frame[Component.COMP_Y].get(), frame.bit_depth, target_bit_depth)]
+        if frame.fmt != Format.YUV400:
+            for comp in (Component.COMP_U, Component.COMP_V):
+                buffs.append(cvt_bit_depth(frame[comp].get(), frame.bit_depth, target_bit_depth))
+        return Frame(frame.width, frame.height, target_bit_depth, frame.fmt, *buffs)
+
+    @staticmethod
+    def convert_seq(seq: Sequence, target_seq: Sequence, batch: int = 16) -> NoReturn:
+        """
+        转换序列的比特深度，按批读取、转换并写出
+        :param seq: 序列对象
+        :param target_seq: 目标序列，其比特深度即为目标比特深度，宽高和格式须与源序列一致
+        :param batch: 每次处理的帧数
+        :return: None
+        """
+        assert (seq.width, seq.height, seq.fmt) == (target_seq.width, target_seq.height, target_seq.fmt)
+        writer = YuvWriter(target_seq)
+        reader = YuvReader(seq)
+        for planes in reader.iter_batches(batch):
+            writer.write_batch(*(None if plane is None else cvt_bit_depth(plane, seq.bit_depth, target_seq.bit_depth)
+                                 for plane in planes))
+        reader.close()
+        writer.close()
+
 
 if __name__ == '__main__':
     rgb = (222, 0, 0)
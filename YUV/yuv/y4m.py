@@ -0,0 +1,346 @@
+import os
+import re
+from abc import ABC
+from typing import BinaryIO, ClassVar, List, NoReturn, Optional, Iterable, Union
+
+import numpy as np
+
+from yuv.com_def import BitDepth, Format, Component, Sequence, Frame
+from yuv.yuv_io import YuvReader, YuvWriter
+from yuv.cache import FrameCache
+
+# 流头与帧头的标识
+_MAGIC = b"YUV4MPEG2"
+_FRAME = b"FRAME"
+# 不带参数的帧头，写出时每帧都使用该帧头
+_FRAME_MARKER = np.frombuffer(_FRAME + b"\n", dtype=np.uint8)
+# 扫描帧头时每次读取的字节数，帧头带参数时可能需要多次读取
+_SCAN_CHUNK = 64
+
+_CHROMA_FORMATS = {"420": Format.YUV420, "422": Format.YUV422, "444": Format.YUV444, "mono": Format.YUV400}
+_CHROMA_TAGS = {v: k for k, v in _CHROMA_FORMATS.items()}
+
+
+class Y4mHeader(object):
+    """
+    Y4M 的流头，形如 `YUV4MPEG2 W1920 H1080 F50:1 Ip A1:1 C420jpeg`。
+    未识别的参数（如 X 开头的扩展参数）原样保留在 extensions 中，写出时一并写出
+    """
+
+    def __init__(self, width: int, height: int, fps_num: int = 30, fps_den: int = 1,
+                 fmt: Format = Format.YUV420, bit_depth: BitDepth = BitDepth.BitDepth8,
+                 interlace: str = "p", aspect: str = "1:1", extensions: Optional[List[str]] = None):
+        self.width = width
+        self.height = height
+        self.fps_num = fps_num
+        self.fps_den = fps_den
+        self.fmt = fmt
+        self.bit_depth = bit_depth
+        self.interlace = interlace
+        self.aspect = aspect
+        self.extensions = extensions or list()
+        # 流头（含换行符）的字节数
+        self.size = len(self.to_bytes())
+
+    @staticmethod
+    def parse(line: bytes) -> "Y4mHeader":
+        """
+        解析流头
+        :param line: 流头，不含结尾的换行符
+        :return:
+        """
+        tokens = line.decode("ascii").split()
+        if not tokens or tokens[0] != _MAGIC.decode("ascii"):
+            raise ValueError(f"Not a Y4M stream header: {line[:32]!r}")
+        width = height = None
+        fps_num, fps_den = 30, 1
+        chroma, interlace, aspect = "420jpeg", "p", "1:1"
+        extensions = list()
+        for token in tokens[1:]:
+            key, value = token[0], token[1:]
+            if key == "W":
+                width = int(value)
+            elif key == "H":
+                height = int(value)
+            elif key == "F":
+                fps_num, fps_den = (int(x) for x in value.split(":"))
+            elif key == "C":
+                chroma = value
+            elif key == "I":
+                interlace = value
+            elif key == "A":
+                aspect = value
+            else:
+                extensions.append(token)
+        if width is None or height is None:
+            raise ValueError("Width and Height must be provided in the Y4M stream header")
+        # 如 420jpeg、420paldv、420p10、422p12、444、mono、mono16
+        m = re.match(r"^(420|422|444|mono)(jpeg|paldv|mpeg2|p?(\d+))?$", chroma)
+        if m is None:
+            raise ValueError(f"Unsupported Y4M chroma format: {chroma}")
+        try:
+            bit_depth = BitDepth(int(m.group(3)) if m.group(3) else 8)
+        except ValueError:
+            raise ValueError(f"Unsupported Y4M bit depth: {chroma}")
+        return Y4mHeader(width, height, fps_num, fps_den, _CHROMA_FORMATS[m.group(1)], bit_depth,
+                         interlace, aspect, extensions)
+
+    @staticmethod
+    def read(fp: BinaryIO) -> "Y4mHeader":
+        """
+        从文件头读取并解析流头，读取后文件指针位于第一个帧头处
+        :param fp: 以二进制方式打开的文件
+        :return:
+        """
+        fp.seek(0, os.SEEK_SET)
+        line = fp.readline()
+        if not line.endswith(b"\n"):
+            raise ValueError("Incomplete Y4M stream header")
+        header = Y4mHeader.parse(line[:-1])
+        # 读取的流头可能与写出的格式不同（参数顺序、空白），以实际长度为准
+        header.size = len(line)
+        return header
+
+    @staticmethod
+    def from_sequence(seq: Sequence) -> "Y4mHeader":
+        """
+        根据序列的元数据构造流头，未指定帧率时为30帧每秒
+        """
+        fps_num = 30 if seq.fps_num is None else seq.fps_num
+        fps_den = 1 if seq.fps_den is None else seq.fps_den
+        return Y4mHeader(seq.width, seq.height, fps_num, fps_den, seq.fmt, seq.bit_depth)
+
+    @property
+    def chroma(self) -> str:
+        """
+        :return: C 参数的值，8比特的4:2:0写为 420jpeg，高比特深度写为 420p10、mono16 等
+        """
+        tag = _CHROMA_TAGS[self.fmt]
+        if self.bit_depth == BitDepth.BitDepth8:
+            return "420jpeg" if self.fmt == Format.YUV420 else tag
+        return f"{tag}{self.bit_depth.value}" if self.fmt == Format.YUV400 else f"{tag}p{self.bit_depth.value}"
+
+    def to_bytes(self) -> bytes:
+        """
+        :return: 流头，包含结尾的换行符
+        """
+        tokens = [_MAGIC.decode("ascii"), f"W{self.width}", f"H{self.height}", f"F{self.fps_num}:{self.fps_den}",
+                  f"I{self.interlace}", f"A{self.aspect}", f"C{self.chroma}"] + self.extensions
+        return (" ".join(tokens) + "\n").encode("ascii")
+
+    def sequence(self, seq_path: str, name: str) -> Sequence:
+        """
+        :return: 与流头一致的序列对象
+        """
+        return Sequence(seq_path, name, self.width, self.height, self.fps_num, self.fps_den,
+                        bit_depth=self.bit_depth, fmt=self.fmt)
+
+
+def _scan_frames(fd: int, start: int, frame_size: int, file_size: int) -> np.ndarray:
+    """
+    扫描一遍所有的帧头，记录每帧像素数据的起始位置。末尾不完整的帧被忽略
+    :param fd: 文件描述符，使用 pread 读取，不移动文件指针
+    :param start: 第一个帧头的位置，即流头的长度
+    :param frame_size: 一帧像素数据的字节数
+    :param file_size: 文件大小
+    :return: 各帧像素数据在文件中的字节偏移，int64
+    """
+    offsets = list()
+    pos = start
+    while pos < file_size:
+        chunk = os.pread(fd, _SCAN_CHUNK, pos)
+        end = chunk.find(b"\n")
+        # 帧头带参数且超过一次读取的长度时继续读取
+        while end < 0 and pos + len(chunk) < file_size:
+            chunk += os.pread(fd, _SCAN_CHUNK, pos + len(chunk))
+            end = chunk.find(b"\n")
+        if end < 0 or not chunk.startswith(_FRAME):
+            raise ValueError(f"Invalid Y4M frame header at byte {pos}")
+        offset = pos + end + 1
+        if offset + frame_size > file_size:
+            break
+        offsets.append(offset)
+        pos = offset + frame_size
+    return np.array(offsets, dtype=np.int64)
+
+
+def _y4m_sequence(seq: Union[Sequence, str]) -> Sequence:
+    """
+    根据流头构造序列对象。传入序列对象时，其宽高须与流头一致，格式、比特深度和帧率以流头为准
+    """
+    full_name = seq if isinstance(seq, str) else seq.full_name()
+    with open(full_name, "rb") as fp:
+        header = Y4mHeader.read(fp)
+    if isinstance(seq, str):
+        return header.sequence(os.path.dirname(seq), os.path.basename(seq))
+    if (seq.width, seq.height) != (header.width, header.height):
+        raise ValueError(f"Sequence size {seq.width}x{seq.height} does not match "
+                         f"the Y4M stream header {header.width}x{header.height}: {full_name}")
+    return header.sequence(seq.path, seq.name)
+
+
+class Y4mReader(YuvReader, ABC):
+    """
+    Y4M 文件的输入类，接口与 `YuvReader` 相同。
+    打开文件时解析流头，并扫描一遍帧头建立每帧的偏移索引，之后 `seek` 到任意帧都只需一次文件指针移动
+    """
+    _contiguous = False
+
+    def __init__(self, seq: Union[Sequence, str], buffers: int = 0, prefetch: int = 0,
+                 components: Optional[Iterable[Component]] = None, cache: Union[bool, FrameCache] = False):
+        """
+        :param seq: 序列对象或文件路径。传入序列对象时其宽高须与流头一致，格式、比特深度和帧率以流头为准
+        :param buffers: 同 `YuvReader`
+        :param prefetch: 同 `YuvReader`
+        :param components: 同 `YuvReader`
+        :param cache: 同 `YuvReader`
+        """
+        self.header: Optional[Y4mHeader] = None
+        self._offsets = np.empty(0, dtype=np.int64)
+        super().__init__(_y4m_sequence(seq), buffers, prefetch, components, cache=cache)
+
+    def open(self) -> NoReturn:
+        """
+        如果IO流未打开，则打开IO流，解析流头并建立帧索引
+        :return:
+        """
+        if self.fp is None:
+            with open(self.sequence.full_name(), "rb") as fp:
+                self.header = Y4mHeader.read(fp)
+                self._offsets = _scan_frames(fp.fileno(), self.header.size, self._frame_size_yuv,
+                                             os.fstat(fp.fileno()).st_size)
+        super().open()
+
+    def _frame_offset(self, idx: int) -> int:
+        """
+        :return: 第 idx 帧像素数据的位置，超出帧数时为文件尾
+        """
+        return int(self._offsets[idx]) if idx < len(self._offsets) else self._file_size
+
+    def _frame_index(self) -> int:
+        # 读完一帧后文件指针位于下一帧的帧头处，同样对应下一帧
+        return int(np.searchsorted(self._offsets, self.fp.tell()))
+
+    def seek(self, frames) -> NoReturn:
+        """
+        移动文件指针，以帧为单位移动，通过帧索引直接定位
+        :param frames: 移动的帧数，负数表示向前移动，正数表示向后移动
+        :return:
+        """
+        if self._prefetch:
+            return super().seek(frames)
+        self.fp.seek(self._frame_offset(max(0, self._frame_index() + frames)), os.SEEK_SET)
+
+    def frames(self) -> int:
+        """
+        获取当前序列的总帧数
+        :return: 当前序列的总帧数
+        """
+        return len(self._offsets)
+
+    def _read_item(self) -> Union[np.ndarray, Frame]:
+        """
+        跳过帧头后读取一帧
+        """
+        idx = self._frame_index()
+        if idx >= len(self._offsets):
+            raise EOFError(f"End of file: {self.sequence.full_name()}")
+        self.fp.seek(self._offsets[idx], os.SEEK_SET)
+        return super()._read_item()
+
+
+class Y4mWriter(YuvWriter, ABC):
+    """
+    Y4M 文件的输出类，接口与 `YuvWriter` 相同。
+    新建或清空文件时写出流头，每帧之前写出不带参数的帧头 `FRAME`，因此每帧的位置可以直接计算
+    """
+
+    def __init__(self, seq: Sequence, append: bool = False, frames: Optional[int] = None, truncate: bool = True,
+                 header: Optional[Y4mHeader] = None):
+        """
+        :param seq: 序列对象
+        :param append: 同 `YuvWriter`，向已有的文件追加时沿用其流头
+        :param frames: 同 `YuvWriter`，预先分配的帧在写入之前没有帧头
+        :param truncate: 同 `YuvWriter`
+        :param header: 写出的流头，None 表示根据序列的元数据构造（未指定帧率时为30帧每秒）
+        """
+        self.header: Y4mHeader = header or Y4mHeader.from_sequence(seq)
+        if (self.header.width, self.header.height, self.header.fmt, self.header.bit_depth) != \
+                (seq.width, seq.height, seq.fmt, seq.bit_depth):
+            raise ValueError("The Y4M stream header does not match the sequence")
+        self._header_size = 0
+        super().__init__(seq, append, frames, truncate)
+
+    def open(self) -> NoReturn:
+        """
+        如果IO流未打开，则打开IO流。文件为空时写出流头，否则读取已有的流头
+        :return:
+        """
+        if self.fp is not None:
+            return
+        super().open()
+        if os.fstat(self.fp.fileno()).st_size == 0:
+            data = self.header.to_bytes()
+            self._writev([np.frombuffer(data, dtype=np.uint8)], 0)
+            self._header_size = len(data)
+            self.fp.seek(0, os.SEEK_END)
+            return
+        with open(self.sequence.full_name(), "rb") as fp:
+            header = Y4mHeader.read(fp)
+        if (header.width, header.height, header.fmt, header.bit_depth) != \
+                (self.header.width, self.header.height, self.header.fmt, self.header.bit_depth):
+            raise ValueError(f"The existing Y4M stream header does not match the sequence: "
+                             f"{self.sequence.full_name()}")
+        self.header = header
+        self._header_size = header.size
+        if self.mode == "rb+":
+            # 不清空已有的文件时，顺序写入从第一帧开始
+            self.fp.seek(self._header_size, os.SEEK_SET)
+
+    def _frame_offset(self, idx: int) -> int:
+        """
+        :return: 第 idx 帧帧头的位置
+        """
+        return self._header_size + idx * (self._frame_size_yuv + _FRAME_MARKER.nbytes)
+
+    def frames(self) -> int:
+        """
+        获取当前文件中的总帧数
+        :return: 当前文件中的总帧数
+        """
+        size = os.fstat(self.fp.fileno()).st_size
+        return max(0, size - self._header_size) // (self._frame_size_yuv + _FRAME_MARKER.nbytes)
+
+    def write(self, frame: Frame) -> ClassVar:
+        """
+        向文件写入一帧图像
+        :param frame:
+        :return:
+        """
+        self._writev([_FRAME_MARKER] + self._planes(frame))
+        return self
+
+    def write_at(self, idx: int, frame: Frame) -> ClassVar:
+        """
+        向文件的第 idx 帧处写入一帧图像，不移动文件指针
+        :param idx: 帧序号
+        :param frame:
+        :return:
+        """
+        if self.mode == "ab+":
+            raise ValueError("write_at is not supported in append mode")
+        self._writev([_FRAME_MARKER] + self._planes(frame), self._frame_offset(idx))
+        return self
+
+    @staticmethod
+    def _batch_planes(y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray]) -> List[np.ndarray]:
+        """
+        按文件中的排列顺序列出各帧的帧头和各分量的连续数组
+        """
+        buffs = list()
+        step = 1 if u is None else 3
+        planes = YuvWriter._batch_planes(y, u, v)
+        for i in range(0, len(planes), step):
+            buffs.append(_FRAME_MARKER)
+            buffs.extend(planes[i:i + step])
+        return buffs
@@ -1,14 +1,28 @@
 import os
+import queue
+import threading
+import warnings
 from abc import ABC
-from typing import BinaryIO, Optional, NoReturn, IO, ClassVar
+from functools import partial
+from typing import BinaryIO, Optional, NoReturn, IO, ClassVar, List, Union, Tuple, Iterator, Iterable, Dict
+from typing import Hashable
 
 import numpy as np
 
 from yuv.com_def import BitDepth, Format, Component
-from yuv.com_def import Sequence, Frame, _get_uv_wh
+from yuv.com_def import Sequence, Frame, LazyFrame, _get_uv_wh
+from yuv.checksum import FrameIndex
+from yuv.cache import FrameCache, default_cache
+
+
+# 单次 writev 调用最多的缓冲区个数
+_IOV_MAX = os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") and "SC_IOV_MAX" in os.sysconf_names else 1024
 
 
 class YuvIO(object):
+    # 打开文件时的缓冲策略，参见内置函数 open 的 buffering 参数
+    _buffering: int = -1
+
     def __init__(self, seq: Sequence, mode: str):
         assert 'b' in mode
         self.sequence: Sequence = seq
@@ -20,12 +34,14 @@ class YuvIO(object):
         self._pixel_area_u = uv_w * uv_h
         self._pixel_area_v = self._pixel_area_u
         self._pixel_area_yuv = self._pixel_area_y + self._pixel_area_u + self._pixel_area_v
+        self._uv_width, self._uv_height = uv_w, uv_h
 
         shift = 0 if seq.bit_depth == BitDepth.BitDepth8 else 1
         self._frame_size_y = self._pixel_area_y << shift
         self._frame_size_u = self._pixel_area_u << shift
         self._frame_size_v = self._pixel_area_v << shift
         self._frame_size_yuv = self._frame_size_y + self._frame_size_u + self._frame_size_v
+        self._dtype = np.uint8 if seq.bit_depth == BitDepth.BitDepth8 else np.uint16
 
         self.open()
 
@@ -34,10 +50,12 @@ class YuvIO(object):
         如果IO流未打开，则打开IO流
         :return:
         """
-        if not os.path.exists(self.sequence.path):
+        if self.fp is not None:
+            return
+        # 只有写模式才需要创建目录
+        if ("w" in self.mode or "a" in self.mode) and not os.path.exists(self.sequence.path):
             os.makedirs(self.sequence.path)
-        if self.fp is None:
-            self.fp: IO = open(self.sequence.full_name(), self.mode)
+        self.fp: IO = open(self.sequence.full_name(), self.mode, buffering=self._buffering)
 
     def close(self) -> NoReturn:
         """
@@ -59,6 +77,30 @@ class YuvIO(object):
     def read(self) -> Frame:
         raise NotImplemented
 
+    def _frame_offset(self, idx: int) -> int:
+        """
+        :return: 读写第 idx 帧时文件指针的位置
+        """
+        return idx * self._frame_size_yuv
+
+    def _frame_index(self) -> int:
+        """
+        :return: 当前文件指针所在的帧序号
+        """
+        return self.fp.tell() // self._frame_size_yuv
+
+    def _to_frame(self, buff: np.ndarray) -> Frame:
+        """
+        将一帧的一维像素数据（Y、U、V依次排列）切分为三个分量并构造帧对象，不拷贝数据
+        :param buff: 一帧的一维像素数据，长度为 `_pixel_area_yuv`
+        :return: 帧对象，其各分量是 buff 的视图
+        """
+        end_y = self._pixel_area_y
+        end_u = end_y + self._pixel_area_u
+        return Frame(self.sequence.width, self.sequence.height,
+                     self.sequence.bit_depth, self.sequence.fmt,
+                     buff[:end_y], buff[end_y:end_u], buff[end_u:self._pixel_area_yuv])
+
     def write(self, frame: Frame):
         raise NotImplemented
 
@@ -86,36 +128,401 @@ class YuvIO(object):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
-        return self
+        # 不吞掉 with 语句块中的异常
+        return False
 
 
 class YuvReader(YuvIO, ABC):
-    def __init__(self, seq: Sequence):
+    # 文件中各帧的数据是否首尾相连，是则可以一次读取多帧
+    _contiguous: bool = True
+
+    def __init__(self, seq: Sequence, buffers: int = 0, prefetch: int = 0,
+                 components: Optional[Iterable[Component]] = None, verify: Union[bool, FrameIndex] = False,
+                 cache: Union[bool, FrameCache] = False):
+        """
+        :param seq: 序列对象
+        :param buffers: 循环复用的帧缓冲区个数，0 表示每帧分配新的缓冲区。
+                        复用时，第i帧返回的数据会在读取第i+buffers帧时被覆盖
+        :param prefetch: 预读的帧数，大于0时由后台线程提前读取后续帧，队列中最多缓存 prefetch 帧。
+                         同时复用缓冲区时，缓冲区个数至少为 prefetch + 2
+        :param components: 读取时实际读取的分量，None 表示读取全部分量。
+                           指定时 `read` 返回 `LazyFrame`，跳过其余分量的数据，其余分量在第一次访问时才读取；
+                           传入空集合则所有分量都延迟读取
+        :param verify: 读取时按逐帧摘要索引校验数据，不一致时抛出 ValueError。
+                       为True时读取序列已保存的索引（`FrameIndex.load`），也可以直接传入索引对象；
+                       索引不存在或已失效时给出警告并不做校验，需要时先用 `FrameIndex.build` 计算索引；
+                       不能与 components 同时使用
+        :param cache: 读取时使用的帧缓存，为True时使用进程内的默认缓存（`yuv.cache.default_cache()`）。
+                      `read`、`read_batch` 及 `seek` 后的随机读取均先查询缓存；
+                      `read` 返回的帧为缓存数据的只读视图，需要原地修改时须先拷贝。使用缓存时不复用缓冲区
+        """
+        self._buffers: List[np.ndarray] = list()
+        self._buffer_idx: int = 0
+        self._prefetch: int = 0
+        self._position: int = 0
+        self._thread: Optional[threading.Thread] = None
+        self._queue: Optional[queue.Queue] = None
+        self._stop: Optional[threading.Event] = None
+        self._lock = threading.Lock()
+        self._components = None if components is None else frozenset(components)
+        if verify and self._components is not None:
+            raise ValueError("verify can not be used together with components")
+        self._index: Optional[FrameIndex] = None
+        self._cache: Optional[FrameCache] = None
+        self._mtime_ns: int = 0
+        self._file_size: int = 0
+        if isinstance(cache, FrameCache) or cache:
+            # FrameCache 定义了 __len__，空缓存的真值为False，不能直接判断真值
+            self._cache = cache if isinstance(cache, FrameCache) else default_cache()
+            buffers = 0
+        if verify:
+            # 不临时计算索引：由正在校验的文件计算得到的索引必然与文件一致，校验没有意义
+            self._index = verify if isinstance(verify, FrameIndex) else FrameIndex.load(seq)
+            if self._index is None:
+                warnings.warn(f"No valid frame index for {seq.full_name()}, skipping verification")
         super().__init__(seq, "rb")
+        # 各分量在一帧中的偏移（像素）、像素数和形状
+        self._layout: Dict[Component, Tuple[int, int, Tuple[int, int]]] = {
+            Component.COMP_Y: (0, self._pixel_area_y, (seq.height, seq.width)),
+        }
+        if seq.fmt != Format.YUV400:
+            self._layout[Component.COMP_U] = (self._pixel_area_y, self._pixel_area_u,
+                                              (self._uv_height, self._uv_width))
+            self._layout[Component.COMP_V] = (self._pixel_area_y + self._pixel_area_u, self._pixel_area_v,
+                                              (self._uv_height, self._uv_width))
+        if buffers > 0 and prefetch > 0:
+            buffers = max(buffers, prefetch + 2)
+        self._buffers = [np.empty(self._pixel_area_yuv, dtype=self._dtype) for _ in range(buffers)]
+        self._prefetch = prefetch
+        self._start_prefetch()
 
-    def read(self) -> Frame:
+    def open(self) -> NoReturn:
         """
-        读取一帧图像
+        如果IO流未打开，则打开IO流，并在开启预读时启动预读线程
         :return:
         """
+        if self.fp is None:
+            self._position = 0
+        super().open()
+        st = os.fstat(self.fp.fileno())
+        self._mtime_ns, self._file_size = st.st_mtime_ns, st.st_size
+        self._start_prefetch()
+
+    def close(self) -> NoReturn:
+        """
+        停止预读线程，并关闭文件的IO流
+        :return:
+        """
+        self._stop_prefetch()
+        super().close()
+
+    def seek(self, frames) -> NoReturn:
+        """
+        移动文件指针，以帧为单位移动。开启预读时会丢弃已预读的帧，并从新的位置重新预读
+        :param frames: 移动的帧数，负数表示向前移动，正数表示向后移动
+        :return:
+        """
+        if not self._prefetch:
+            return super().seek(frames)
+        self._stop_prefetch()
+        self._position = max(0, self._position + frames)
+        self.fp.seek(self._frame_offset(self._position), os.SEEK_SET)
+        self._start_prefetch()
+
+    def frames(self) -> int:
+        """
+        获取当前序列的总帧数，不移动文件指针
+        :return: 当前序列的总帧数
+        """
+        return os.fstat(self.fp.fileno()).st_size // self._frame_size_yuv
+
+    def _start_prefetch(self) -> NoReturn:
+        if self._prefetch <= 0 or self._thread is not None or self.fp is None:
+            return
+        self._queue = queue.Queue(maxsize=self._prefetch)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._prefetch_worker, args=(self._queue, self._stop), daemon=True)
+        self._thread.start()
+
+    def _stop_prefetch(self) -> NoReturn:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._queue = None
+        self._stop = None
+
+    def _prefetch_worker(self, q: queue.Queue, stop: threading.Event) -> NoReturn:
+        """
+        预读线程：依次读取帧并放入有界队列，读到文件尾或出错时将异常放入队列后退出
+        """
+        fd = self.fp.fileno()
+        while not stop.is_set():
+            if hasattr(os, "posix_fadvise"):
+                # 提示内核提前读取后续的帧，对网络存储尤其有效
+                os.posix_fadvise(fd, self.fp.tell(), self._frame_size_yuv * self._prefetch, os.POSIX_FADV_WILLNEED)
+            try:
+                with self._lock:
+                    item = self._read_item()
+            except Exception as e:
+                item = e
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if isinstance(item, Exception):
+                return
+
+    def _prefetched(self) -> Union[np.ndarray, Frame]:
+        """
+        从预读队列中取出下一帧
+        """
+        item = self._queue.get()
+        if isinstance(item, Exception):
+            # 放回队列，使后续的读取同样抛出该异常
+            self._queue.put(item)
+            raise item
+        self._position += 1
+        return item
 
-        def read_frame(data_type):
-            return Frame(self.sequence.width, self.sequence.height,
-                         self.sequence.bit_depth, self.sequence.fmt,
-                         np.fromfile(self.fp, dtype=data_type, count=self._pixel_area_y),
-                         np.fromfile(self.fp, dtype=data_type, count=self._pixel_area_u),
-                         np.fromfile(self.fp, dtype=data_type, count=self._pixel_area_v))
+    def _next_buffer(self) -> np.ndarray:
+        """
+        获取下一个可用的帧缓冲区
+        :return: 长度为 `_pixel_area_yuv` 的一维数组
+        """
+        if not self._buffers:
+            return np.empty(self._pixel_area_yuv, dtype=self._dtype)
+        buff = self._buffers[self._buffer_idx]
+        self._buffer_idx = (self._buffer_idx + 1) % len(self._buffers)
+        return buff
 
-        if self.sequence.bit_depth == BitDepth.BitDepth8:
-            return read_frame(np.uint8)
+    def _read_into(self, buff: np.ndarray) -> int:
+        """
+        从当前文件指针处读取数据，填满给定的连续缓冲区
+        :param buff: C连续的数组
+        :return: 实际读取的字节数，小于缓冲区大小表示已到文件尾
+        """
+        view = memoryview(buff).cast("B")
+        total = 0
+        while total < view.nbytes:
+            n = self.fp.readinto(view[total:])
+            if not n:
+                break
+            total += n
+        return total
+
+    def _read_buffer(self) -> np.ndarray:
+        """
+        从当前文件指针处读取一帧数据
+        :return: 长度为 `_pixel_area_yuv` 的一维数组
+        """
+        idx = self._frame_index()
+        buff = self._next_buffer()
+        if self._read_into(buff) < self._frame_size_yuv:
+            raise EOFError(f"End of file: {self.sequence.full_name()}")
+        self._verify(buff[np.newaxis], idx)
+        return buff
+
+    def _verify(self, raw: np.ndarray, first: int) -> NoReturn:
+        """
+        按索引校验连续读取的若干帧
+        :param raw: 形状为 (m, _pixel_area_yuv) 的数组
+        :param first: 第一帧的帧序号
+        """
+        if self._index is None:
+            return
+        for i in range(raw.shape[0]):
+            idx = first + i
+            if idx >= len(self._index) or not self._index.verify(idx, memoryview(raw[i]).cast("B")):
+                raise ValueError(f"Checksum mismatch at frame {idx}: {self.sequence.full_name()}")
+
+    def _pread_into(self, buff: np.ndarray, offset: int) -> NoReturn:
+        """
+        从文件的指定位置读取数据填满缓冲区，不改变当前的文件指针
+        :param buff: C连续的数组
+        :param offset: 文件中的字节偏移
+        """
+        if self.fp is None:
+            raise ValueError(f"Reader of {self.sequence.full_name()} is closed")
+        view = memoryview(buff).cast("B")
+        if hasattr(os, "preadv"):
+            total = 0
+            while total < view.nbytes:
+                n = os.preadv(self.fp.fileno(), [view[total:]], offset + total)
+                if not n:
+                    raise EOFError(f"End of file: {self.sequence.full_name()}")
+                total += n
+            return
+        with self._lock:
+            pos = self.fp.tell()
+            self.fp.seek(offset, os.SEEK_SET)
+            n = self._read_into(buff)
+            self.fp.seek(pos, os.SEEK_SET)
+        if n < view.nbytes:
+            raise EOFError(f"End of file: {self.sequence.full_name()}")
+
+    def _load_plane(self, frame_offset: int, comp: Component) -> np.ndarray:
+        """
+        读取某一帧的一个分量，作为 `LazyFrame` 的加载函数
+        :param frame_offset: 该帧在文件中的字节偏移
+        :param comp: 分量
+        :return: 该分量的二维数组
+        """
+        offset, area, shape = self._layout[comp]
+        buff = np.empty(area, dtype=self._dtype)
+        self._pread_into(buff, frame_offset + offset * buff.itemsize)
+        return buff.reshape(shape)
+
+    def _read_partial(self) -> LazyFrame:
+        """
+        从当前文件指针处读取一帧中 components 指定的分量，跳过其余分量的数据
+        :return: 延迟加载的帧对象
+        """
+        frame_offset = self.fp.tell()
+        if frame_offset + self._frame_size_yuv > os.fstat(self.fp.fileno()).st_size:
+            raise EOFError(f"End of file: {self.sequence.full_name()}")
+        ring = self._next_buffer() if self._buffers else None
+        planes = dict()
+        for comp, (offset, area, shape) in self._layout.items():
+            if comp in self._components:
+                buff = ring[offset:offset + area] if ring is not None else np.empty(area, dtype=self._dtype)
+                if self._read_into(buff) < buff.nbytes:
+                    raise EOFError(f"End of file: {self.sequence.full_name()}")
+                planes[comp] = buff.reshape(shape)
+            else:
+                self.fp.seek(area * np.dtype(self._dtype).itemsize, os.SEEK_CUR)
+        return self._lazy_frame(frame_offset, planes)
+
+    def _lazy_frame(self, frame_offset: int, planes: Dict[Component, np.ndarray]) -> LazyFrame:
+        return LazyFrame(self.sequence.width, self.sequence.height, self.sequence.bit_depth, self.sequence.fmt,
+                         partial(self._load_plane, frame_offset), planes)
+
+    def _cache_layout(self) -> Hashable:
+        """
+        文件中帧的存储方式，作为缓存键的一部分，使以不同方式读取同一文件的输入类不会取到彼此缓存的帧
+        """
+        return type(self).__name__
+
+    def _read_item(self) -> Union[np.ndarray, Frame]:
+        """
+        读取一帧，读取全部分量时返回整帧的缓冲区，否则返回延迟加载的帧对象。
+        使用缓存时先查询缓存，命中时只移动文件指针
+        """
+        if self._cache is None:
+            return self._read_buffer() if self._components is None else self._read_partial()
+        frame_offset = self.fp.tell()
+        idx = self._frame_index()
+        # 文件中的帧不一定是紧密排列的平面数据，按下一帧的位置确定本帧的结尾
+        frame_end = self._frame_offset(idx + 1)
+        if frame_end > self._file_size:
+            raise EOFError(f"End of file: {self.sequence.full_name()}")
+        key = FrameCache.key(self.sequence, self._mtime_ns, idx, self._components, self._cache_layout())
+        item = self._cache.get(key)
+        if item is not None:
+            self.fp.seek(frame_end, os.SEEK_SET)
+        elif self._components is None:
+            item = self._read_buffer()
+            self._cache.put(key, item)
         else:
-            return read_frame(np.uint16)
+            frame = self._read_partial()
+            item = {comp: frame[comp].get() for comp in self._components if comp in self._layout}
+            self._cache.put(key, item)
+        return item if isinstance(item, np.ndarray) else self._lazy_frame(frame_offset, item)
+
+    def read(self) -> Frame:
+        """
+        读取一帧图像，一次读取整帧数据到连续的缓冲区，Y、U、V分量均为该缓冲区的视图。
+        指定了 components 时只读取指定的分量，返回 `LazyFrame`
+        :return:
+        """
+        item = self._prefetched() if self._prefetch else self._read_item()
+        return item if isinstance(item, Frame) else self._to_frame(item)
+
+    def _read_raw(self, n: int) -> np.ndarray:
+        """
+        一次连续读取至多n帧的原始数据
+        :param n: 最多读取的帧数
+        :return: 形状为 (m, _pixel_area_yuv) 的数组，m <= n，文件尾不足n帧时m为剩余的完整帧数
+        """
+        buff = np.empty((n, self._pixel_area_yuv), dtype=self._dtype)
+        if not self._prefetch and self._cache is None and self._contiguous:
+            first = self._frame_index()
+            m = self._read_into(buff) // self._frame_size_yuv
+            self._verify(buff[:m], first)
+            return buff[:m]
+        # 预读、使用缓存或帧之间不连续时逐帧读取
+        m = 0
+        while m < n:
+            try:
+                buff[m] = self._prefetched() if self._prefetch else self._read_item()
+            except EOFError:
+                break
+            m += 1
+        return buff[:m]
+
+    def read_batch(self, n: int) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        一次连续读取至多n帧，按分量返回三维数组，便于在时间维度上做向量化处理
+        :param n: 最多读取的帧数，文件尾不足n帧时返回剩余的帧
+        :return: Y、U、V分量的数组，形状分别为 (m, H, W)、(m, H_uv, W_uv)、(m, H_uv, W_uv)，
+                 均为同一块连续内存的视图；YUV400 格式的U、V分量为None。
+                 指定了 components 时逐帧读取，未指定的分量为None
+        """
+        if self._components is not None:
+            return self._read_batch_partial(n)
+        raw = self._read_raw(n)
+        m = raw.shape[0]
+        if m == 0:
+            raise EOFError(f"End of file: {self.sequence.full_name()}")
+        end_y = self._pixel_area_y
+        end_u = end_y + self._pixel_area_u
+        y = raw[:, :end_y].reshape(m, self.sequence.height, self.sequence.width)
+        if self.sequence.fmt == Format.YUV400:
+            return y, None, None
+        shape_uv = (m, self._uv_height, self._uv_width)
+        u = raw[:, end_y:end_u].reshape(shape_uv)
+        v = raw[:, end_u:].reshape(shape_uv)
+        return y, u, v
+
+    def _read_batch_partial(self, n: int) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        逐帧读取至多n帧的指定分量，并按分量堆叠为三维数组
+        """
+        frames: List[LazyFrame] = list()
+        while len(frames) < n:
+            try:
+                frames.append(self.read())
+            except EOFError:
+                break
+        if not frames:
+            raise EOFError(f"End of file: {self.sequence.full_name()}")
+        result = list()
+        for comp in (Component.COMP_Y, Component.COMP_U, Component.COMP_V):
+            if comp in self._layout and comp in self._components:
+                result.append(np.stack([frame[comp].get() for frame in frames]))
+            else:
+                result.append(None)
+        return result[0], result[1], result[2]
+
+    def iter_batches(self, n: int) -> Iterator[Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]]:
+        """
+        从当前位置开始按批次迭代读取，最后一批可能不足n帧
+        :param n: 每批的帧数
+        :return: 每次产出 `read_batch` 的结果
+        """
+        while True:
+            try:
+                yield self.read_batch(n)
+            except EOFError:
+                return
 
     def __next__(self) -> Frame:
         try:
             return self.read()
-        except Exception as e:
-            print(e)
+        except EOFError:
             raise StopIteration
 
     def __iter__(self):
@@ -123,11 +530,76 @@ class YuvReader(YuvIO, ABC):
 
 
 class YuvWriter(YuvIO, ABC):
-    def __init__(self, seq: Sequence, append: bool = False):
+    """
+    输出类。文件以无缓冲方式打开，每帧（或每批帧）的各分量通过一次 `os.writev` 写出。
+    已知帧数时可以预先分配文件，并通过 `write_at` 写入任意帧的位置，便于多个进程并行写入同一个文件
+    """
+    _buffering = 0
+
+    def __init__(self, seq: Sequence, append: bool = False, frames: Optional[int] = None, truncate: bool = True):
+        """
+        :param seq: 序列对象
+        :param append: 是否在文件尾追加写入，追加模式下不能使用 `write_at`
+        :param frames: 预先分配的帧数，None 表示不预先分配。文件大小至少为 frames 帧，未写入的帧为0
+        :param truncate: 是否清空已有的文件。多个进程并行写入同一个预先分配的文件时，除创建者外均应为False
+        """
         if append:
-            super().__init__(seq, "ab+")
+            mode = "ab+"
+        elif truncate or not os.path.exists(seq.full_name()):
+            mode = "wb+"
         else:
-            super().__init__(seq, "wb+")
+            mode = "rb+"
+        super().__init__(seq, mode)
+        if frames is not None and not append:
+            self.preallocate(frames)
+
+    def preallocate(self, frames: int) -> NoReturn:
+        """
+        预先分配文件空间，使文件大小至少为 frames 帧，不移动文件指针
+        :param frames: 帧数
+        :return:
+        """
+        size = self._frame_offset(frames)
+        fd = self.fp.fileno()
+        if os.fstat(fd).st_size >= size:
+            return
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, size)
+                return
+            except OSError:
+                # 部分文件系统不支持，回退到扩展文件大小
+                pass
+        os.ftruncate(fd, size)
+
+    @staticmethod
+    def _planes(frame: Frame) -> List[np.ndarray]:
+        # 裁剪得到的分量可能是不连续的视图，先整理为连续数组再写出
+        planes = [np.ascontiguousarray(frame[Component.COMP_Y].get())]
+        if frame.fmt != Format.YUV400:
+            planes.append(np.ascontiguousarray(frame[Component.COMP_U].get()))
+            planes.append(np.ascontiguousarray(frame[Component.COMP_V].get()))
+        return planes
+
+    def _writev(self, buffs: List[np.ndarray], offset: Optional[int] = None) -> NoReturn:
+        """
+        将若干连续数组依次写出，offset 为None时写在当前文件指针处，否则写在文件的 offset 处且不移动文件指针
+        """
+        fd = self.fp.fileno()
+        views = [memoryview(b).cast("B") for b in buffs]
+        while views:
+            chunk = views[:_IOV_MAX]
+            if offset is None:
+                n = os.writev(fd, chunk) if hasattr(os, "writev") else os.write(fd, chunk[0])
+            else:
+                n = os.pwritev(fd, chunk, offset) if hasattr(os, "pwritev") else os.pwrite(fd, chunk[0], offset)
+                offset += n
+            # 处理部分写入：丢弃已写完的缓冲区，截断写了一部分的缓冲区
+            while views and n >= views[0].nbytes:
+                n -= views[0].nbytes
+                views.pop(0)
+            if views and n:
+                views[0] = views[0][n:]
 
     def write(self, frame: Frame) -> ClassVar:
         """
@@ -135,8 +607,150 @@ class YuvWriter(YuvIO, ABC):
         :param frame:
         :return:
         """
-        frame[Component.COMP_Y].get().tofile(self.fp)
-        if frame.fmt != Format.YUV400:
-            frame[Component.COMP_U].get().tofile(self.fp)
-            frame[Component.COMP_V].get().tofile(self.fp)
+        self._writev(self._planes(frame))
+        return self
+
+    def write_at(self, idx: int, frame: Frame) -> ClassVar:
+        """
+        向文件的第 idx 帧处写入一帧图像，不移动文件指针
+        :param idx: 帧序号
+        :param frame:
+        :return:
+        """
+        if self.mode == "ab+":
+            raise ValueError("write_at is not supported in append mode")
+        self._writev(self._planes(frame), self._frame_offset(idx))
+        return self
+
+    def write_batch(self, y: np.ndarray, u: Optional[np.ndarray] = None, v: Optional[np.ndarray] = None) -> ClassVar:
+        """
+        向文件写入多帧图像，参数与 `YuvReader.read_batch` 的返回值一致
+        :return:
+        """
+        self._check_batch(y, u, v)
+        self._writev(self._batch_planes(y, u, v))
+        return self
+
+    def write_batch_at(self, idx: int, y: np.ndarray, u: Optional[np.ndarray] = None,
+                       v: Optional[np.ndarray] = None) -> ClassVar:
+        """
+        从文件的第 idx 帧处开始写入多帧图像，不移动文件指针
+        :return:
+        """
+        if self.mode == "ab+":
+            raise ValueError("write_batch_at is not supported in append mode")
+        self._check_batch(y, u, v)
+        self._writev(self._batch_planes(y, u, v), self._frame_offset(idx))
+        return self
+
+    def _check_batch(self, y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray]) -> NoReturn:
+        """
+        检查多帧数据各分量的形状和数据类型与序列一致，不一致时抛出 ValueError，避免写出错位的数据
+        """
+        seq = self.sequence
+        expected = [(y, (seq.height, seq.width))]
+        if seq.fmt != Format.YUV400:
+            expected += [(u, (self._uv_height, self._uv_width)), (v, (self._uv_height, self._uv_width))]
+        elif u is not None or v is not None:
+            raise ValueError("U and V must be None for YUV400")
+        for plane, shape in expected:
+            if plane is None or plane.ndim != 3 or plane.shape[0] != y.shape[0] or plane.shape[1:] != shape:
+                raise ValueError(f"Expected planes of shape (n, {shape[0]}, {shape[1]}), "
+                                 f"got {None if plane is None else plane.shape}: {seq.full_name()}")
+            if plane.dtype != self._dtype:
+                raise ValueError(f"Expected {np.dtype(self._dtype).name} planes, got {plane.dtype.name}")
+
+    @staticmethod
+    def _batch_planes(y: np.ndarray, u: Optional[np.ndarray], v: Optional[np.ndarray]) -> List[np.ndarray]:
+        """
+        按文件中的排列顺序（逐帧依次为Y、U、V）列出各帧各分量的连续数组，连续的输入不拷贝数据
+        """
+        buffs = list()
+        for i in range(y.shape[0]):
+            buffs.append(np.ascontiguousarray(y[i]))
+            if u is not None:
+                buffs.append(np.ascontiguousarray(u[i]))
+                buffs.append(np.ascontiguousarray(v[i]))
+        return buffs
+
+
+class YuvMmapReader(YuvIO, ABC):
+    """
+    基于内存映射的输入类，支持随机访问：
+    `reader[i]` 返回第i帧，`reader[a:b]` 返回帧列表，返回的帧均为文件映射的视图，不拷贝数据
+    """
+
+    def __init__(self, seq: Sequence, mode: str = "r"):
+        """
+        :param seq: 序列对象
+        :param mode: 映射模式，"r" 为只读映射，"c" 为写时拷贝（修改帧数据不会写回文件）
+        """
+        assert mode in ("r", "c")
+        self._mmap_mode: str = mode
+        self._buff: Optional[np.ndarray] = None
+        self._index: int = 0
+        super().__init__(seq, "rb")
+
+    def open(self) -> NoReturn:
+        """
+        如果IO流未打开，则打开IO流并映射整个文件
+        :return:
+        """
+        super().open()
+        if self._buff is None:
+            frames = self.frames()
+            if frames == 0:
+                # 空文件无法映射
+                self._buff = np.empty((0, self._pixel_area_yuv), dtype=self._dtype)
+            else:
+                self._buff = np.memmap(self.fp, dtype=self._dtype, mode=self._mmap_mode,
+                                       shape=(frames, self._pixel_area_yuv))
+
+    def close(self) -> NoReturn:
+        """
+        关闭文件的IO流并释放映射。已返回的帧仍持有映射，在其被回收后映射才真正释放
+        :return:
+        """
+        self._buff = None
+        super().close()
+
+    def seek(self, frames) -> NoReturn:
+        """
+        移动当前帧位置，以帧为单位移动
+        :param frames: 移动的帧数，负数表示向前移动，正数表示向后移动
+        :return:
+        """
+        self._index = max(0, self._index + frames)
+
+    def read(self) -> Frame:
+        """
+        读取当前位置的一帧图像，并将位置后移一帧
+        :return:
+        """
+        if self._index >= len(self):
+            raise EOFError(f"End of file: {self.sequence.full_name()}")
+        frame = self[self._index]
+        self._index += 1
+        return frame
+
+    def __len__(self) -> int:
+        return self._buff.shape[0]
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[Frame, List[Frame]]:
+        """
+        随机访问帧
+        :param item: 帧序号（支持负数）或切片
+        :return: 帧对象或帧对象列表
+        """
+        if isinstance(item, slice):
+            return [self._to_frame(buff) for buff in self._buff[item]]
+        return self._to_frame(self._buff[item])
+
+    def __next__(self) -> Frame:
+        try:
+            return self.read()
+        except EOFError:
+            raise StopIteration
+
+    def __iter__(self):
         return self